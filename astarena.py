@@ -0,0 +1,192 @@
+from array import array
+
+from lexer import SymbolTable, Token
+from slparser import Node, NodeProgram
+
+# коды узлов-листьев, не являющихся узлами дерева
+TOKEN = 255
+NONE = 254
+
+class Arena:
+    # Компактное представление дерева разбора: узлы хранятся в параллельных
+    # массивах (код класса узла, первый потомок, следующий брат, номер
+    # токена), токены - в своих массивах (код токена, номер значения в
+    # таблице символов, строка, позиция). Дочерние узлы идут в порядке
+    # полей класса, поля-токены становятся листьями с кодом TOKEN.
+    # Узлы читаются через лёгкие представления ArenaNode.
+
+    def __init__(self, symbols=None):
+        self.symbols = SymbolTable() if symbols is None else symbols
+        self.kinds = array('B')
+        self.first_child = array('i')
+        self.next_sibling = array('i')
+        self.token_index = array('i')
+        self.token_names = array('B')
+        self.token_syms = array('i')
+        self.token_lines = array('I')
+        self.token_pos = array('i')
+
+    def __len__(self):
+        return len(self.kinds)
+
+    @classmethod
+    def from_parser(cls, parser):
+        # разбирает программу по одной инструкции, так что в памяти
+        # одновременно находится дерево только одной инструкции
+        if parser.token.name == Token.EOF:
+            parser.error("Пустой файл!")
+        arena = cls(parser.symbols)
+        root = arena.__new_node(NodeProgram.kind)
+        last = -1
+        for statement in parser.statements():
+            last = arena.__link(root, last, arena.add(statement))
+        return arena
+
+    @classmethod
+    def from_node(cls, node, symbols=None):
+        arena = cls(symbols)
+        arena.add(node)
+        return arena
+
+    @property
+    def root(self):
+        return ArenaNode(self, 0)
+
+    def __new_node(self, kind, token=-1):
+        index = len(self.kinds)
+        self.kinds.append(kind)
+        self.first_child.append(-1)
+        self.next_sibling.append(-1)
+        self.token_index.append(token)
+        return index
+
+    def __link(self, parent, last, child):
+        # добавляет child после last среди потомков parent
+        if last == -1:
+            self.first_child[parent] = child
+        else:
+            self.next_sibling[last] = child
+        return child
+
+    def __add_token(self, token):
+        sym = token.sym
+        names = self.symbols.names
+        if not 0 <= sym < len(names) or names[sym] is not token.value:
+            # токен из другой таблицы символов
+            sym = self.symbols.intern(token.value)
+        self.token_names.append(token.name)
+        self.token_syms.append(sym)
+        self.token_lines.append(token.lineno)
+        self.token_pos.append(token.pos)
+        return self.__new_node(TOKEN, len(self.token_names) - 1)
+
+    def add(self, node):
+        # добавляет поддерево и возвращает номер его корня; обход
+        # итеративный, чтобы глубина дерева не упиралась в предел рекурсии
+        root = -1
+        # (значение, родитель), последний добавленный потомок каждого родителя
+        stack = [(node, -1)]
+        last = {}
+        while stack:
+            value, parent = stack.pop()
+            if isinstance(value, Token):
+                index = self.__add_token(value)
+            elif value is None:
+                index = self.__new_node(NONE)
+            else:
+                index = self.__new_node(value.kind)
+                if value.sequence:
+                    children = getattr(value, value.fields[0])
+                else:
+                    children = [getattr(value, name) for name in value.fields]
+                for child in reversed(children):
+                    stack.append((child, index))
+            if parent == -1:
+                root = index
+            else:
+                last[parent] = self.__link(parent, last.get(parent, -1), index)
+        return root
+
+    def children(self, index):
+        child = self.first_child[index]
+        while child != -1:
+            yield child
+            child = self.next_sibling[child]
+
+    def token(self, index):
+        i = self.token_index[index]
+        sym = self.token_syms[i]
+        return Token(self.token_names[i], self.symbols[sym],
+                     self.token_lines[i], self.token_pos[i], sym)
+
+    def value(self, index):
+        kind = self.kinds[index]
+        if kind == TOKEN:
+            return self.token(index)
+        if kind == NONE:
+            return None
+        return ArenaNode(self, index)
+
+    def to_node(self, index=0):
+        # восстанавливает обычное дерево узлов
+        built = {}
+        stack = [(index, False)]
+        while stack:
+            i, ready = stack.pop()
+            kind = self.kinds[i]
+            if kind == TOKEN:
+                built[i] = self.token(i)
+            elif kind == NONE:
+                built[i] = None
+            elif not ready:
+                stack.append((i, True))
+                stack.extend((child, False) for child in self.children(i))
+            else:
+                cls = Node.kinds[kind]
+                node = cls.empty()
+                values = [built.pop(child) for child in self.children(i)]
+                if cls.sequence:
+                    setattr(node, cls.fields[0], values)
+                else:
+                    for name, value in zip(cls.fields, values):
+                        setattr(node, name, value)
+                built[i] = node
+        return built[index]
+
+    def nbytes(self):
+        arrays = (self.kinds, self.first_child, self.next_sibling, self.token_index,
+                  self.token_names, self.token_syms, self.token_lines, self.token_pos)
+        return sum(a.itemsize * len(a) for a in arrays)
+
+class ArenaNode:
+    # представление узла арены: поля читаются по именам, как у узлов дерева
+    __slots__ = ('arena', 'index')
+
+    def __init__(self, arena, index):
+        self.arena = arena
+        self.index = index
+
+    @property
+    def node_class(self):
+        return Node.kinds[self.arena.kinds[self.index]]
+
+    def values(self):
+        # значения всех полей (или элементы последовательности) по порядку
+        return [self.arena.value(child) for child in self.arena.children(self.index)]
+
+    def __getattr__(self, name):
+        cls = self.node_class
+        if name not in cls.fields:
+            raise AttributeError(name)
+        if cls.sequence:
+            return self.values()
+        position = cls.fields.index(name)
+        for i, child in enumerate(self.arena.children(self.index)):
+            if i == position:
+                return self.arena.value(child)
+
+    def to_node(self):
+        return self.arena.to_node(self.index)
+
+    def __repr__(self):
+        return repr(self.to_node())
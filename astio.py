@@ -0,0 +1,242 @@
+import json
+
+from lexer import SymbolTable, Token
+from slparser import Node
+
+# Сериализация дерева разбора для внешних инструментов.
+#
+# JSON lines: первая строка - заголовок {"format": "sl-ast", "version": 1},
+# дальше по строке на узел в прямом порядке обхода. Строка узла содержит
+# имя класса ("node"), поля-токены ({"name", "value", "lineno", "pos"},
+# name - код токена из Token) и пустые поля (null); поля-узлы идут
+# следующими строками в порядке полей класса. У последовательностей
+# вместо полей указано число элементов ("length").
+#
+# Двоичный формат: MAGIC, версия, список имён классов узлов, затем узлы в
+# прямом порядке обхода: байт кода класса (номер в списке имён), у
+# последовательностей - длина, и значения полей. Токен - байт TOKEN, код
+# токена, ссылка на строку, строка и позиция; строка при первом появлении
+# записывается целиком, а дальше на неё ссылаются по номеру. Целые числа
+# записываются как varint.
+
+FORMAT = 'sl-ast'
+VERSION = 1
+MAGIC = b'SLAST'
+
+TOKEN = 255
+NONE = 254
+
+def node_class(name):
+    for cls in Node.kinds:
+        if cls.__name__ == name:
+            return cls
+    raise ValueError(f'Неизвестный класс узла {name}')
+
+def children(node):
+    # значения полей узла (или элементы последовательности) по порядку
+    if node.sequence:
+        return getattr(node, node.fields[0])
+    return [getattr(node, name) for name in node.fields]
+
+def new_node(cls, values):
+    node = cls.empty()
+    if cls.sequence:
+        setattr(node, cls.fields[0], values)
+    else:
+        for name, value in zip(cls.fields, values):
+            setattr(node, name, value)
+    return node
+
+class TreeBuilder:
+    # собирает дерево из узлов, поступающих в прямом порядке обхода
+    def __init__(self):
+        # (класс, число значений, собранные значения, значения полей,
+        #  записанные вместе с узлом: номер поля -> значение)
+        self.stack = []
+        self.root = None
+
+    def open(self, cls, count, inline=None):
+        self.stack.append((cls, count, [], inline or {}))
+        self.__fill()
+
+    def value(self, value):
+        self.stack[-1][2].append(value)
+        self.__fill()
+
+    def __fill(self):
+        while self.stack:
+            cls, count, values, inline = self.stack[-1]
+            if len(values) in inline:
+                values.append(inline[len(values)])
+                continue
+            if len(values) < count:
+                return
+            self.stack.pop()
+            node = new_node(cls, values)
+            if self.stack:
+                self.stack[-1][2].append(node)
+            else:
+                self.root = node
+
+    def result(self):
+        if self.stack or self.root is None:
+            raise ValueError('Дерево записано не полностью')
+        return self.root
+
+def write_jsonl(node, out):
+    out.write(json.dumps({'format': FORMAT, 'version': VERSION}) + '\n')
+    stack = [node]
+    while stack:
+        node = stack.pop()
+        record = {'node': type(node).__name__}
+        values = children(node)
+        if node.sequence:
+            record['length'] = len(values)
+        nodes = []
+        for i, value in enumerate(values):
+            if isinstance(value, Node):
+                nodes.append(value)
+            elif not node.sequence:
+                name = node.fields[i]
+                record[name] = None if value is None else {
+                    'name': value.name, 'value': value.value,
+                    'lineno': value.lineno, 'pos': value.pos}
+        out.write(json.dumps(record, ensure_ascii=False) + '\n')
+        stack.extend(reversed(nodes))
+
+def read_jsonl(inp, symbols=None):
+    symbols = SymbolTable() if symbols is None else symbols
+    lines = iter(inp)
+    header = json.loads(next(lines))
+    if header.get('format') != FORMAT or header.get('version') != VERSION:
+        raise ValueError(f'Неподдерживаемый формат {header}')
+    builder = TreeBuilder()
+    for line in lines:
+        if not line.strip():
+            continue
+        record = json.loads(line)
+        cls = node_class(record['node'])
+        if cls.sequence:
+            builder.open(cls, record['length'])
+            continue
+        inline = {}
+        for i, name in enumerate(cls.fields):
+            # поля, которых нет в записи, - узлы, они придут следующими строками
+            if name in record:
+                value = record[name]
+                if value is not None:
+                    value = symbols.token(value['name'], value['value'],
+                                          value['lineno'], value['pos'])
+                inline[i] = value
+        builder.open(cls, len(cls.fields), inline)
+    return builder.result()
+
+def write_varint(out, value):
+    while value > 0x7f:
+        out.append(value & 0x7f | 0x80)
+        value >>= 7
+    out.append(value)
+
+def zigzag(value):
+    return value << 1 if value >= 0 else (-value << 1) - 1
+
+def unzigzag(value):
+    return value >> 1 if not value & 1 else -((value + 1) >> 1)
+
+def dumps_binary(node):
+    data = bytearray(MAGIC)
+    data.append(VERSION)
+    names = [cls.__name__.encode() for cls in Node.kinds]
+    write_varint(data, len(names))
+    for name in names:
+        write_varint(data, len(name))
+        data += name
+    strings = {}
+    stack = [node]
+    while stack:
+        value = stack.pop()
+        if value is None:
+            data.append(NONE)
+        elif isinstance(value, Token):
+            data.append(TOKEN)
+            data.append(value.name)
+            ref = strings.get(value.value)
+            if ref is None:
+                strings[value.value] = len(strings)
+                encoded = value.value.encode()
+                write_varint(data, 0)
+                write_varint(data, len(encoded))
+                data += encoded
+            else:
+                write_varint(data, ref + 1)
+            write_varint(data, value.lineno)
+            write_varint(data, zigzag(value.pos))
+        else:
+            data.append(value.kind)
+            values = children(value)
+            if value.sequence:
+                write_varint(data, len(values))
+            stack.extend(reversed(values))
+    return bytes(data)
+
+def write_binary(node, out):
+    out.write(dumps_binary(node))
+
+class Reader:
+    def __init__(self, data):
+        self.data = memoryview(data)
+        self.offset = 0
+
+    def byte(self):
+        value = self.data[self.offset]
+        self.offset += 1
+        return value
+
+    def varint(self):
+        result = shift = 0
+        while True:
+            byte = self.byte()
+            result |= (byte & 0x7f) << shift
+            if byte < 0x80:
+                return result
+            shift += 7
+
+    def bytes(self, length):
+        value = bytes(self.data[self.offset:self.offset + length])
+        self.offset += length
+        return value
+
+def loads_binary(data, symbols=None):
+    symbols = SymbolTable() if symbols is None else symbols
+    reader = Reader(data)
+    if reader.bytes(len(MAGIC)) != MAGIC:
+        raise ValueError('Это не двоичное дерево разбора SL')
+    version = reader.byte()
+    if version != VERSION:
+        raise ValueError(f'Неподдерживаемая версия формата {version}')
+    classes = [node_class(reader.bytes(reader.varint()).decode())
+               for _ in range(reader.varint())]
+    strings = []
+    builder = TreeBuilder()
+    while builder.root is None:
+        tag = reader.byte()
+        if tag == NONE:
+            builder.value(None)
+        elif tag == TOKEN:
+            name = reader.byte()
+            ref = reader.varint()
+            if ref == 0:
+                strings.append(reader.bytes(reader.varint()).decode())
+                value = strings[-1]
+            else:
+                value = strings[ref - 1]
+            lineno = reader.varint()
+            pos = unzigzag(reader.varint())
+            builder.value(symbols.token(name, value, lineno, pos))
+        else:
+            cls = classes[tag]
+            builder.open(cls, reader.varint() if cls.sequence else len(cls.fields))
+    return builder.result()
+
+def read_binary(inp, symbols=None):
+    return loads_binary(inp.read(), symbols)
@@ -0,0 +1,125 @@
+# Массивы SL на 10^6 элементов: память упакованного массива int против
+# списка Python с теми же значениями, присваивание последовательности из
+# литералов (копирование готового буфера) против поэлементного
+# присваивания и суммирование элементов в цикле с проверками индексов и
+# без них (BoundsCheckEliminator из optimizer.py). Время выполнения - на
+# всех исполнителях.
+#
+#   python -m benchmarks.arrays [масштаб]
+
+import io
+import sys
+import time
+from array import array
+
+import bytecode
+import pycodegen
+from interpreter import Interpreter
+from lexer import TableLexer
+from optimizer import BoundsCheckEliminator
+from runtime import TYPECODES
+from slparser import Parser
+from vm import VirtualMachine
+
+ENGINES = {
+    'замыкания'        : Interpreter,
+    'стековая машина'  : lambda program, out: VirtualMachine(bytecode.compile_program(program), out),
+    'код Python'       : lambda program, out: pycodegen.PythonRunner(pycodegen.compile_program(program), out),
+}
+
+# повторений присваивания последовательности
+REPEAT = 5
+
+
+def assign(n, constant):
+    # присваивание последовательности из n элементов REPEAT раз; если
+    # constant ложно, последний элемент - переменная, и последовательность
+    # вычисляется поэлементно
+    values = ', '.join(map(str, range(n - 1)))
+    last = n - 1 if constant else 'k'
+    return f'''
+int[{n}] p;
+int k;
+k = 0;
+while k < {REPEAT} {{
+    p = [{values}, {last}];
+    k = k + 1;
+}};
+print(p[{n - 1}]);
+'''
+
+
+def array_sum(n):
+    return f'''
+int[{n}] p;
+int i;
+int s;
+i = 0;
+while i < {n} {{
+    s = s + p[i];
+    i = i + 1;
+}};
+print(s);
+'''
+
+
+def memory(n):
+    packed = array(TYPECODES[int], range(n))
+    values = list(range(n))
+    # целые от -5 до 256 CPython хранит один раз
+    objects = sum(sys.getsizeof(value) for value in values if not -5 <= value <= 256)
+    print(f'память int[{n}]: упакованный массив {sys.getsizeof(packed) / 2**20:.1f} МБ, '
+          f'список {(sys.getsizeof(values) + objects) / 2**20:.1f} МБ')
+
+
+def run(program, engine):
+    out = io.StringIO()
+    start = time.perf_counter()
+    executor = engine(program, out)
+    compiled = time.perf_counter()
+    executor.run()
+    return compiled - start, time.perf_counter() - compiled, out.getvalue()
+
+
+def measure_assign(n):
+    print(f'присваивание последовательности из {n} элементов, {REPEAT} раз')
+    programs = {}
+    for constant in (True, False):
+        start = time.perf_counter()
+        programs[constant] = Parser(TableLexer(assign(n, constant))).parse()
+        print(f'  разбор {"литералов" if constant else "выражений"}: {time.perf_counter() - start:.2f} с')
+    for name, engine in ENGINES.items():
+        line = f'  {name:<18}'
+        for constant, title in ((True, 'буфер'), (False, 'поэлементно')):
+            compiled, elapsed, _ = run(programs[constant], engine)
+            line += f'{title}: компиляция {compiled:5.2f} с, {elapsed / REPEAT * 1000:8.2f} мс на присваивание   '
+        print(line.rstrip())
+
+
+def measure_sum(n):
+    print(f'сумма {n} элементов в цикле')
+    source = array_sum(n)
+    checked = Parser(TableLexer(source)).parse()
+    unchecked = Parser(TableLexer(source)).parse()
+    bounds = BoundsCheckEliminator()
+    bounds.eliminate(unchecked)
+    print(f'  {bounds.report()}')
+    for name, engine in ENGINES.items():
+        _, with_checks, result = run(checked, engine)
+        _, without_checks, same = run(unchecked, engine)
+        if result != same:
+            raise AssertionError('результаты с проверками индексов и без них различаются')
+        print(f'  {name:<18}с проверками {with_checks:6.3f} с, без проверок {without_checks:6.3f} с, '
+              f'{n / without_checks:12,.0f} обращений/с')
+
+
+def main():
+    scale = float(sys.argv[1]) if len(sys.argv) > 1 else 1.0
+    n = int(1_000_000 * scale)
+    memory(n)
+    measure_assign(n)
+    measure_sum(n)
+
+
+if __name__ == '__main__':
+    main()
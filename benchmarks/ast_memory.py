@@ -0,0 +1,108 @@
+# Память дерева разбора на сгенерированных программах: узлы с __dict__
+# (как было раньше), узлы со __slots__ и арена Arena.
+#
+#   python -m benchmarks.ast_memory [число инструкций]
+
+import random
+import sys
+import time
+import tracemalloc
+
+from astarena import Arena
+from lexer import TableLexer, Token
+from slparser import Node, Parser
+
+
+def make_program(statements, rng):
+    names = [f'v{i}' for i in range(100)]
+    lines = []
+    for _ in range(statements):
+        a, b, c = rng.sample(names, 3)
+        match rng.randrange(4):
+            case 0:
+                lines.append(f'int {a};')
+            case 1:
+                lines.append(f'{a} = {b} + {c} * {rng.randint(0, 99)} - ({b} - 1);')
+            case 2:
+                lines.append(f'if {a} > {b} and not {c} == 0 {{ {a} = {b}; }} else {{ {a} = {c}; }};')
+            case 3:
+                lines.append(f'while {a} < {b} {{ {a} = {a} + 1; print(str({a})); }};')
+    return '\n'.join(lines)
+
+
+class DictToken:
+    def __init__(self, token):
+        self.name = token.name
+        self.value = token.value
+        self.lineno = token.lineno
+        self.pos = token.pos
+
+
+class DictNode:
+    # узел с __dict__, как до перехода на __slots__
+    pass
+
+
+def to_dict_nodes(node):
+    # копия дерева из объектов с __dict__ (итеративно)
+    root = DictNode()
+    stack = [(node, root)]
+    while stack:
+        node, copy = stack.pop()
+        for name in node.fields:
+            value = getattr(node, name)
+            if isinstance(value, list):
+                items = []
+                for item in value:
+                    item_copy = DictNode()
+                    items.append(item_copy)
+                    stack.append((item, item_copy))
+                setattr(copy, name, items)
+            elif isinstance(value, Token):
+                setattr(copy, name, DictToken(value))
+            elif isinstance(value, Node):
+                child = DictNode()
+                setattr(copy, name, child)
+                stack.append((value, child))
+            else:
+                setattr(copy, name, value)
+    return root
+
+
+def build_dict(source):
+    return to_dict_nodes(Parser(TableLexer(source)).parse())
+
+
+def build_slots(source):
+    return Parser(TableLexer(source)).parse()
+
+
+def build_arena(source):
+    return Arena.from_parser(Parser(TableLexer(source)))
+
+
+def measure(name, build, source, statements):
+    tracemalloc.start()
+    start = time.perf_counter()
+    result = build(source)
+    elapsed = time.perf_counter() - start
+    size, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    print(f'{name:<18}{size / 2**20:>9.1f} МБ {size / statements:>8.1f} Б/инструкцию '
+          f'пик {peak / 2**20:>8.1f} МБ {elapsed:>7.2f} с')
+    del result
+    return size
+
+
+def main():
+    statements = int(sys.argv[1]) if len(sys.argv) > 1 else 100000
+    source = make_program(statements, random.Random(0))
+    print(f'{statements} инструкций, {len(source) / 2**20:.1f} МБ исходного текста')
+    measure('узлы с __dict__', build_dict, source, statements)
+    slots = measure('узлы со __slots__', build_slots, source, statements)
+    arena = measure('Arena', build_arena, source, statements)
+    print(f'Arena меньше дерева со __slots__ в {slots / arena:.1f} раза')
+
+
+if __name__ == '__main__':
+    main()
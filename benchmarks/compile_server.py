@@ -0,0 +1,66 @@
+# Задержка разбора одного файла: холодный запуск compiler.py против
+# сервера компиляции с уже запущенными процессами - через запуск клиента
+# compileclient.py и через уже открытое соединение.
+#
+#   python -m benchmarks.compile_server [файл] [число запросов]
+
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+from compileclient import CompileClient
+
+
+def timed_runs(command, count):
+    times = []
+    for _ in range(count):
+        start = time.perf_counter()
+        subprocess.run(command, check=False, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+        times.append(time.perf_counter() - start)
+    return times
+
+
+def report(title, times):
+    times = sorted(times)
+    p99 = times[min(len(times) - 1, int(len(times) * 0.99))]
+    print(f'  {title:<36}медиана {statistics.median(times) * 1000:8.2f} мс, '
+          f'p99 {p99 * 1000:8.2f} мс ({len(times)} запусков)')
+
+
+def main():
+    path = sys.argv[1] if len(sys.argv) > 1 else 'example.sl'
+    count = int(sys.argv[2]) if len(sys.argv) > 2 else 500
+    with tempfile.TemporaryDirectory() as directory:
+        socket_path = os.path.join(directory, 'server.sock')
+        server = subprocess.Popen([sys.executable, 'compileserver.py', '--socket', socket_path, '-j', '2'],
+                                  stderr=subprocess.PIPE)
+        # сервер сообщает о готовности строкой в stderr
+        server.stderr.readline()
+        try:
+            print(f'разбор {path}')
+            report('холодный compiler.py', timed_runs(
+                [sys.executable, 'compiler.py', '-q', '-j', '1', path], 20))
+            report('compileclient.py + сервер', timed_runs(
+                [sys.executable, 'compileclient.py', '--socket', socket_path, '--format', 'none', path], 20))
+            with CompileClient(socket_path) as client:
+                times = []
+                for _ in range(count):
+                    start = time.perf_counter()
+                    response = client.compile(path, format='none')
+                    times.append(time.perf_counter() - start)
+                report('открытое соединение', times)
+                start = time.perf_counter()
+                client.compile_many([path] * count, format='none')
+                elapsed = time.perf_counter() - start
+                print(f'  пакет из {count} запросов: {count / elapsed:.0f} запросов/с')
+                print(f'  время разбора на сервере: {response["time_ms"]:.2f} мс')
+                client.request(op='shutdown')
+        finally:
+            server.wait(timeout=10)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,350 @@
+# Генератор программ SL заданного размера и формы для бенчмарков. Одно и
+# то же зерно даёт одну и ту же программу. Программы проходят лексер,
+# парсер и семантический анализ (semantic.py): переменные объявлены до
+# использования в своей области видимости, типы согласованы, индексы
+# массивов - литералы в пределах размера, делители - ненулевые литералы,
+# а каждый цикл while ограничен счётчиком, который тело не меняет.
+# Программы рассчитаны на фазы компиляции: выполнять большие программы
+# долго - умножения дают огромные целые, а вложенные циклы перемножают
+# число итераций.
+#
+# Форма (SHAPES) задаёт веса видов инструкций и пределы: глубину
+# вложенности if/while, длину цепочек операций, вложенность скобок и
+# вызовов в выражениях, число параметров функций, длину литералов
+# массивов и строк.
+#
+# Пределы, от которых зависит длина одной инструкции верхнего уровня
+# (SCALED), перед каждой такой инструкцией уменьшаются до оставшейся части
+# размера: иначе одна инструкция формы nested глубиной 100 и в 400
+# инструкций дала бы программу в сотни тысяч символов при любом
+# заказанном размере.
+#
+#   python -m benchmarks.generator [размер] [--shape форма] [--seed n] [-o файл]
+#
+# Размер - число символов, например 500000, 64K или 10M.
+
+import argparse
+import math
+import random
+import sys
+
+# параметры формы по умолчанию
+DEFAULTS = {
+    # веса видов инструкций
+    'weights'   : {'declare': 3, 'assign': 6, 'print': 2, 'if': 2, 'while': 1, 'call': 1,
+                   'array': 1, 'string': 1, 'function': 1},
+    'depth'     : 3,      # наибольшая вложенность if и while
+    'block'     : 5,      # наибольшее число инструкций во вложенном блоке
+    'budget'    : 40,     # наибольшее число инструкций в одной инструкции верхнего уровня
+    # число операндов в выражениях одной инструкции ограничено 4 * chain
+    'chain'     : 6,      # наибольшее число операндов в цепочке операций
+    'parens'    : 2,      # наибольшая вложенность скобок и вызовов в выражении
+    'params'    : 3,      # наибольшее число параметров функции
+    'array'     : 32,     # наибольшая длина литерала массива
+    'string'    : 40,     # наибольшая длина строкового литерала
+}
+
+SHAPES = {
+    'mixed'       : {},
+    'nested'      : {'weights': {'if': 6, 'while': 4, 'assign': 2, 'declare': 1, 'print': 1},
+                     'depth': 100, 'block': 2, 'budget': 400},
+    'expressions' : {'weights': {'assign': 6, 'declare': 1, 'print': 1, 'function': 1},
+                     'chain': 300, 'parens': 8},
+    'functions'   : {'weights': {'function': 6, 'call': 4, 'declare': 1, 'assign': 1},
+                     'params': 8, 'block': 8},
+    'arrays'      : {'weights': {'array': 6, 'declare': 1, 'assign': 2}, 'array': 2000},
+    'strings'     : {'weights': {'string': 6, 'declare': 1, 'print': 1}, 'string': 5000},
+}
+
+# символы строковых литералов (кроме кавычек)
+TEXT = 'abcdefghijklmnopqrstuvwxyz     0123456789.,;:!?-+*/()[]{}'
+
+# виды переменных: присваиваемые и счётчики циклов, которые только читаются
+KINDS = ('int', 'float', 'string', 'array', 'counter')
+
+SUFFIXES = {'K': 2**10, 'M': 2**20, 'G': 2**30}
+
+# пределы, которые уменьшаются до оставшейся части размера, и сколько
+# символов программы приходится на единицу каждого: операнд цепочки (их в
+# инструкции до 4 * chain, часть - в скобках и вызовах), элемент массива,
+# символ строки. Инструкция бюджета на глубине d стоит STATEMENT символов и
+# около 8 * d символов отступа - её строк и строк закрывающих скобок и
+# счётчиков циклов, а цепочка блоков до глубины d занимает около
+# INDENT * d * d символов.
+SCALED = {'chain': 64, 'array': 5, 'string': 1}
+STATEMENT = 40
+INDENT = 8
+
+
+def parse_size(text):
+    # '64K' -> 65536
+    text = text.strip().upper()
+    if text and text[-1] in SUFFIXES:
+        return int(float(text[:-1]) * SUFFIXES[text[-1]])
+    return int(text)
+
+
+class Generator:
+    def __init__(self, seed=0, shape='mixed'):
+        if shape not in SHAPES:
+            raise ValueError(f'Неизвестная форма программы {shape}')
+        self.rng = random.Random(seed)
+        self.shape = {**DEFAULTS, **SHAPES[shape]}
+        self.kinds = list(self.shape['weights'])
+        self.weights = list(self.shape['weights'].values())
+        self.lines = []
+        self.length = 0
+        self.names = 0
+        # видимые переменные каждого вида одним стеком; marks - длины
+        # стеков при входе в блоки
+        self.visible = {kind: [] for kind in KINDS}
+        self.marks = []
+        # функции верхнего уровня: (имя, число параметров)
+        self.functions = []
+        # пределы текущей инструкции верхнего уровня (см. scale)
+        self.limits = dict(self.shape)
+        self.budget = 0
+        self.operands = 0
+        self.max_depth = 0
+
+    def generate(self, size):
+        # текст программы не короче size символов
+        while True:
+            self.scale(size - self.length)
+            self.budget = self.limits['budget']
+            self.statement(0)
+            if self.length >= size:
+                return '\n'.join(self.lines) + '\n'
+
+    def scale(self, remaining):
+        # пределы инструкции верхнего уровня, при которых она не длиннее
+        # remaining символов (с точностью до одной строки)
+        for name, cost in SCALED.items():
+            self.limits[name] = max(1, min(self.shape[name], remaining // cost))
+        depth = self.limits['depth'] = max(1, min(self.shape['depth'], math.isqrt(remaining // INDENT)))
+        self.limits['budget'] = max(1, min(self.shape['budget'], remaining // (STATEMENT + 8 * depth)))
+
+    # вывод и имена
+
+    def emit(self, depth, line):
+        line = '    ' * depth + line
+        self.lines.append(line)
+        self.length += len(line) + 1
+
+    def name(self, prefix):
+        self.names += 1
+        return f'{prefix}{self.names}'
+
+    def declare(self, kind, name):
+        self.visible[kind].append(name)
+
+    def enter(self):
+        self.marks.append({kind: len(names) for kind, names in self.visible.items()})
+
+    def leave(self):
+        for kind, length in self.marks.pop().items():
+            del self.visible[kind][length:]
+
+    # инструкции
+
+    def block(self, depth):
+        self.enter()
+        for i in range(self.rng.randint(1, self.shape['block'])):
+            if i and self.budget <= 0:
+                break
+            self.statement(depth)
+        self.leave()
+
+    def statement(self, depth):
+        self.budget -= 1
+        self.operands = 4 * self.limits['chain']
+        self.max_depth = max(self.max_depth, depth)
+        kind = self.rng.choices(self.kinds, self.weights)[0]
+        if kind == 'function' and depth > 0:
+            kind = 'assign'
+        if kind in ('if', 'while') and (depth >= self.limits['depth'] or self.budget <= 0):
+            kind = 'assign'
+        if kind == 'call' and not self.functions:
+            kind = 'assign'
+        if kind == 'assign' and not any(self.visible[kind] for kind in ('int', 'float', 'string')):
+            kind = 'declare'
+        rng = self.rng
+        match kind:
+            case 'declare':
+                type = rng.choice(('int', 'int', 'float', 'string'))
+                name = self.name(type[0] if type != 'int' else 'v')
+                self.emit(depth, f'{type} {name};')
+                self.declare(type, name)
+            case 'assign':
+                kinds = [kind for kind in ('int', 'float', 'string') if self.visible[kind]]
+                kind = rng.choice(kinds)
+                self.emit(depth, f'{rng.choice(self.visible[kind])} = {self.value(kind)};')
+            case 'print':
+                kind = rng.choice(('int', 'float', 'string'))
+                self.emit(depth, f'print({self.value(kind)});')
+            case 'if':
+                self.emit(depth, f'if {self.condition(0)} {{')
+                self.block(depth + 1)
+                if rng.random() < 0.5:
+                    self.emit(depth, '} else {')
+                    self.block(depth + 1)
+                self.emit(depth, '};')
+            case 'while':
+                counter = self.name('c')
+                self.emit(depth, f'int {counter};')
+                self.emit(depth, f'{counter} = 0;')
+                self.declare('counter', counter)
+                condition = f'{counter} < {rng.randint(1, 10)}'
+                if rng.random() < 0.5:
+                    condition += f' and {self.condition(1)}'
+                self.emit(depth, f'while {condition} {{')
+                self.block(depth + 1)
+                self.emit(depth + 1, f'{counter} = {counter} + 1;')
+                self.emit(depth, '};')
+            case 'call':
+                call = self.call(0)
+                if self.visible['int'] and rng.random() < 0.7:
+                    self.emit(depth, f'{rng.choice(self.visible["int"])} = {call};')
+                else:
+                    self.emit(depth, f'{call};')
+            case 'array':
+                count = rng.randint(1, self.limits['array'])
+                name = self.name('a')
+                self.emit(depth, f'int[{count + rng.randint(0, 3)}] {name};')
+                items = [str(rng.randint(0, 999)) if rng.random() < 0.9 else self.expression('int', 1)
+                         for _ in range(count)]
+                self.emit(depth, f'{name} = [{", ".join(items)}];')
+                self.declare('array', (name, count))
+            case 'string':
+                name = self.name('s')
+                self.emit(depth, f'string {name};')
+                self.emit(depth, f'{name} = {self.string()};')
+                self.declare('string', name)
+            case 'function':
+                self.function()
+
+    def function(self):
+        name = self.name('f')
+        params = [self.name('p') for _ in range(self.rng.randint(1, self.shape['params']))]
+        self.emit(0, f'function int {name}({", ".join(f"int {param}" for param in params)}) {{')
+        # тело видит только свои параметры и переменные
+        outer = self.visible
+        self.visible = {kind: [] for kind in KINDS}
+        self.visible['int'].extend(params)
+        self.block(1)
+        self.emit(1, f'return {self.expression("int", 0)};')
+        self.emit(0, '};')
+        self.visible = outer
+        self.functions.append((name, len(params)))
+
+    # выражения
+
+    def value(self, kind):
+        # выражение типа kind ('int', 'float' или 'string')
+        if kind != 'string':
+            return self.expression(kind, 0)
+        strings = self.visible['string']
+        if strings and self.rng.random() < 0.5:
+            return f'{self.rng.choice(strings)} + {self.string()}'
+        return self.string()
+
+    def string(self):
+        rng = self.rng
+        length = rng.randint(0, self.limits['string'])
+        text = ''.join(rng.choices(TEXT, k=length))
+        if length > 80:
+            # длинные литералы - многострочные
+            text = '\n'.join(text[i:i + 80] for i in range(0, length, 80))
+        return f'"{text}"'
+
+    def expression(self, kind, depth):
+        # цепочка операций над числами; kind 'float' добавляет
+        # вещественные операнды и деление
+        rng = self.rng
+        parts = [self.operand(kind, depth)]
+        for _ in range(rng.randint(1, self.limits['chain']) - 1):
+            if self.operands <= 0:
+                break
+            r = rng.random()
+            if r < 0.35:
+                parts.append(f'+ {self.operand(kind, depth)}')
+            elif r < 0.65:
+                parts.append(f'- {self.operand(kind, depth)}')
+            elif r < 0.85:
+                parts.append(f'* {self.operand(kind, depth)}')
+            elif r < 0.9 and kind == 'float':
+                parts.append(f'/ {rng.randint(1, 9)}.5')
+            elif r < 0.95:
+                parts.append(f'// {rng.randint(1, 9)}')
+            else:
+                parts.append(f'% {rng.randint(1, 9)}')
+        return ' '.join(parts)
+
+    def operand(self, kind, depth):
+        rng = self.rng
+        r = rng.random()
+        self.operands -= 1
+        if depth < self.shape['parens'] and self.operands > 0:
+            if r < 0.08:
+                return f'({self.expression(kind, depth + 1)})'
+            if r < 0.12 and self.functions:
+                return self.call(depth + 1)
+        if r < 0.2 and self.visible['array']:
+            name, count = rng.choice(self.visible['array'])
+            return f'{name}[{rng.randrange(count)}]'
+        if r < 0.6:
+            choices = [kind for kind in ('int', 'counter') if self.visible[kind]]
+            if kind == 'float' and self.visible['float']:
+                choices.append('float')
+            if choices:
+                name = rng.choice(self.visible[rng.choice(choices)])
+                return f'-{name}' if rng.random() < 0.1 else name
+        if kind == 'float' and rng.random() < 0.5:
+            return f'{rng.randint(0, 99)}.{rng.randint(0, 99)}'
+        return str(rng.randint(0, 999))
+
+    def call(self, depth):
+        name, count = self.rng.choice(self.functions)
+        return f'{name}({", ".join(self.expression("int", depth) for _ in range(count))})'
+
+    def condition(self, depth):
+        rng = self.rng
+        r = rng.random()
+        if depth < 2 and r < 0.15:
+            return f'not ({self.condition(depth + 1)})'
+        if depth < 2 and r < 0.35:
+            return f'{self.comparison()} {rng.choice(("and", "or"))} {self.condition(depth + 1)}'
+        return self.comparison()
+
+    def comparison(self):
+        rng = self.rng
+        operator = rng.choice(('<', '>', '<=', '>=', '==', '!='))
+        kind = rng.choice(('int', 'int', 'float'))
+        left = self.expression(kind, 1)
+        if left.startswith('('):
+            # скобка в начале условия открывает вложенное условие
+            left = '0 + ' + left
+        return f'{left} {operator} {self.expression(kind, 1)}'
+
+
+def generate(size, seed=0, shape='mixed'):
+    return Generator(seed, shape).generate(size)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Генератор программ SL для бенчмарков')
+    parser.add_argument('size', nargs='?', default='64K', help='размер программы в символах (64K, 10M)')
+    parser.add_argument('--shape', choices=sorted(SHAPES), default='mixed', help='форма программы')
+    parser.add_argument('--seed', type=int, default=0, help='зерно генератора')
+    parser.add_argument('-o', '--output', default=None, help='файл для программы (по умолчанию stdout)')
+    args = parser.parse_args(argv)
+    source = generate(parse_size(args.size), args.seed, args.shape)
+    if args.output is None:
+        sys.stdout.write(source)
+    else:
+        with open(args.output, 'w') as f:
+            f.write(source)
+
+
+if __name__ == '__main__':
+    main()
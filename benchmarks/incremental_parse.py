@@ -0,0 +1,122 @@
+# Дифференциальная проверка и задержка инкрементального разбора.
+# После каждой случайной правки дерево IncrementalParser должно совпадать
+# (вместе с позициями токенов) с деревом полного разбора нового текста с
+# восстановлением, а его ошибки - с ошибками полного разбора. Часть
+# правок оставляет текст неразбираемым, как недописанная инструкция.
+# Затем на файле из 50 тысяч строк сравнивается время правки с полным
+# разбором.
+#
+#   python -m benchmarks.incremental_parse [число правок] [seed]
+
+import random
+import sys
+import time
+
+from benchmarks.ast_memory import make_program
+from errors import CompileErrors
+from incremental import IncrementalParser
+from lexer import TableLexer, Token
+from slparser import Parser
+
+
+# вставки, после которых текст обычно не разбирается
+BROKEN = ('a = ', '{', '}', ';', '"', '@', 'if ', 'function int f(', ')', '\n\n}')
+
+
+def random_edit(rng, parser):
+    # правка (start, end, new_text); в одной из десяти правок текст
+    # становится неразбираемым
+    text = parser.text
+    buffer = TableLexer(text, errors=[]).tokenize()
+    if not rng.randrange(10) or len(buffer) < 2:
+        start = rng.randint(0, len(text))
+        return start, start, rng.choice(BROKEN)
+    starts = parser.starts
+    i = rng.randrange(len(buffer) - 1)
+    start, end = buffer.starts[i], buffer.ends[i]
+    match rng.randrange(6):
+        case 0 if buffer.kinds[i] == Token.INT_LITERAL:
+            return start, end, str(rng.choice([0, 7, 42, 12345]))
+        case 1 if buffer.kinds[i] == Token.ID and text[start:end] not in ('print', 'str'):
+            return start, end, rng.choice(['q', 'v1', 'длинное_имя'])
+        case 2 if len(starts) > 2:
+            k = rng.randrange(len(starts) - 1)
+            return starts[k], starts[k + 1], ''
+        case 3:
+            k = rng.randrange(len(starts))
+            statement = make_program(rng.randint(1, 3), rng)
+            return starts[k], starts[k], rng.choice(['\n', ' ', '']) + statement
+        case 4 if len(starts) > 1:
+            k = rng.randrange(len(starts) - 1)
+            return starts[k], starts[k + 1], '\n' + make_program(rng.randint(1, 3), rng).replace(' ', '\n', 3)
+    return start, start, rng.choice([' ', '\n', '\n\n', '\t'])
+
+
+def full_parse(text):
+    try:
+        return Parser(TableLexer(text), recover=True).parse(), []
+    except CompileErrors as failure:
+        return failure.program, failure.errors
+
+
+def check(parser):
+    program, errors = full_parse(parser.text)
+    if [str(error) for error in parser.errors] != [str(error) for error in errors]:
+        return False
+    if program is None:
+        return not parser.program.children
+    return repr(parser.program) == repr(program)
+
+
+def main():
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 500
+    seed = int(sys.argv[2]) if len(sys.argv) > 2 else 0
+    rng = random.Random(seed)
+    failed = 0
+    sources = [open('example.sl').read(), make_program(30, rng), make_program(30, rng).replace(' ', '\n')]
+    for source in sources:
+        parser = IncrementalParser(source)
+        for _ in range(count):
+            if rng.randrange(10):
+                edits = [random_edit(rng, parser)]
+            else:
+                # несколько непересекающихся правок разом
+                edits = []
+                for edit in sorted(random_edit(rng, parser) for _ in range(3)):
+                    if not edits or edit[0] >= edits[-1][1]:
+                        edits.append(edit)
+            before = parser.text
+            parser.apply(edits)
+            if not check(parser):
+                failed += 1
+                print(f'Расхождение после правок {edits!r} текста {before!r}')
+                parser = IncrementalParser(parser.text)
+    print(f'проверено правок: {count * len(sources)}, расхождений: {failed}')
+
+    source = make_program(50000, random.Random(seed))
+    print(f'файл из {source.count(chr(10)) + 1} строк, {len(source)} символов')
+    start = time.perf_counter()
+    parser = IncrementalParser(source)
+    print(f'  полный разбор:                  {time.perf_counter() - start:8.3f} с')
+    for title, edit in [
+        ('замена литерала', lambda: (lambda i: (i, i + 1, '9'))(parser.text.index('* ', len(parser.text) // 2) + 2)),
+        ('вставка инструкции', lambda: (lambda i: (i, i, '\nint w;'))(parser.starts[len(parser.starts) // 2])),
+        ('перевод строки', lambda: (lambda i: (i, i, '\n'))(parser.starts[len(parser.starts) // 2])),
+    ]:
+        best = None
+        for _ in range(20):
+            args = edit()
+            start = time.perf_counter()
+            parser.edit(*args)
+            elapsed = time.perf_counter() - start
+            best = elapsed if best is None else min(best, elapsed)
+        print(f'  правка ({title}): {best * 1000:8.3f} мс, разобрано инструкций: {parser.reparsed}')
+    if not check(parser):
+        print('Расхождение на большом файле')
+        failed += 1
+    if failed:
+        sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
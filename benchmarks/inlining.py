@@ -0,0 +1,102 @@
+# Встраивание и мемоизация чистых функций (Inliner из optimizer.py): вызов
+# маленькой функции max в горячем цикле, как в example.sl, и рекурсивная
+# функция с повторяющимися аргументами. Для каждой программы выводятся
+# отчёт прохода, время выполнения на всех исполнителях без встраивания и
+# мемоизации и с ними, а также число вызовов и доля попаданий в кэш.
+#
+#   python -m benchmarks.inlining [масштаб]
+
+import io
+import sys
+import time
+
+import bytecode
+import pycodegen
+from interpreter import Interpreter
+from lexer import TableLexer
+from optimizer import Inliner
+from runtime import memo_report
+from slparser import Parser
+from vm import VirtualMachine
+
+ENGINES = {
+    'замыкания'        : Interpreter,
+    'стековая машина'  : lambda program, out: VirtualMachine(bytecode.compile_program(program), out),
+    'код Python'       : lambda program, out: pycodegen.PythonRunner(pycodegen.compile_program(program), out),
+}
+
+
+def maximum(n):
+    return f'''
+function int max(int a, int b) {{
+    if a > b {{
+        return a;
+    }} else {{
+        return b;
+    }};
+}};
+int i;
+int m;
+int s;
+i = 0;
+while i < {n} {{
+    m = max(i % 7, 3);
+    s = s + m;
+    i = i + 1;
+}};
+print(s);
+'''
+
+
+def recursion(n):
+    return f'''
+function int paths(int x, int y) {{
+    if x == 0 or y == 0 {{
+        return 1;
+    }};
+    return (paths(x - 1, y) + paths(x, y - 1)) % 1000003;
+}};
+int i;
+int s;
+i = 0;
+while i < {n} {{
+    s = (s + paths(12, i % 12)) % 1000003;
+    i = i + 1;
+}};
+print(s);
+'''
+
+
+def measure(title, source):
+    print(title)
+    inliner = Inliner()
+    programs = {False: Parser(TableLexer(source)).parse(), True: Parser(TableLexer(source)).parse()}
+    inliner.inline(programs[True])
+    print(f'  {inliner.report()}')
+    for name, engine in ENGINES.items():
+        times = {}
+        outputs = set()
+        for optimized, program in programs.items():
+            out = io.StringIO()
+            executor = engine(program, out)
+            start = time.perf_counter()
+            executor.run()
+            times[optimized] = time.perf_counter() - start
+            outputs.add(out.getvalue())
+        if len(outputs) != 1:
+            raise AssertionError(f'{title}: результаты со встраиванием и без него различаются')
+        print(f'  {name:<18}без встраивания {times[False]:6.3f} с, со встраиванием {times[True]:6.3f} с, '
+              f'ускорение {times[False] / times[True]:5.2f}x')
+        memos = getattr(executor, 'memos', None)
+        if memos:
+            print('    ' + memo_report(memos).replace('\n', '\n    '))
+
+
+def main():
+    scale = float(sys.argv[1]) if len(sys.argv) > 1 else 1.0
+    measure('max в горячем цикле', maximum(int(300_000 * scale)))
+    measure('рекурсия с повторяющимися аргументами', recursion(max(1, int(20 * scale))))
+
+
+if __name__ == '__main__':
+    main()
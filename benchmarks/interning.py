@@ -0,0 +1,53 @@
+# Эффект интернирования идентификаторов и литералов в SymbolTable:
+# сколько памяти держат значения токенов и сколько стоит сравнение имён
+# по строке и по номеру.
+#
+#   python -m benchmarks.interning [число инструкций]
+
+import random
+import sys
+import timeit
+
+from lexer import TableLexer, Token
+
+NAMES = [f'variable_name_{i}' for i in range(50)]
+
+
+def make_source(statements, rng):
+    lines = []
+    for _ in range(statements):
+        a, b, c = rng.sample(NAMES, 3)
+        lines.append(f'{a} = {b} + {c} * 2 - "text";')
+    return '\n'.join(lines)
+
+
+def main():
+    statements = int(sys.argv[1]) if len(sys.argv) > 1 else 100000
+    rng = random.Random(0)
+    source = make_source(statements, rng)
+    lexer = TableLexer(source)
+    tokens = [t for t in lexer.tokens() if t.sym >= 0]
+
+    # без таблицы у каждого токена была бы своя строка-значение
+    # (кроме односимвольных, которые CPython и так не копирует)
+    separate = sum(sys.getsizeof(t.value) for t in tokens if len(t.value) > 1)
+    shared = {id(t.value): t.value for t in tokens}
+    interned = sum(sys.getsizeof(value) for value in shared.values())
+    print(f'токенов со значением: {len(tokens)}, символов в таблице: {len(lexer.symbols)}')
+    print(f'память значений: {separate / 2**20:.1f} МБ без интернирования, '
+          f'{interned / 1024:.1f} КБ с интернированием')
+
+    ids = [t for t in tokens if t.name == Token.ID]
+    # равные, но разные объекты строк - как до интернирования
+    copies = [(t.value + ' ')[:-1] for t in ids]
+    pairs = list(zip(copies, copies[1:]))
+    syms = [(a.sym, b.sym) for a, b in zip(ids, ids[1:])]
+    by_string = min(timeit.repeat(lambda: [a == b for a, b in pairs], number=5, repeat=3))
+    by_sym = min(timeit.repeat(lambda: [a == b for a, b in syms], number=5, repeat=3))
+    count = 5 * len(pairs)
+    print(f'сравнение имён: по строке {by_string / count * 1e9:.1f} нс, '
+          f'по номеру {by_sym / count * 1e9:.1f} нс')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,100 @@
+# Скорость исполнителей SL на трёх микропрограммах: пустой цикл со
+# счётчиком, рекурсивный fib и суммирование элементов массива. Для каждого
+# исполнителя (замыкания interpreter.py, стековая машина vm.py и перевод в
+# код Python pycodegen.py) выводится время компиляции, время выполнения и
+# число операций в секунду (итераций цикла, вызовов функции, обращений к
+# элементам массива).
+#
+#   python -m benchmarks.interpreter [масштаб]
+
+import io
+import sys
+import time
+
+import bytecode
+import pycodegen
+from interpreter import Interpreter
+from lexer import TableLexer
+from slparser import Parser
+from vm import VirtualMachine
+
+ENGINES = {
+    'замыкания'        : Interpreter,
+    'стековая машина'  : lambda program, out: VirtualMachine(bytecode.compile_program(program), out),
+    'код Python'       : lambda program, out: pycodegen.PythonRunner(pycodegen.compile_program(program), out),
+}
+
+
+def loop(n):
+    source = f'''
+int i;
+i = 0;
+while i < {n} {{
+    i = i + 1;
+}};
+'''
+    return source, n
+
+
+def fib(n):
+    source = f'''
+function int fib(int n) {{
+    if n < 2 {{
+        return n;
+    }};
+    return fib(n - 1) + fib(n - 2);
+}};
+int r;
+r = fib({n});
+'''
+    # число вызовов fib(n): 2 * fib(n + 1) - 1
+    a, b = 0, 1
+    for _ in range(n + 1):
+        a, b = b, a + b
+    return source, 2 * a - 1
+
+
+def array_sum(n):
+    size = 1000
+    values = ', '.join(str(k) for k in range(size))
+    source = f'''
+int[{size}] p;
+p = [{values}];
+int s;
+int i;
+int k;
+k = 0;
+while k < {n // size} {{
+    i = 0;
+    while i < {size} {{
+        s = s + p[i];
+        i = i + 1;
+    }};
+    k = k + 1;
+}};
+'''
+    return source, n // size * size
+
+
+def measure(title, source, operations):
+    print(title)
+    program = Parser(TableLexer(source)).parse()
+    for name, engine in ENGINES.items():
+        start = time.perf_counter()
+        executor = engine(program, io.StringIO())
+        compiled = time.perf_counter()
+        executor.run()
+        elapsed = time.perf_counter() - compiled
+        print(f'  {name:<18}компиляция {(compiled - start) * 1000:7.2f} мс, '
+              f'выполнение {elapsed:6.3f} с, {operations / elapsed:12,.0f} оп/с')
+
+
+def main():
+    scale = float(sys.argv[1]) if len(sys.argv) > 1 else 1.0
+    measure('цикл while', *loop(int(1_000_000 * scale)))
+    measure('рекурсивный fib', *fib(20 + round(5 * scale)))
+    measure('обращение к массиву', *array_sum(int(1_000_000 * scale)))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,127 @@
+# Дифференциальная проверка и сравнение скорости движков лексера:
+# конечного автомата Lexer ('fsm') и табличного TableLexer ('table').
+# Оба движка должны выдавать одинаковый поток токенов (и одинаковые
+# ошибки) на example.sl и на случайно сгенерированных входах, в том числе
+# в режиме восстановления, когда лексер записывает ошибку и продолжает.
+# При расхождении замеры не выполняются, а код возврата - 1; с --check
+# выполняется только проверка.
+#
+#   python -m benchmarks.lexer_engines [--check] [число случайных входов] [seed]
+
+import argparse
+import random
+import sys
+import time
+
+from errors import LexerError
+from lexer import ENGINES, TableLexer, Token
+
+PIECES = [
+    'for', 'while', 'return', 'function', 'if', 'else', 'or', 'and', 'not',
+    'a', 'b1', '_tmp', 'while_', 'notx', 'переменная', 'x²', 'ñ_1',
+    '0', '7', '123', '3.14', '5.', '0.001', '²',
+    '"строка"', '""', '"a\nb"', '"  "',
+    '+', '-', '*', '/', '//', '%', '(', ')', '{', '}', '[', ']', ';', ',',
+    '=', '==', '<', '<=', '>', '>=', '!=',
+]
+SPACES = [' ', '  ', '\t', '\n', '\n\n', ' \n\t ', '']
+# фрагменты, на которых лексеры должны одинаково сообщить об ошибке
+BROKEN = ['!', '!x', '@', '"не закрыта', '12abc', '1.5_', '$', '\r']
+
+
+def generate(rng, size, broken=False, glued=True):
+    # glued: токены могут идти вплотную, без пробелов между ними
+    spaces = SPACES if glued else SPACES[:-1]
+    parts = []
+    for _ in range(size):
+        parts.append(rng.choice(PIECES))
+        parts.append(rng.choice(spaces))
+    if broken:
+        parts.insert(rng.randrange(len(parts) + 1), rng.choice(BROKEN))
+    return ''.join(parts)
+
+
+def run(engine, source, recover=False):
+    # список токенов и сообщения об ошибках: без recover - первая ошибка,
+    # прервавшая лексер, с recover - все записанные ошибки
+    tokens = []
+    errors = [] if recover else None
+    try:
+        lexer = engine(source, errors=errors)
+        while True:
+            token = lexer.get_next_token()
+            tokens.append((token.name, token.value, token.lineno, token.pos))
+            if token.name == Token.EOF:
+                break
+    except LexerError as error:
+        return tokens, [str(error)]
+    return tokens, [str(error) for error in errors or []]
+
+
+def buffered(source):
+    # TokenBuffer разбирает весь файл сразу, поэтому сравнивается только
+    # на входах без ошибок
+    try:
+        buffer = TableLexer(source).tokenize()
+    except LexerError:
+        return ENGINES['fsm']
+    return lambda source, errors=None: buffer.lexer()
+
+
+def check(source, recover=False):
+    engines = dict(ENGINES) if recover else {**ENGINES, 'buffer': buffered(source)}
+    results = {name: run(engine, source, recover) for name, engine in engines.items()}
+    expected = results['fsm']
+    for name, result in results.items():
+        if result != expected:
+            print(f'Расхождение {name} с fsm на входе {source!r}')
+            for a, b in zip(expected[0], result[0]):
+                if a != b:
+                    print(f'  fsm: {a}\n  {name}: {b}')
+                    break
+            print(f'  ошибки: {expected[1]!r} / {result[1]!r}')
+            return False
+    return True
+
+
+def benchmark(title, source):
+    print(title)
+    for name, engine in ENGINES.items():
+        best = None
+        for _ in range(3):
+            lexer = engine(source)
+            count = 1
+            start = time.process_time()
+            while lexer.get_next_token().name != Token.EOF:
+                count += 1
+            elapsed = time.process_time() - start
+            best = elapsed if best is None else min(best, elapsed)
+        print(f'  {name:<12}{count:>10} токенов {best:>8.3f} с '
+              f'{count / best:>12.0f} токенов/с')
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Дифференциальная проверка и скорость движков лексера')
+    parser.add_argument('count', nargs='?', type=int, default=2000, help='число случайных входов')
+    parser.add_argument('seed', nargs='?', type=int, default=0, help='зерно генератора')
+    parser.add_argument('--check', action='store_true', help='только проверка, без замеров скорости')
+    args = parser.parse_args(argv)
+    rng = random.Random(args.seed)
+    with open('example.sl') as f:
+        example = f.read()
+    sources = [example, '', '\n', 'a']
+    sources += [generate(rng, rng.randint(1, 60)) for _ in range(args.count)]
+    sources += [generate(rng, rng.randint(1, 20), broken=True) for _ in range(args.count // 4)]
+    failed = sum(not check(source) for source in sources)
+    failed += sum(not check(source, recover=True) for source in sources)
+    print(f'проверено входов: {len(sources)}, расхождений: {failed}')
+    if failed:
+        return 1
+    if not args.check:
+        benchmark('example.sl x 1000', (example + '\n') * 1000)
+        benchmark('случайный вход', generate(rng, 200000, glued=False))
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,94 @@
+# Сравнение скорости лексера: чтение по одному символу через file.read(1)
+# против сканирования по индексу в буфере со всем исходным текстом.
+#
+#   python -m benchmarks.lexer_input [размер в КБ]
+
+import os
+import sys
+import tempfile
+import time
+
+from lexer import Lexer, Token
+
+
+class CharAtATimeLexer(Lexer):
+    # прежний способ чтения: один вызов read(1) на каждый символ,
+    # в том числе при пропуске пробелов и чтении идентификаторов
+    def __init__(self, file, source):
+        super().__init__(source)
+        self.file = file
+
+    def _Lexer__get_next_char(self):
+        self.char = self.file.read(1)
+        self.index += 1
+        self.pos += 1
+        if self.char == '\n':
+            self.lineno += 1
+            self.pos = 1
+
+    def _Lexer__jump_to(self, end):
+        while self.index <= end:
+            self._Lexer__get_next_char()
+
+    def _Lexer__read_run(self, run, chars, predicate):
+        value = self.char
+        self._Lexer__get_next_char()
+        while predicate(self.char):
+            value += self.char
+            self._Lexer__get_next_char()
+        return value
+
+
+def make_source(size):
+    with open('example.sl') as f:
+        chunk = f.read() + ';\n'
+    return chunk * (size // len(chunk) + 1)
+
+
+def make_long_runs_source(size):
+    # длинные идентификаторы, строки и отступы
+    chunk = ('\n'.join(' ' * 16 + f'variable_with_long_name_{i} = "{"x" * 60}";'
+                       for i in range(100)) + '\n')
+    return chunk * (size // len(chunk) + 1)
+
+
+def count_tokens(lexer):
+    count = 1
+    while lexer.get_next_token().name != Token.EOF:
+        count += 1
+    return count
+
+
+def measure(name, make_lexer, size):
+    start = time.perf_counter()
+    count = count_tokens(make_lexer())
+    elapsed = time.perf_counter() - start
+    print(f'{name:<24}{count:>10} токенов {elapsed:>8.3f} с '
+          f'{size / elapsed / 2**20:>8.2f} МБ/с')
+    return elapsed
+
+
+def compare(title, source):
+    print(title)
+    with tempfile.NamedTemporaryFile('w', suffix='.sl', delete=False) as f:
+        f.write(source)
+    try:
+        with open(f.name) as file:
+            old = measure('file.read(1)', lambda: CharAtATimeLexer(file, source), len(source))
+        with open(f.name) as file:
+            new = measure('буфер (файл)', lambda: Lexer(file), len(source))
+        measure('буфер (str)', lambda: Lexer(source), len(source))
+        measure('буфер (bytes)', lambda: Lexer(source.encode()), len(source))
+    finally:
+        os.unlink(f.name)
+    print(f'ускорение: {old / new:.2f}x\n')
+
+
+def main():
+    size = int(sys.argv[1]) * 1024 if len(sys.argv) > 1 else 1 << 20
+    compare('example.sl', make_source(size))
+    compare('длинные идентификаторы и строки', make_long_runs_source(size))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,133 @@
+# Оптимизация циклов (LoopOptimizer из optimizer.py) на программах с
+# тяжёлыми циклами: адресная арифметика в двойном цикле, многочлен от
+# счётчика и цикл в функции. Для каждой программы выводится число узлов,
+# вычисляемых за итерацию, до и после прохода и время выполнения на
+# замыканиях и стековой машине после свёртки констант и удаления мёртвого
+# кода - без оптимизации циклов и с ней.
+#
+#   python -m benchmarks.loop_optimizer [масштаб]
+
+import io
+import sys
+import time
+
+import bytecode
+from interpreter import Interpreter
+from lexer import TableLexer
+from optimizer import ConstantFolder, DeadCodeEliminator, LoopOptimizer
+from semantic import analyze
+from slparser import Parser
+from vm import VirtualMachine
+
+ENGINES = {
+    'замыкания'        : Interpreter,
+    'стековая машина'  : lambda program, out: VirtualMachine(bytecode.compile_program(program), out),
+}
+
+
+def matrix(n):
+    width = 100
+    height = max(1, n // width)
+    return f'''
+int[{width * height}] p;
+int w;
+int h;
+int i;
+int j;
+int s;
+w = {width};
+h = {height};
+i = 0;
+while i < h {{
+    j = 0;
+    while j < w {{
+        s = s + p[i * w + j] + i * w * 2;
+        j = j + 1;
+    }};
+    i = i + 1;
+}};
+print(s);
+'''
+
+
+def polynomial(n):
+    return f'''
+int i;
+int n;
+int a;
+int b;
+int s;
+float x;
+n = {n};
+a = 3;
+b = 5;
+i = 0;
+while i < n {{
+    s = s + i * 7 + i * 7 * a - a * b;
+    x = x + a * b * 0.5;
+    i = i + 2;
+}};
+print(s);
+print(x);
+'''
+
+
+def function(n):
+    return f'''
+function int total(int n, int step) {{
+    int i;
+    int t;
+    i = 0;
+    while i < n {{
+        t = t + i * step + (i * step) % 3 + step * step;
+        i = i + 1;
+    }};
+    return t;
+}};
+print(total({n}, 4));
+'''
+
+
+def prepare(source, loops):
+    program = Parser(TableLexer(source)).parse()
+    analyze(program)
+    ConstantFolder(typed=True).fold(program)
+    DeadCodeEliminator(typed=True).eliminate(program)
+    if loops is not None:
+        loops.optimize(program)
+    # проходы сбрасывают разметку номеров переменных, а исполнители быстрее
+    # с ней
+    analyze(program)
+    return program
+
+
+def measure(title, source):
+    print(title)
+    loops = LoopOptimizer()
+    programs = {False: prepare(source, None), True: prepare(source, loops)}
+    print(f'  {loops.report()}')
+    for name, engine in ENGINES.items():
+        times = {}
+        outputs = set()
+        for optimized, program in programs.items():
+            out = io.StringIO()
+            executor = engine(program, out)
+            start = time.perf_counter()
+            executor.run()
+            times[optimized] = time.perf_counter() - start
+            outputs.add(out.getvalue())
+        if len(outputs) != 1:
+            raise AssertionError(f'{title}: результаты с оптимизацией циклов и без неё различаются')
+        print(f'  {name:<18}без оптимизации {times[False]:6.3f} с, с оптимизацией {times[True]:6.3f} с, '
+              f'ускорение {times[False] / times[True]:5.2f}x')
+
+
+def main():
+    scale = float(sys.argv[1]) if len(sys.argv) > 1 else 1.0
+    measure('адресная арифметика в двойном цикле', matrix(int(300_000 * scale)))
+    measure('многочлен от счётчика', polynomial(int(600_000 * scale)))
+    measure('цикл в функции', function(int(300_000 * scale)))
+
+
+if __name__ == '__main__':
+    main()
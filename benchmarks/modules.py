@@ -0,0 +1,100 @@
+# Раздельная сборка (slbuild.py) проекта из многих модулей. Модули
+# строятся генератором из benchmarks/generator.py с уникальными для
+# модуля именами; каждый импортирует несколько предыдущих модулей и
+# вызывает их функции. Измеряется время полной сборки в один процесс и
+# параллельно, повторной сборки без изменений, правки тела одного модуля
+# (интерфейс не меняется, разбирается только он) и правки его интерфейса
+# (кроме него проверяются заново прямые импортёры).
+#
+#   python -m benchmarks.modules [--modules 200] [--size 16K] [--imports 3] [--seed 0] [-j N]
+
+import argparse
+import os
+import random
+import tempfile
+import time
+
+from benchmarks.generator import Generator, parse_size
+from slbuild import Build
+
+
+class ModuleGenerator(Generator):
+    # имена с номером модуля не пересекаются с именами других модулей
+    def __init__(self, module, seed=0, shape='mixed'):
+        super().__init__(seed, shape)
+        self.module = module
+
+    def name(self, prefix):
+        return super().name(f'm{self.module}_{prefix}')
+
+
+def module_name(index):
+    return f'm{index:04}.sl'
+
+
+def make_project(directory, count, size, imports, seed):
+    # файлы модулей в directory; возвращает индекс модуля с наибольшим
+    # числом импортёров
+    rng = random.Random(seed)
+    functions = []
+    importers = [0] * count
+    for index in range(count):
+        generator = ModuleGenerator(index, seed + index)
+        body = generator.generate(size)
+        used = sorted(rng.sample(range(index), min(index, rng.randint(1, imports))))
+        lines = [f'import "{module_name(other)}";' for other in used]
+        lines.append(body)
+        for other in used:
+            importers[other] += 1
+            if functions[other]:
+                name, params = functions[other][0]
+                lines.append(f'int m{index}_use{other};')
+                lines.append(f'm{index}_use{other} = {name}({", ".join(["1"] * params)});')
+        functions.append(generator.functions)
+        with open(os.path.join(directory, module_name(index)), 'w') as f:
+            f.write('\n'.join(lines) + '\n')
+    return max(range(count), key=importers.__getitem__), max(importers)
+
+
+def append(path, text):
+    with open(path, 'a') as f:
+        f.write(text)
+
+
+def timed_build(title, directory, paths, jobs):
+    start = time.perf_counter()
+    build = Build(os.path.join(directory, '.slbuild'), jobs)
+    modules = build.build(paths)
+    elapsed = time.perf_counter() - start
+    failed = sum(bool(module.syntax or module.errors) for module in modules.values())
+    print(f'  {title:<30}{elapsed * 1000:10.1f} мс, разобрано {build.parsed:>5}, проверено {build.checked:>5}'
+          f'{f", с ошибками {failed}" if failed else ""}')
+    return elapsed
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Раздельная сборка проекта из многих модулей')
+    parser.add_argument('--modules', type=int, default=200, help='число модулей')
+    parser.add_argument('--size', default='16K', help='размер модуля в символах (16K)')
+    parser.add_argument('--imports', type=int, default=3, help='наибольшее число импортов модуля')
+    parser.add_argument('--seed', type=int, default=0, help='зерно генератора')
+    parser.add_argument('-j', '--jobs', type=int, default=None, help='число рабочих процессов параллельной сборки')
+    args = parser.parse_args(argv)
+
+    with tempfile.TemporaryDirectory() as directory:
+        hub, importers = make_project(directory, args.modules, parse_size(args.size), args.imports, args.seed)
+        paths = [os.path.join(directory, module_name(index)) for index in range(args.modules)]
+        print(f'модулей: {args.modules} по {args.size} символов, '
+              f'у модуля {module_name(hub)} импортёров: {importers}')
+        timed_build('полная, один процесс', directory, paths, 1)
+        os.remove(os.path.join(directory, '.slbuild', 'manifest.json'))
+        timed_build('полная, параллельно', directory, paths, args.jobs)
+        timed_build('без изменений', directory, paths, args.jobs)
+        append(paths[hub], 'print(1);\n')
+        timed_build('правка тела модуля', directory, paths, args.jobs)
+        append(paths[hub], f'int m{hub}_extra;\n')
+        timed_build('правка интерфейса модуля', directory, paths, args.jobs)
+
+
+if __name__ == '__main__':
+    main()
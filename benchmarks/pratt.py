@@ -0,0 +1,100 @@
+# Разбор выражений по таблице сил связывания (PrattParser) против
+# рекурсивного спуска (Parser) на программах из benchmarks/generator.py с
+# длинными цепочками операций и скобками. Для каждой формы проверяется, что
+# деревья совпадают, и выводится лучшее время лексера, разбора обоими
+# парсерами и разбора без лексера (разность с временем лексера). Затем
+# выражение со всё более глубокой вложенностью скобок разбирается обоими
+# парсерами при стандартном пределе рекурсии: рекурсивный спуск падает с
+# RecursionError, PrattParser держит вложенные уровни в явном стеке.
+#
+#   python -m benchmarks.pratt [--size 256K] [--shapes expressions,mixed] [--seed 0] [--repeat 5]
+
+import argparse
+import gc
+import io
+import sys
+import time
+
+from benchmarks.generator import SHAPES, Generator, parse_size
+from lexer import TableLexer
+from slparser import PrattParser, Parser
+
+# глубокая вложенность if и while в формах генератора разбирается рекурсивно
+RECURSION_LIMIT = 20000
+
+# глубины скобок для проверки вложенности
+DEPTHS = (100, 1000, 10_000, 100_000)
+
+
+def best_time(function, repeat):
+    # сборщик мусора на время замера отключается: его проходы по растущему
+    # дереву разбора случайно попадают в тот или иной повтор
+    best = None
+    for _ in range(repeat):
+        gc.collect()
+        gc.disable()
+        try:
+            start = time.perf_counter()
+            function()
+            elapsed = time.perf_counter() - start
+        finally:
+            gc.enable()
+        best = elapsed if best is None else min(best, elapsed)
+    return best
+
+
+def tree(parser_class, source):
+    out = io.StringIO()
+    parser_class(TableLexer(source)).parse().write(out)
+    return out.getvalue()
+
+
+def measure(shape, size, seed, repeat):
+    source = Generator(seed, shape).generate(size)
+    if tree(Parser, source) != tree(PrattParser, source):
+        raise AssertionError(f'{shape}: деревья разбора Parser и PrattParser различаются')
+    tokens = len(TableLexer(source).tokenize())
+    lex = best_time(lambda: TableLexer(source).tokenize(), repeat)
+    times = {cls: best_time(lambda: cls(TableLexer(source)).parse(), repeat) for cls in (Parser, PrattParser)}
+    print(f'{shape}: {len(source) / 1024:.0f} КБ, токенов {tokens:,}, лексер {lex * 1000:.1f} мс')
+    for cls, elapsed in times.items():
+        print(f'  {cls.__name__:<12}разбор {elapsed * 1000:8.1f} мс, без лексера {(elapsed - lex) * 1000:8.1f} мс')
+    recursive, pratt = times[Parser] - lex, times[PrattParser] - lex
+    print(f'  ускорение: разбор {times[Parser] / times[PrattParser]:.2f}x, без лексера {recursive / pratt:.2f}x')
+
+
+def nesting(limit):
+    print(f'вложенные скобки при пределе рекурсии {limit}:')
+    for depth in DEPTHS:
+        source = 'int x;\nx = ' + '(' * depth + '1 + x' + ')' * depth + ';\n'
+        results = []
+        for cls in (Parser, PrattParser):
+            try:
+                cls(TableLexer(source)).parse()
+                results.append(f'{cls.__name__} разобран')
+            except RecursionError:
+                results.append(f'{cls.__name__} RecursionError')
+        print(f'  глубина {depth:>7,}: {", ".join(results)}')
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Разбор выражений по таблице сил связывания')
+    parser.add_argument('--size', default='256K', help='размер каждой программы в символах (256K, 10M)')
+    parser.add_argument('--shapes', default='expressions,mixed', help='формы программ через запятую')
+    parser.add_argument('--seed', type=int, default=0, help='зерно генератора')
+    parser.add_argument('--repeat', type=int, default=5, help='число повторов для измерения времени')
+    args = parser.parse_args(argv)
+
+    shapes = args.shapes.split(',')
+    for shape in shapes:
+        if shape not in SHAPES:
+            parser.error(f'неизвестная форма {shape}, есть: {", ".join(SHAPES)}')
+    limit = sys.getrecursionlimit()
+    nesting(limit)
+    sys.setrecursionlimit(max(limit, RECURSION_LIMIT))
+    for shape in shapes:
+        measure(shape, parse_size(args.size), args.seed, args.repeat)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,228 @@
+# Набор бенчмарков фаз компиляции на программах из benchmarks/generator.py.
+# Для каждой формы программы заданного размера измеряются лексер
+# (токенов/с), парсер и семантический анализ (узлов/с): время - лучшее из
+# нескольких повторов, пиковая память - отдельным прогоном под
+# tracemalloc. Результаты сохраняются в JSON и сравниваются с сохранённым
+# базовым прогоном (baseline.json рядом с этим файлом): падение скорости
+# или рост памяти на единицу (токен или узел) больше допуска считается
+# регрессией, и код возврата - 1.
+#
+#   python -m benchmarks.suite [--size 256K] [--shapes mixed,nested] [--seed 0]
+#                              [--output результаты.json] [--baseline файл] [--save-baseline]
+
+import argparse
+import gc
+import json
+import os
+import platform
+import sys
+import time
+import tracemalloc
+
+from benchmarks.generator import SHAPES, Generator, parse_size
+from lexer import TableLexer
+from optimizer import count_nodes
+from semantic import analyze
+from slparser import Parser
+
+FORMAT = 'sl-bench'
+VERSION = 1
+
+BASELINE = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'baseline.json')
+
+# глубокая вложенность if/while и скобок разбирается рекурсивно
+RECURSION_LIMIT = 20000
+
+# короткие фазы повторяются, пока суммарное время меньше MIN_TIME секунд
+MIN_TIME = 0.2
+
+# рост пика памяти меньше MEMORY_NOISE байт регрессией не считается
+MEMORY_NOISE = 64 * 2**10
+
+# фаза: (название, единица скорости)
+PHASES = {
+    'lex'       : ('лексер', 'tokens'),
+    'parse'     : ('парсер', 'nodes'),
+    'semantic'  : ('семантика', 'nodes'),
+}
+
+# единица: (родительный падеж множественного числа, единственное число)
+UNITS = {'tokens': ('токенов', 'токен'), 'nodes': ('узлов', 'узел')}
+
+
+def lex(source, program):
+    return TableLexer(source).tokenize()
+
+
+def parse(source, program):
+    return Parser(TableLexer(source)).parse()
+
+
+def semantic(source, program):
+    return analyze(program)
+
+
+RUNNERS = {'lex': lex, 'parse': parse, 'semantic': semantic}
+
+
+def timed(runner, source, program, repeat):
+    # лучшее время из не менее чем repeat прогонов общим временем от MIN_TIME
+    best = None
+    total = 0.0
+    runs = 0
+    while runs < repeat or total < MIN_TIME:
+        gc.collect()
+        start = time.perf_counter()
+        runner(source, program)
+        elapsed = time.perf_counter() - start
+        best = elapsed if best is None else min(best, elapsed)
+        total += elapsed
+        runs += 1
+    return best
+
+
+def peak_memory(runner, source, program):
+    # пик памяти, выделенной за прогон (исходный текст и дерево, построенные
+    # заранее, не учитываются)
+    gc.collect()
+    tracemalloc.start()
+    try:
+        runner(source, program)
+        return tracemalloc.get_traced_memory()[1]
+    finally:
+        tracemalloc.stop()
+
+
+def measure(shape, size, seed, repeat):
+    generator = Generator(seed, shape)
+    source = generator.generate(size)
+    tokens = len(TableLexer(source).tokenize())
+    program = Parser(TableLexer(source)).parse()
+    counts = {'tokens': tokens, 'nodes': count_nodes(program)}
+    case = {'chars': len(source), **counts, 'depth': generator.max_depth, 'phases': {}}
+    for phase, runner in RUNNERS.items():
+        unit = PHASES[phase][1]
+        seconds = timed(runner, source, program, repeat)
+        peak = peak_memory(runner, source, program)
+        case['phases'][phase] = {
+            'seconds'       : seconds,
+            'unit'          : unit,
+            'rate'          : counts[unit] / seconds,
+            'chars_rate'    : len(source) / seconds,
+            'peak_bytes'    : peak,
+            'bytes_per_unit': peak / counts[unit],
+        }
+    return case
+
+
+def run(shapes, size, seed, repeat):
+    results = {
+        'format'    : FORMAT,
+        'version'   : VERSION,
+        'python'    : platform.python_version(),
+        'machine'   : platform.machine(),
+        'size'      : size,
+        'seed'      : seed,
+        'repeat'    : repeat,
+        'cases'     : {},
+    }
+    for shape in shapes:
+        case = results['cases'][shape] = measure(shape, size, seed, repeat)
+        print(f'{shape}: {case["chars"] / 2**20:.2f} МБ, токенов {case["tokens"]:,}, узлов {case["nodes"]:,}, '
+              f'вложенность {case["depth"]}')
+        for phase, data in case['phases'].items():
+            title, unit = PHASES[phase]
+            print(f'  {title:<11}{data["seconds"]:8.3f} с {data["rate"]:>14,.0f} {UNITS[unit][0]}/с '
+                  f'{data["chars_rate"] / 2**20:7.2f} МБ/с  пик памяти {data["peak_bytes"] / 2**20:8.1f} МБ '
+                  f'({data["bytes_per_unit"]:.0f} Б на {UNITS[unit][1]})')
+    return results
+
+
+def compare(results, baseline, tolerance):
+    # строки сравнения с baseline и число регрессий
+    lines = []
+    regressions = 0
+    for shape, case in results['cases'].items():
+        base = baseline['cases'].get(shape)
+        if base is None:
+            lines.append(f'{shape}: нет в базовом прогоне')
+            continue
+        if (base['chars'], base['tokens']) != (case['chars'], case['tokens']):
+            lines.append(f'{shape}: программа отличается от базовой (другие размер, зерно или генератор), '
+                         f'сравниваются величины на единицу')
+        for phase, data in case['phases'].items():
+            old = base['phases'].get(phase)
+            if old is None:
+                continue
+            title = PHASES[phase][0]
+            speed = data['rate'] / old['rate'] - 1
+            # пик памяти базового прогона в пересчёте на размер нового
+            expected = old['bytes_per_unit'] * case[data['unit']]
+            memory = data['peak_bytes'] / max(expected, 1) - 1
+            problems = []
+            if speed < -tolerance:
+                problems.append('медленнее')
+            if memory > tolerance and data['peak_bytes'] - expected > MEMORY_NOISE:
+                problems.append('больше памяти')
+            regressions += bool(problems)
+            mark = f'  РЕГРЕССИЯ: {", ".join(problems)}' if problems else ''
+            lines.append(f'{shape} {title}: скорость {speed:+7.1%}, память на единицу {memory:+7.1%}{mark}')
+    return lines, regressions
+
+
+def load(path):
+    with open(path) as f:
+        data = json.load(f)
+    if data.get('format') != FORMAT or data.get('version') != VERSION:
+        raise ValueError(f'{path}: неизвестный формат результатов')
+    return data
+
+
+def save(results, path):
+    with open(path, 'w') as f:
+        json.dump(results, f, indent=1, ensure_ascii=False)
+        f.write('\n')
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Бенчмарки лексера, парсера и семантического анализа')
+    parser.add_argument('--size', default='256K', help='размер каждой программы в символах (256K, 10M)')
+    parser.add_argument('--shapes', default=','.join(SHAPES), help='формы программ через запятую')
+    parser.add_argument('--seed', type=int, default=0, help='зерно генератора')
+    parser.add_argument('--repeat', type=int, default=3, help='число повторов для измерения времени')
+    parser.add_argument('--output', default=None, help='файл JSON для результатов')
+    parser.add_argument('--baseline', default=BASELINE, help='файл базового прогона')
+    parser.add_argument('--save-baseline', action='store_true', help='записать результаты как базовый прогон')
+    parser.add_argument('--tolerance', type=float, default=0.2,
+                        help='допустимое относительное ухудшение (по умолчанию 0.2)')
+    args = parser.parse_args(argv)
+
+    shapes = args.shapes.split(',')
+    for shape in shapes:
+        if shape not in SHAPES:
+            parser.error(f'неизвестная форма {shape}, есть: {", ".join(SHAPES)}')
+    if sys.getrecursionlimit() < RECURSION_LIMIT:
+        sys.setrecursionlimit(RECURSION_LIMIT)
+
+    results = run(shapes, parse_size(args.size), args.seed, args.repeat)
+    if args.output is not None:
+        save(results, args.output)
+    if args.save_baseline:
+        save(results, args.baseline)
+        print(f'базовый прогон записан в {args.baseline}')
+        return 0
+    if not os.path.exists(args.baseline):
+        print(f'базового прогона {args.baseline} нет, сравнение пропущено')
+        return 0
+    lines, regressions = compare(results, load(args.baseline), args.tolerance)
+    print(f'сравнение с {args.baseline}:')
+    for line in lines:
+        print(f'  {line}')
+    if regressions:
+        print(f'регрессий: {regressions}')
+        return 1
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,60 @@
+# Память на один токен: список объектов Token (с __dict__, как было раньше,
+# и со __slots__) против компактного TokenBuffer.
+#
+#   python -m benchmarks.token_memory [число копий example.sl]
+
+import sys
+import time
+import tracemalloc
+
+from lexer import TableLexer, Token
+
+
+class DictToken:
+    # Token до перехода на __slots__
+    def __init__(self, token, value, lineno, pos):
+        self.name = token
+        self.value = value
+        self.lineno = lineno
+        self.pos = pos
+
+
+def as_dict_tokens(source):
+    return [DictToken(t.name, t.value, t.lineno, t.pos) for t in TableLexer(source).tokens()]
+
+
+def as_slots_tokens(source):
+    return list(TableLexer(source).tokens())
+
+
+def as_buffer(source):
+    buffer = TableLexer(source).tokenize()
+    buffer.line_starts
+    return buffer
+
+
+def measure(name, build, source):
+    tracemalloc.start()
+    start = time.perf_counter()
+    result = build(source)
+    elapsed = time.perf_counter() - start
+    size = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+    count = len(result)
+    print(f'{name:<22}{count:>10} токенов {size / 2**20:>9.1f} МБ '
+          f'{size / count:>7.1f} Б/токен {elapsed:>7.2f} с')
+    return size / count
+
+
+def main():
+    copies = int(sys.argv[1]) if len(sys.argv) > 1 else 3000
+    with open('example.sl') as f:
+        source = (f.read() + '\n') * copies
+    before = measure('Token с __dict__', as_dict_tokens, source)
+    measure('Token со __slots__', as_slots_tokens, source)
+    after = measure('TokenBuffer', as_buffer, source)
+    print(f'экономия: {before / after:.1f}x')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,510 @@
+import marshal
+import operator
+import sys
+from array import array
+from bisect import bisect_right
+
+from errors import CompileError
+from runtime import (DEFAULTS, builtins, default_value, first_token, is_array, literal_values, new_array,
+                     statements, type_name, unchecked_index)
+from slparser import (NodeAnd, NodeAssigning, NodeDeclaration, NodeDivision, NodeEQ,
+                      NodeFloatLiteral, NodeFunction, NodeFunctionCall, NodeG, NodeGE,
+                      NodeIDivision, NodeIfConstruction, NodeIndexAccess, NodeIntLiteral,
+                      NodeL, NodeLE, NodeMinus, NodeMod, NodeMultiply, NodeNEQ, NodeNot,
+                      NodeOr, NodePlus, NodeReturnStatement, NodeSequence, NodeStringLiteral,
+                      NodeUnaryMinus, NodeVar, NodeWhileConstruction)
+
+# Компиляция дерева разбора в байт-код для стековой машины vm.py.
+#
+# Код функции - массив целых array('i'), в котором каждая инструкция
+# занимает два элемента: код операции из Op и аргумент. Аргумент - номер
+# константы в пуле функции, номер переменной, адрес перехода (индекс в
+# массиве) и т.п. Переходы вперёд записываются с нулевым адресом и
+# исправляются, когда адрес становится известен.
+#
+# Переменные и функции разрешаются так же, как в interpreter.py: объявления
+# глобальных переменных и функции верхнего уровня действуют с начала
+# программы, локальные переменные функции - её параметры и все объявленные
+# в ней переменные. Вызовы функций идут через ячейки: повторное объявление
+# функции с тем же именем подменяет её в ячейке.
+#
+# Файл байт-кода: MAGIC, затем marshal от кортежа из версии формата,
+# функций, ячеек и глобальных переменных; коды функций записываются
+# байтами массивов.
+
+MAGIC = b'SLBC'
+VERSION = 3
+
+# коды операций
+LOAD_CONST, LOAD_LOCAL, LOAD_GLOBAL, LOAD_GLOBAL_CHECKED,\
+STORE_LOCAL, STORE_GLOBAL, BINARY, BINARY_CONST, NEGATE, NOT, INDEX,\
+JUMP, POP_JUMP_IF_FALSE, POP_JUMP_IF_TRUE,\
+JUMP_IF_FALSE_OR_POP, JUMP_IF_TRUE_OR_POP,\
+CALL, CALL_BUILTIN, POP, RETURN, RETURN_NONE,\
+MAKE_ARRAY, ASSIGN_SEQUENCE, DEFINE,\
+INDEX_UNCHECKED, ASSIGN_CONSTANT = range(26)
+
+OP_NAMES = {
+    LOAD_CONST           : "LOAD_CONST",
+    LOAD_LOCAL           : "LOAD_LOCAL",
+    LOAD_GLOBAL          : "LOAD_GLOBAL",
+    LOAD_GLOBAL_CHECKED  : "LOAD_GLOBAL_CHECKED",
+    STORE_LOCAL          : "STORE_LOCAL",
+    STORE_GLOBAL         : "STORE_GLOBAL",
+    BINARY               : "BINARY",
+    BINARY_CONST         : "BINARY_CONST",
+    NEGATE               : "NEGATE",
+    NOT                  : "NOT",
+    INDEX                : "INDEX",
+    JUMP                 : "JUMP",
+    POP_JUMP_IF_FALSE    : "POP_JUMP_IF_FALSE",
+    POP_JUMP_IF_TRUE     : "POP_JUMP_IF_TRUE",
+    JUMP_IF_FALSE_OR_POP : "JUMP_IF_FALSE_OR_POP",
+    JUMP_IF_TRUE_OR_POP  : "JUMP_IF_TRUE_OR_POP",
+    CALL                 : "CALL",
+    CALL_BUILTIN         : "CALL_BUILTIN",
+    POP                  : "POP",
+    RETURN               : "RETURN",
+    RETURN_NONE          : "RETURN_NONE",
+    MAKE_ARRAY           : "MAKE_ARRAY",
+    ASSIGN_SEQUENCE      : "ASSIGN_SEQUENCE",
+    DEFINE               : "DEFINE",
+    INDEX_UNCHECKED      : "INDEX_UNCHECKED",
+    ASSIGN_CONSTANT      : "ASSIGN_CONSTANT",
+}
+
+JUMPS = {JUMP, POP_JUMP_IF_FALSE, POP_JUMP_IF_TRUE, JUMP_IF_FALSE_OR_POP, JUMP_IF_TRUE_OR_POP}
+
+# бинарные операторы: аргумент BINARY - номер оператора в этом списке
+BINARY_OPERATORS = (
+    (NodePlus      , '+' , operator.add),
+    (NodeMinus     , '-' , operator.sub),
+    (NodeMultiply  , '*' , operator.mul),
+    (NodeDivision  , '/' , operator.truediv),
+    (NodeIDivision , '//', operator.floordiv),
+    (NodeMod       , '%' , operator.mod),
+    (NodeL         , '<' , operator.lt),
+    (NodeG         , '>' , operator.gt),
+    (NodeLE        , '<=', operator.le),
+    (NodeGE        , '>=', operator.ge),
+    (NodeEQ        , '==', operator.eq),
+    (NodeNEQ       , '!=', operator.ne),
+)
+BINARY_INDEX = {cls: n for n, (cls, _, _) in enumerate(BINARY_OPERATORS)}
+# у BINARY_CONST в младших битах аргумента - номер оператора, в
+# остальных - номер константы правого операнда
+OPERATOR_BITS = 4
+OPERATOR_MASK = (1 << OPERATOR_BITS) - 1
+
+# встроенные функции: аргумент CALL_BUILTIN - номер в этом списке
+BUILTINS = tuple(builtins(None))
+
+# у CALL и CALL_BUILTIN в младшем байте аргумента - число аргументов
+# вызова, в остальных - номер ячейки или встроенной функции
+ARGC_BITS = 8
+MAX_ARGS = (1 << ARGC_BITS) - 1
+
+def type_spec(type_node):
+    # описание значения по умолчанию, которое можно записать в файл:
+    # ('value', значение) или ('array', элемент, размер)
+    value = default_value(type_node)
+    if is_array(value):
+        return ('array', DEFAULTS[type_name(type_node)], len(value))
+    return ('value', value)
+
+def constant_key(value):
+    # ключ значения в пуле констант: равные значения разных типов (1 и 1.0)
+    # и нули 0.0 и -0.0, которые равны, но печатаются по-разному, - разные
+    # константы, в том числе внутри кортежей
+    if isinstance(value, tuple):
+        return (tuple, *map(constant_key, value))
+    if isinstance(value, float):
+        return (float, repr(value))
+    return (type(value), value)
+
+def make_value(spec):
+    if spec[0] == 'array':
+        return new_array(spec[1], spec[2])
+    return spec[1]
+
+class Code:
+    # байт-код одной функции (или программы верхнего уровня, cell == -1).
+    # locals - (имя, описание значения) для каждой локальной переменной,
+    # первые params из них - параметры; result - описание значения,
+    # которое функция возвращает без return; memo - размер кэша
+    # мемоизации или 0. lines - адреса начала инструкций SL, positions -
+    # их (строка, позиция) подряд.
+    __slots__ = ('name', 'params', 'locals', 'result', 'cell', 'memo', 'ops', 'consts', 'lines', 'positions')
+
+    def __init__(self, name, params=0, locals=(), result=None, cell=-1, memo=0):
+        self.name = name
+        self.params = params
+        self.locals = list(locals)
+        self.result = result
+        self.memo = memo
+        self.cell = cell
+        self.ops = array('i')
+        self.consts = []
+        self.lines = array('i')
+        self.positions = array('i')
+
+    def position(self, pc):
+        # строка и позиция инструкции SL, в которую входит адрес pc
+        k = bisect_right(self.lines, pc) - 1
+        if k < 0:
+            return 0, 0
+        return self.positions[2 * k], self.positions[2 * k + 1]
+
+class Module:
+    # скомпилированная программа: main, функции, ячейки функций
+    # (имя, номер функции в начале программы или -1) и глобальные
+    # переменные (имя, описание значения или None для необъявленных)
+    __slots__ = ('main', 'functions', 'cells', 'globals')
+
+    def __init__(self, main, functions, cells, globals):
+        self.main = main
+        self.functions = functions
+        self.cells = cells
+        self.globals = globals
+
+class BytecodeCompiler:
+    def __init__(self):
+        self.functions = []
+        self.function_index = {}
+        self.cells = {}
+        self.cell_functions = []
+        self.global_slots = {}
+        self.globals = []
+        self.declared = set()
+        # текущая функция: код, локальные переменные и пул констант
+        self.code = None
+        self.scope = None
+        self.pool = None
+
+    def compile(self, program):
+        for statement in statements(program.children):
+            if isinstance(statement, NodeDeclaration):
+                name = statement.id.value
+                if name not in self.declared:
+                    self.declared.add(name)
+                    self.globals[self.global_slot(name)] = (name, type_spec(statement.type))
+        stack = list(program.children)
+        while stack:
+            node = stack.pop()
+            if isinstance(node, NodeFunction):
+                self.cell(node.id.value)
+                stack.extend(node.block.children)
+            elif isinstance(node, NodeIfConstruction):
+                stack.extend(node.block.children)
+                stack.extend(node.else_block.children)
+            elif isinstance(node, NodeWhileConstruction):
+                stack.extend(node.block.children)
+        for statement in program.children:
+            if isinstance(statement, NodeFunction):
+                self.cell_functions[self.cells[statement.id.value]] = self.function(statement)
+        main = self.enter(Code('<program>'), None)
+        self.block(program.children)
+        self.emit(RETURN_NONE)
+        cells = list(zip(self.cells, self.cell_functions))
+        return Module(main, self.functions, cells, self.globals)
+
+    # имена
+
+    def global_slot(self, name):
+        slot = self.global_slots.get(name)
+        if slot is None:
+            slot = self.global_slots[name] = len(self.globals)
+            self.globals.append((name, None))
+        return slot
+
+    def cell(self, name):
+        cell = self.cells.get(name)
+        if cell is None:
+            cell = self.cells[name] = len(self.cell_functions)
+            self.cell_functions.append(-1)
+        return cell
+
+    # код
+
+    def enter(self, code, scope):
+        self.code, self.scope, self.pool = code, scope, {}
+        return code
+
+    def emit(self, op, arg=0):
+        # добавляет инструкцию; возвращает индекс её аргумента для исправления
+        self.code.ops.append(op)
+        self.code.ops.append(arg)
+        return len(self.code.ops) - 1
+
+    def label(self):
+        return len(self.code.ops)
+
+    def patch(self, at, target=None):
+        self.code.ops[at] = self.label() if target is None else target
+
+    def constant(self, value, kind=None):
+        # номер константы в пуле; одинаковые константы хранятся один раз, а
+        # kind различает одинаковые значения с разным назначением
+        key = (kind, constant_key(value))
+        index = self.pool.get(key)
+        if index is None:
+            index = self.pool[key] = len(self.code.consts)
+            self.code.consts.append(value)
+        return index
+
+    def mark(self, node):
+        token = first_token(node)
+        self.code.lines.append(self.label())
+        self.code.positions.extend((token.lineno, token.pos) if token is not None else (0, 0))
+
+    def load(self, name, checked=True):
+        if self.scope is not None and name in self.scope:
+            self.emit(LOAD_LOCAL, self.scope[name])
+        elif checked and name not in self.declared:
+            self.emit(LOAD_GLOBAL_CHECKED, self.global_slot(name))
+        else:
+            self.emit(LOAD_GLOBAL, self.global_slot(name))
+
+    def store(self, name):
+        if self.scope is not None and name in self.scope:
+            self.emit(STORE_LOCAL, self.scope[name])
+        else:
+            self.emit(STORE_GLOBAL, self.global_slot(name))
+
+    # функции и инструкции
+
+    def function(self, node):
+        index = self.function_index.get(id(node))
+        if index is not None:
+            return index
+        params = node.formal_params.params
+        scope = {}
+        local_specs = []
+        for declaration in [*params, *statements(node.block.children)]:
+            if isinstance(declaration, NodeDeclaration) and declaration.id.value not in scope:
+                scope[declaration.id.value] = len(local_specs)
+                local_specs.append((declaration.id.value, type_spec(declaration.type)))
+        code = Code(node.id.value, len(params), local_specs, type_spec(node.ret_type), self.cell(node.id.value),
+                    node.memo or 0)
+        index = self.function_index[id(node)] = len(self.functions)
+        self.functions.append(code)
+        saved = self.code, self.scope, self.pool
+        self.enter(code, scope)
+        self.block(node.block.children)
+        self.emit(RETURN_NONE)
+        self.code, self.scope, self.pool = saved
+        return index
+
+    def block(self, nodes):
+        for node in nodes:
+            if node is not None:
+                self.mark(node)
+                self.statement(node)
+
+    def statement(self, node):
+        match node:
+            case NodeDeclaration():
+                spec = type_spec(node.type)
+                if spec[0] == 'array':
+                    self.emit(MAKE_ARRAY, self.constant(spec[1:]))
+                else:
+                    self.emit(LOAD_CONST, self.constant(spec[1]))
+                self.store(node.id.value)
+            case NodeAssigning():
+                name = node.left_side.id.value
+                if isinstance(node.right_side, NodeSequence):
+                    members = node.right_side.members
+                    self.load(name, checked=False)
+                    values = literal_values(node.right_side)
+                    if values is not None:
+                        # последовательность из литералов - одна константа,
+                        # которая копируется в массив целиком
+                        values = tuple(values)
+                        self.emit(ASSIGN_CONSTANT, self.constant(values, 'sequence'))
+                    else:
+                        for member in members:
+                            self.expression(member)
+                        self.emit(ASSIGN_SEQUENCE, len(members))
+                else:
+                    self.expression(node.right_side)
+                self.store(name)
+            case NodeFunctionCall():
+                self.expression(node)
+                self.emit(POP)
+            case NodeFunction():
+                self.emit(DEFINE, self.function(node))
+            case NodeIfConstruction():
+                self.expression(node.condition)
+                skip = self.emit(POP_JUMP_IF_FALSE)
+                self.block(node.block.children)
+                if node.else_block.children:
+                    end = self.emit(JUMP)
+                    self.patch(skip)
+                    self.block(node.else_block.children)
+                    self.patch(end)
+                else:
+                    self.patch(skip)
+            case NodeWhileConstruction():
+                # условие проверяется в конце цикла: один переход на итерацию
+                check = self.emit(JUMP)
+                body = self.label()
+                self.block(node.block.children)
+                self.patch(check)
+                self.expression(node.condition)
+                self.emit(POP_JUMP_IF_TRUE, body)
+            case NodeReturnStatement():
+                self.expression(node.expression)
+                self.emit(RETURN)
+            case _:
+                raise CompileError(f'Неподдерживаемая инструкция {type(node).__name__}', 0, 0)
+
+    def expression(self, node):
+        cls = type(node)
+        if cls in BINARY_INDEX:
+            self.expression(node.left)
+            right = node.right
+            if isinstance(right, (NodeIntLiteral, NodeFloatLiteral, NodeStringLiteral)):
+                # константа справа - частый случай (i + 1, n < 2): операнд
+                # берётся из пула без отдельной инструкции
+                self.expression(right)
+                ops = self.code.ops
+                const = ops.pop()
+                ops.pop()
+                self.emit(BINARY_CONST, const << OPERATOR_BITS | BINARY_INDEX[cls])
+            else:
+                self.expression(right)
+                self.emit(BINARY, BINARY_INDEX[cls])
+            return
+        match node:
+            case NodeIntLiteral():
+                self.emit(LOAD_CONST, self.constant(int(node.value.value)))
+            case NodeFloatLiteral():
+                self.emit(LOAD_CONST, self.constant(float(node.value.value)))
+            case NodeStringLiteral():
+                self.emit(LOAD_CONST, self.constant(node.value.value))
+            case NodeVar():
+                self.load(node.id.value)
+            case NodeAnd() | NodeOr():
+                self.expression(node.left)
+                op = JUMP_IF_FALSE_OR_POP if cls is NodeAnd else JUMP_IF_TRUE_OR_POP
+                end = self.emit(op)
+                self.expression(node.right)
+                self.patch(end)
+            case NodeNot():
+                self.expression(node.operand)
+                self.emit(NOT)
+            case NodeUnaryMinus():
+                operand = node.operand
+                if isinstance(operand, (NodeIntLiteral, NodeFloatLiteral)):
+                    kind = int if isinstance(operand, NodeIntLiteral) else float
+                    self.emit(LOAD_CONST, self.constant(-kind(operand.value.value)))
+                else:
+                    self.expression(operand)
+                    self.emit(NEGATE)
+            case NodeIndexAccess():
+                self.expression(node.var)
+                self.expression(node.index)
+                self.emit(INDEX_UNCHECKED if unchecked_index(node) else INDEX)
+            case NodeFunctionCall():
+                name = node.id.value
+                args = node.actual_params.params
+                if len(args) > MAX_ARGS:
+                    raise CompileError(f'Слишком много аргументов в вызове {name}', node.id.lineno, node.id.pos)
+                for arg in args:
+                    self.expression(arg)
+                if name not in self.cells and name in BUILTINS:
+                    self.emit(CALL_BUILTIN, BUILTINS.index(name) << ARGC_BITS | len(args))
+                else:
+                    self.emit(CALL, self.cell(name) << ARGC_BITS | len(args))
+            case _:
+                raise CompileError(f'Неподдерживаемое выражение {cls.__name__}', 0, 0)
+
+def compile_program(program):
+    return BytecodeCompiler().compile(program)
+
+# файлы байт-кода
+
+def code_data(code):
+    return (code.name, code.params, code.locals, code.result, code.cell, code.memo, code.ops.tobytes(),
+            code.consts, code.lines.tobytes(), code.positions.tobytes())
+
+def code_from_data(data):
+    name, params, locals, result, cell, memo, ops, consts, lines, positions = data
+    code = Code(name, params, locals, result, cell, memo)
+    code.ops.frombytes(ops)
+    code.consts = consts
+    code.lines.frombytes(lines)
+    code.positions.frombytes(positions)
+    return code
+
+def dumps(module):
+    codes = [code_data(code) for code in [module.main, *module.functions]]
+    return MAGIC + marshal.dumps((VERSION, codes, module.cells, module.globals))
+
+def loads(data):
+    if not data.startswith(MAGIC):
+        raise ValueError('Файл не является байт-кодом SL')
+    try:
+        version, codes, cells, globals = marshal.loads(data[len(MAGIC):])
+    except (EOFError, TypeError, ValueError):
+        raise ValueError('Повреждённый файл байт-кода') from None
+    if version != VERSION:
+        raise ValueError(f'Неподдерживаемая версия байт-кода {version}')
+    main, *functions = [code_from_data(code) for code in codes]
+    return Module(main, functions, cells, globals)
+
+def save(module, path):
+    with open(path, 'wb') as f:
+        f.write(dumps(module))
+
+def load(path):
+    with open(path, 'rb') as f:
+        return loads(f.read())
+
+# дизассемблер
+
+def describe_arg(module, code, op, arg):
+    if op == LOAD_CONST:
+        return f'{arg} ({code.consts[arg]!r})'
+    if op == MAKE_ARRAY:
+        item, size = code.consts[arg]
+        return f'{arg} ([{item!r}] * {size})'
+    if op in (LOAD_LOCAL, STORE_LOCAL):
+        return f'{arg} ({code.locals[arg][0]})'
+    if op in (LOAD_GLOBAL, LOAD_GLOBAL_CHECKED, STORE_GLOBAL):
+        return f'{arg} ({module.globals[arg][0]})'
+    if op == BINARY:
+        return f'{arg} ({BINARY_OPERATORS[arg][1]})'
+    if op == BINARY_CONST:
+        const = code.consts[arg >> OPERATOR_BITS]
+        return f'{BINARY_OPERATORS[arg & OPERATOR_MASK][1]} {const!r}'
+    if op == CALL:
+        return f'{module.cells[arg >> ARGC_BITS][0]}, аргументов: {arg & MAX_ARGS}'
+    if op == CALL_BUILTIN:
+        return f'{BUILTINS[arg >> ARGC_BITS]}, аргументов: {arg & MAX_ARGS}'
+    if op == ASSIGN_SEQUENCE:
+        return f'{arg}'
+    if op == ASSIGN_CONSTANT:
+        values = code.consts[arg]
+        shown = ', '.join(map(repr, values[:8]))
+        return f'{arg} ([{shown}{", ..." if len(values) > 8 else ""}], элементов: {len(values)})'
+    if op == DEFINE:
+        return f'{arg} ({module.functions[arg].name})'
+    if op in JUMPS:
+        return f'-> {arg}'
+    return ''
+
+def disassemble(module, out=None):
+    out = sys.stdout if out is None else out
+    for code in [module.main, *module.functions]:
+        memo = f', мемоизация {code.memo}' if code.memo else ''
+        print(f'{code.name}: параметров {code.params}, локальных {len(code.locals)}, '
+              f'констант {len(code.consts)}, инструкций {len(code.ops) // 2}{memo}', file=out)
+        starts = {pc: k for k, pc in enumerate(code.lines)}
+        ops = code.ops
+        for pc in range(0, len(ops), 2):
+            k = starts.get(pc)
+            line = f'{code.positions[2 * k]:>5}' if k is not None else ' ' * 5
+            op, arg = ops[pc], ops[pc + 1]
+            print(f'{line} {pc:>6} {OP_NAMES[op]:<22}{describe_arg(module, code, op, arg)}'.rstrip(), file=out)
+        print(file=out)
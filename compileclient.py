@@ -0,0 +1,82 @@
+import argparse
+import json
+import os
+import socket
+import sys
+
+# Клиент сервера компиляции (compileserver.py). Импортирует только
+# стандартную библиотеку, чтобы запуск клиента стоил как можно меньше.
+
+class CompileClient:
+    def __init__(self, path):
+        self.socket = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        self.socket.connect(path)
+        self.rfile = self.socket.makefile('rb')
+        self.next_id = 0
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def close(self):
+        self.rfile.close()
+        self.socket.close()
+
+    def send(self, **request):
+        self.next_id += 1
+        request.setdefault('id', self.next_id)
+        self.socket.sendall((json.dumps(request, ensure_ascii=False) + '\n').encode())
+        return request['id']
+
+    def receive(self):
+        line = self.rfile.readline()
+        if not line:
+            raise ConnectionError('Сервер компиляции закрыл соединение')
+        return json.loads(line)
+
+    def request(self, **request):
+        self.send(**request)
+        return self.receive()
+
+    def compile(self, path=None, source=None, format='text', engine='table'):
+        if source is not None:
+            return self.request(source=source, format=format, engine=engine)
+        # сервер может работать в другом каталоге
+        return self.request(path=os.path.abspath(path), format=format, engine=engine)
+
+    def compile_many(self, paths, format='text', engine='table'):
+        # все запросы отправляются сразу, и сервер разбирает их параллельно;
+        # ответы приходят в порядке запросов
+        for path in paths:
+            self.send(path=os.path.abspath(path), format=format, engine=engine)
+        return [self.receive() for _ in paths]
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Разбор файлов SL на сервере компиляции')
+    parser.add_argument('paths', nargs='*')
+    parser.add_argument('--socket', required=True, help='путь Unix-сокета сервера')
+    parser.add_argument('--format', choices=('text', 'jsonl', 'none'), default='text')
+    parser.add_argument('--engine', default='table', help='движок лексера')
+    parser.add_argument('--stats', action='store_true', help='вывести статистику сервера')
+    parser.add_argument('--shutdown', action='store_true', help='остановить сервер')
+    args = parser.parse_args(argv)
+    failed = 0
+    with CompileClient(args.socket) as client:
+        for path, response in zip(args.paths, client.compile_many(args.paths, args.format, args.engine)):
+            if 'error' in response:
+                print(f'{path}: {response["error"]}')
+            for error in response.get('diagnostics', []):
+                print(f'{path}: {error["text"]}')
+            if 'ast' in response:
+                sys.stdout.write(response['ast'])
+            failed += not response['ok']
+        if args.stats:
+            print(json.dumps(client.request(op='stats'), ensure_ascii=False), file=sys.stderr)
+        if args.shutdown:
+            client.request(op='shutdown')
+    return 1 if failed else 0
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -1,16 +1,162 @@
-from lexer import Lexer, Token
-from slparser import Parser
+import argparse
+import io
+import os
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor
 
-f = open(r"C:/Users/nervo/OneDrive/Рабочий стол/compiler/example.sl", 'r')
+from errors import CompileError, CompileErrors
+from lexer import ENGINES
+from parsecache import ParseCache
+from profiler import Profiler
+from slparser import PARSERS
 
-pars = Parser(Lexer(f))
+# расширение исходных файлов SL, которые ищутся в каталогах
+SOURCE_SUFFIX = '.sl'
 
+def find_sources(paths):
+    # файлы из paths и файлы SL из каталогов в paths (рекурсивно), в
+    # детерминированном порядке: как заданы в командной строке, а внутри
+    # каталога - по алфавиту
+    sources = []
+    for path in paths:
+        if os.path.isdir(path):
+            for root, dirs, files in os.walk(path):
+                dirs.sort()
+                sources.extend(os.path.join(root, name) for name in sorted(files)
+                               if name.endswith(SOURCE_SUFFIX))
+        else:
+            sources.append(path)
+    return sources
 
-# t = lex.get_next_token()
-# while t.name != Token.EOF:
-#     print(t)
-#     t = lex.get_next_token()
-# print(t)
-# f.close()
+# кэш разбора рабочего процесса; создаётся при первом обращении
+cache = None
 
-print(pars.parse())
\ No newline at end of file
+def internal_error(error):
+    # сообщение о непредвиденном исключении при разборе файла, например
+    # RecursionError на глубоко вложенном тексте
+    return f'Внутренняя ошибка компилятора: {type(error).__name__}: {error}'
+
+def compile_file(path, engine='table', cache_dir=None, print_ast=False, profiler=None, parser='recursive'):
+    # разбор одного файла в рабочем процессе. Возвращает путь, размер,
+    # время разбора, сообщения об ошибках, текст дерева (если print_ast)
+    # и признак того, что дерево взято из кэша. С profiler файл
+    # разбирается под профилировщиком, мимо кэша
+    global cache
+    start = time.perf_counter()
+    try:
+        with open(path, 'rb') as f:
+            source = f.read()
+    except OSError as error:
+        return path, 0, time.perf_counter() - start, [f'Не удалось прочитать файл: {error.strerror}'], None, False
+    lexer = ENGINES[engine]
+    parser_class = PARSERS[parser]
+    program = None
+    cached = False
+    errors = []
+    try:
+        if profiler is not None:
+            program = profiler.parse(path, source, lexer, parser_class)
+        elif cache_dir is not None:
+            if cache is None or cache.directory != cache_dir:
+                cache = ParseCache(cache_dir)
+            hits = cache.hits
+            program = cache.parse(source, lexer, parser_class)
+            cached = cache.hits > hits
+        else:
+            program = parser_class(lexer(source)).parse()
+    except CompileError:
+        # разбор с восстановлением нужен только для файлов с ошибками:
+        # он находит все ошибки файла, а не первую
+        try:
+            parser_class(lexer(source), recover=True).parse()
+        except CompileErrors as failure:
+            errors = [str(error) for error in failure.errors]
+        except Exception as error:
+            errors = [internal_error(error)]
+    except UnicodeDecodeError as error:
+        errors = [f'Файл не в кодировке UTF-8: {error.reason}']
+    except Exception as error:
+        # исключение одного файла - его ошибка: иначе оно прервало бы
+        # executor.map и разбор всех остальных файлов
+        errors = [internal_error(error)]
+    ast = None
+    if print_ast and program is not None:
+        out = io.StringIO()
+        program.write(out)
+        ast = out.getvalue()
+    return path, len(source), time.perf_counter() - start, errors, ast, cached
+
+def compile_all(paths, jobs=None, chunksize=None, **options):
+    # результаты compile_file для всех файлов в порядке paths; при jobs == 1
+    # или с профилировщиком файлы разбираются в текущем процессе
+    jobs = jobs or os.cpu_count() or 1
+    if jobs == 1 or len(paths) <= 1 or options.get('profiler') is not None:
+        for path in paths:
+            yield compile_file(path, **options)
+        return
+    if chunksize is None:
+        # несколько порций на процесс, чтобы процессы не простаивали
+        # в конце из-за неравных по размеру файлов
+        chunksize = max(1, min(64, len(paths) // (jobs * 4)))
+    count = len(paths)
+    with ProcessPoolExecutor(max_workers=min(jobs, count)) as executor:
+        yield from executor.map(compile_file, paths,
+                                [options.get('engine', 'table')] * count,
+                                [options.get('cache_dir')] * count,
+                                [options.get('print_ast', False)] * count,
+                                [None] * count,
+                                [options.get('parser', 'recursive')] * count,
+                                chunksize=chunksize)
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Синтаксический анализ файлов SL')
+    parser.add_argument('paths', nargs='+', help='файлы и каталоги с файлами .sl')
+    parser.add_argument('-j', '--jobs', type=int, default=None,
+                        help='число рабочих процессов (по умолчанию - число ядер)')
+    parser.add_argument('--chunksize', type=int, default=None,
+                        help='число файлов, передаваемых процессу за раз')
+    parser.add_argument('--engine', choices=sorted(ENGINES), default='table', help='движок лексера')
+    parser.add_argument('--parser', choices=sorted(PARSERS), default='recursive',
+                        help='разбор выражений: рекурсивным спуском или по таблице сил связывания')
+    parser.add_argument('--cache-dir', default=None, help='каталог кэша деревьев разбора')
+    parser.add_argument('--ast', action='store_true', help='вывести деревья разбора')
+    parser.add_argument('-q', '--quiet', action='store_true', help='не выводить время разбора каждого файла')
+    parser.add_argument('--stats', action='store_true',
+                        help='вывести время и память по фазам, вызовы грамматических методов и число токенов '
+                             '(файлы разбираются в текущем процессе без кэша)')
+    parser.add_argument('--trace', default=None, metavar='ФАЙЛ',
+                        help='записать дерево вызовов разбора в формате Chrome trace event')
+    args = parser.parse_args(argv)
+
+    paths = find_sources(args.paths)
+    failed = 0
+    total_size = 0
+    profiler = Profiler() if args.stats or args.trace else None
+    start = time.perf_counter()
+    results = compile_all(paths, args.jobs, args.chunksize, engine=args.engine,
+                          cache_dir=args.cache_dir, print_ast=args.ast, profiler=profiler, parser=args.parser)
+    for path, size, elapsed, errors, ast, cached in results:
+        total_size += size
+        if ast is not None:
+            sys.stdout.write(ast)
+        for error in errors:
+            print(f'{path}: {error}')
+        if errors:
+            failed += 1
+        if not args.quiet:
+            note = ', из кэша' if cached else ''
+            print(f'{path}: {size / 1024:.1f} КБ, {elapsed * 1000:.2f} мс{note}', file=sys.stderr)
+    elapsed = time.perf_counter() - start
+    rate = len(paths) / elapsed if elapsed else 0.0
+    speed = total_size / 2**20 / elapsed if elapsed else 0.0
+    print(f'файлов: {len(paths)}, с ошибками: {failed}, {elapsed:.2f} с, '
+          f'{rate:.1f} файлов/с, {speed:.2f} МБ/с', file=sys.stderr)
+    if args.stats:
+        print(profiler.table(), file=sys.stderr)
+    if args.trace is not None:
+        profiler.write_trace(args.trace)
+    return 1 if failed else 0
+
+if __name__ == '__main__':
+    sys.exit(main())
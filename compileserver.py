@@ -0,0 +1,249 @@
+import argparse
+import io
+import json
+import os
+import queue
+import socketserver
+import sys
+import threading
+import time
+from concurrent.futures import Future, ProcessPoolExecutor
+
+import astio
+from errors import CompileErrors
+from lexer import ENGINES
+from slparser import Parser
+
+# Сервер компиляции: держит запущенными процессы с уже импортированными
+# lexer и slparser и принимает запросы строками JSON через Unix-сокет или
+# stdin. Запрос:
+#
+#   {"id": 1, "path": "example.sl"}  или  {"id": 1, "source": "int a;"}
+#
+# с необязательными полями "format" (FORMATS) и "engine" (ENGINES).
+# Ответ - строка JSON с тем же id: "ok", дерево "ast" в выбранном формате,
+# список "diagnostics" и время разбора "time_ms". Служебные запросы:
+# {"op": "ping"}, {"op": "stats"}, {"op": "shutdown"}. Ответы на запросы
+# одного соединения идут в порядке запросов. После shutdown сервер
+# перестаёт читать запросы (и из сокета, и из stdin), отвечает на уже
+# принятые и завершается.
+
+FORMATS = ('text', 'jsonl', 'none')
+
+def diagnostic(error):
+    return {'message': error.message, 'lineno': error.lineno, 'pos': error.pos, 'text': str(error)}
+
+def failure(request, error):
+    # ответ на запрос, разбор которого прервало непредвиденное исключение
+    return {'id': request.get('id'), 'ok': False,
+            'error': f'Внутренняя ошибка сервера: {type(error).__name__}: {error}'}
+
+def handle(request):
+    # разбор по одному запросу; выполняется в рабочем процессе. Любое
+    # исключение (например, RecursionError на глубоко вложенном тексте)
+    # становится ответом с ошибкой
+    try:
+        return compile_request(request)
+    except Exception as error:
+        return failure(request, error)
+
+def compile_request(request):
+    start = time.perf_counter()
+    response = {'id': request.get('id')}
+    fmt = request.get('format', 'text')
+    engine = request.get('engine', 'table')
+    if fmt not in FORMATS:
+        return {**response, 'ok': False, 'error': f'Неизвестный формат {fmt}'}
+    if engine not in ENGINES:
+        return {**response, 'ok': False, 'error': f'Неизвестный движок лексера {engine}'}
+    if 'source' in request:
+        source = request['source']
+        if not isinstance(source, str):
+            return {**response, 'ok': False, 'error': 'Поле source должно быть строкой'}
+    elif 'path' in request:
+        if not isinstance(request['path'], str):
+            return {**response, 'ok': False, 'error': 'Поле path должно быть строкой'}
+        try:
+            with open(request['path'], 'rb') as f:
+                source = f.read()
+        except OSError as error:
+            return {**response, 'ok': False, 'error': f'Не удалось прочитать файл: {error.strerror}'}
+    else:
+        return {**response, 'ok': False, 'error': 'Ожидается поле path или source'}
+    diagnostics = []
+    try:
+        program = Parser(ENGINES[engine](source), recover=True).parse()
+    except CompileErrors as errors:
+        program = None
+        diagnostics = [diagnostic(error) for error in errors.errors]
+    except UnicodeDecodeError as error:
+        return {**response, 'ok': False, 'error': f'Файл не в кодировке UTF-8: {error.reason}'}
+    if program is not None and fmt != 'none':
+        out = io.StringIO()
+        if fmt == 'text':
+            program.write(out)
+        else:
+            astio.write_jsonl(program, out)
+        response['ast'] = out.getvalue()
+    response['ok'] = not diagnostics
+    response['diagnostics'] = diagnostics
+    response['time_ms'] = (time.perf_counter() - start) * 1000
+    return response
+
+def warm_up(_):
+    # пустая задача, чтобы процессы пула были запущены до первого запроса
+    return os.getpid()
+
+class CompileServer:
+    # Пул рабочих процессов и счётчики запросов. При jobs == 0 запросы
+    # разбираются в потоке соединения, без передачи между процессами.
+
+    def __init__(self, jobs=None):
+        self.jobs = os.cpu_count() if jobs is None else jobs
+        self.pool = None
+        if self.jobs:
+            self.pool = ProcessPoolExecutor(max_workers=self.jobs)
+            list(self.pool.map(warm_up, range(self.jobs)))
+        self.requests = 0
+        self.failures = 0
+        self.busy_time = 0.0
+        self.started = time.time()
+        self.lock = threading.Lock()
+        self.stopped = threading.Event()
+        self.on_shutdown = None
+
+    @staticmethod
+    def done(response):
+        future = Future()
+        future.set_result(response)
+        return future
+
+    def submit(self, line):
+        # ответ на строку запроса в виде Future
+        try:
+            request = json.loads(line)
+            if not isinstance(request, dict):
+                raise ValueError('Запрос должен быть объектом JSON')
+        except ValueError as error:
+            return self.done({'id': None, 'ok': False, 'error': f'Неверный запрос: {error}'})
+        match request.get('op', 'compile'):
+            case 'compile':
+                pass
+            case 'ping':
+                return self.done({'id': request.get('id'), 'ok': True})
+            case 'stats':
+                return self.done({'id': request.get('id'), 'ok': True, **self.stats()})
+            case 'shutdown':
+                self.stopped.set()
+                if self.on_shutdown is not None:
+                    threading.Thread(target=self.on_shutdown).start()
+                return self.done({'id': request.get('id'), 'ok': True})
+            case op:
+                return self.done({'id': request.get('id'), 'ok': False, 'error': f'Неизвестная операция {op}'})
+        if self.pool is None:
+            response = handle(request)
+            self.__count(response)
+            return self.done(response)
+        # ответ всегда приходит через future: сбой рабочего процесса или
+        # передачи между процессами становится ответом с ошибкой, и поток
+        # записи ответов не останавливается
+        future = Future()
+
+        def finish(task):
+            try:
+                response = task.result()
+            except Exception as error:
+                response = failure(request, error)
+            self.__count(response)
+            future.set_result(response)
+        try:
+            self.pool.submit(handle, request).add_done_callback(finish)
+        except Exception as error:
+            # пул сломан или уже закрыт
+            finish(self.done(failure(request, error)))
+        return future
+
+    def __count(self, response):
+        with self.lock:
+            self.requests += 1
+            self.failures += not response['ok']
+            self.busy_time += response.get('time_ms', 0.0)
+
+    def stats(self):
+        with self.lock:
+            return {'requests': self.requests, 'failures': self.failures, 'jobs': self.jobs,
+                    'busy_ms': self.busy_time, 'uptime_s': time.time() - self.started}
+
+    def serve_stream(self, rfile, wfile):
+        # запросы читаются из rfile, пока он не закончится или не придёт
+        # shutdown, и разбираются параллельно; ответы пишутся в wfile отдельным потоком в порядке
+        # запросов
+        pending = queue.Queue()
+
+        def write_responses():
+            while (future := pending.get()) is not None:
+                try:
+                    data = json.dumps(future.result(), ensure_ascii=False) + '\n'
+                except Exception as error:
+                    data = json.dumps(failure({}, error), ensure_ascii=False) + '\n'
+                try:
+                    wfile.write(data.encode())
+                    wfile.flush()
+                except OSError:
+                    # клиент отключился, не дочитав ответы
+                    pass
+
+        writer = threading.Thread(target=write_responses)
+        writer.start()
+        try:
+            for line in rfile:
+                if line.strip():
+                    pending.put(self.submit(line))
+                if self.stopped.is_set():
+                    break
+        finally:
+            pending.put(None)
+            writer.join()
+
+    def close(self):
+        if self.pool is not None:
+            self.pool.shutdown()
+
+class StreamHandler(socketserver.StreamRequestHandler):
+    def handle(self):
+        self.server.compile_server.serve_stream(self.rfile, self.wfile)
+
+class UnixServer(socketserver.ThreadingUnixStreamServer):
+    daemon_threads = True
+
+def serve_socket(compile_server, path):
+    if os.path.exists(path):
+        os.remove(path)
+    with UnixServer(path, StreamHandler) as server:
+        server.compile_server = compile_server
+        compile_server.on_shutdown = server.shutdown
+        print(f'сервер компиляции слушает {path}', file=sys.stderr, flush=True)
+        try:
+            server.serve_forever()
+        finally:
+            os.remove(path)
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Сервер компиляции SL с постоянно запущенными процессами разбора')
+    parser.add_argument('--socket', help='путь Unix-сокета; без него запросы читаются из stdin')
+    parser.add_argument('-j', '--jobs', type=int, default=None,
+                        help='число рабочих процессов (0 - разбирать в процессе сервера)')
+    args = parser.parse_args(argv)
+    compile_server = CompileServer(args.jobs)
+    try:
+        if args.socket:
+            serve_socket(compile_server, args.socket)
+        else:
+            compile_server.serve_stream(sys.stdin.buffer, sys.stdout.buffer)
+    except KeyboardInterrupt:
+        pass
+    finally:
+        compile_server.close()
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,36 @@
+class CompileError(Exception):
+    # ошибка в исходном тексте: сообщение и позиция (lineno, pos) в тех же
+    # координатах, что и у токенов
+    phase = 'компиляции'
+
+    def __init__(self, message, lineno, pos):
+        super().__init__(message)
+        self.message = message
+        self.lineno = lineno
+        self.pos = pos
+
+    def __str__(self):
+        return f'Ошибка {self.phase} ({self.lineno}, {self.pos}): {self.message}'
+
+class LexerError(CompileError):
+    phase = 'лексического анализа'
+
+class ParserError(CompileError):
+    phase = 'синтаксического анализа'
+
+class SemanticError(CompileError):
+    phase = 'семантического анализа'
+
+class ExecutionError(CompileError):
+    # ошибка во время выполнения программы; позиция - первый токен
+    # инструкции, на которой произошла ошибка
+    phase = 'выполнения'
+
+class CompileErrors(Exception):
+    # все ошибки, найденные за один проход по файлу, в порядке их появления;
+    # program - дерево, разобранное несмотря на ошибки (без испорченных
+    # инструкций), или None
+    def __init__(self, errors, program=None):
+        super().__init__('\n'.join(map(str, errors)))
+        self.errors = errors
+        self.program = program
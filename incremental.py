@@ -0,0 +1,347 @@
+from array import array
+from bisect import bisect_right
+
+from errors import ParserError
+from lexer import SymbolTable, TableLexer, Token
+from slparser import NodeProgram, Parser
+
+class StatementLexer(TableLexer):
+    # TableLexer, читающий окно текста с границы инструкции и запоминающий,
+    # где закончился предыдущий токен: после разбора инструкции это конец
+    # её SEMI, т.е. граница со следующей инструкцией. Окно начинается с
+    # начала строки, поэтому столбцы совпадают со столбцами во всём файле.
+
+    def __init__(self, text, symbols, start=0, line=1):
+        super().__init__(text, symbols=symbols)
+        self.index = start
+        self.line = line
+        self.line_start = text.rfind('\n', 0, start) + 1
+        self.previous_end = start
+
+    def get_next_token(self):
+        self.previous_end = self.index
+        return super().get_next_token()
+
+def shift_lines(node, delta):
+    # сдвигает номера строк всех токенов поддерева на delta
+    stack = [node]
+    while stack:
+        node = stack.pop()
+        if isinstance(node, Token):
+            node.lineno += delta
+        elif node is not None:
+            if node.sequence:
+                stack.extend(getattr(node, node.fields[0]))
+            else:
+                for name in node.fields:
+                    stack.append(getattr(node, name))
+
+class ShiftedArray:
+    # Массив целых, к хвосту которого (начиная с индекса gap) прибавлен
+    # ещё не применённый сдвиг shift. Сдвиг всех элементов после i стоит
+    # O(|i - gap|): правки текста обычно идут рядом друг с другом, и
+    # смещения инструкций до конца файла не пересчитываются на каждой.
+
+    def __init__(self, values):
+        self.values = array('q', values)
+        self.gap = len(self.values)
+        self.shift = 0
+
+    def __len__(self):
+        return len(self.values)
+
+    def __getitem__(self, i):
+        if i < 0:
+            i += len(self.values)
+        value = self.values[i]
+        return value + self.shift if i >= self.gap else value
+
+    def __iter__(self):
+        return (self[i] for i in range(len(self.values)))
+
+    def __move_gap(self, i):
+        values, gap, shift = self.values, self.gap, self.shift
+        if shift:
+            if i < gap:
+                for k in range(i, gap):
+                    values[k] -= shift
+            else:
+                for k in range(gap, i):
+                    values[k] += shift
+        self.gap = i
+
+    def add(self, i, delta):
+        # прибавляет delta ко всем элементам, начиная с i
+        self.__move_gap(i)
+        self.shift += delta
+
+    def replace(self, i, j, values):
+        # заменяет элементы [i, j) значениями values
+        self.__move_gap(j)
+        self.values[i:j] = array('q', values)
+        self.gap = i + len(values)
+
+    def bisect(self, x):
+        # то же, что bisect_right для массива с применённым сдвигом
+        values, gap = self.values, self.gap
+        if gap < len(values) and x >= values[gap] + self.shift:
+            return bisect_right(values, x - self.shift, gap)
+        return bisect_right(values, x, 0, gap)
+
+class IncrementalParser:
+    # Разбор, обновляемый по правкам текста. Программа - это список
+    # инструкций верхнего уровня, каждая из которых оканчивается SEMI,
+    # поэтому после правки заново лексируются и разбираются только
+    # инструкции, задетые правкой: разбор начинается с инструкции, в
+    # которую попало начало правки, и идёт до первой границы инструкций
+    # после правки, совпадающей с границей старого разбора. Остальные
+    # поддеревья переиспользуются как есть.
+    #
+    # Текст хранится по инструкциям: pieces[i] - текст инструкции i вместе
+    # с пробелами перед ней и своей SEMI, tail - пробелы после последней.
+    # starts[i] - смещение начала pieces[i] в файле (starts[len(self)] -
+    # начало tail), lines[i] - номер строки, на которой оно находится.
+    # Разбирается только окно из нескольких кусков вокруг правки; если его
+    # не хватило, окно удваивается.
+    #
+    # Если правка меняет число строк, номера строк в токенах последующих
+    # инструкций сдвигаются не сразу, а при обращении к инструкции:
+    # numbered[i] - строка, по которой пронумерованы токены инструкции i.
+    #
+    # Правка применяется всегда, даже если текст после неё не разбирается:
+    # в редакторе это обычное состояние недописанной инструкции. Разбор
+    # идёт с восстановлением (recover), испорченная инструкция остаётся
+    # куском текста без дерева (Parser.SKIPPED вместо узла) и в program не
+    # попадает, а её ошибки выдаёт errors. Ошибки хранятся по кускам:
+    # piece_errors[i] - ошибки, найденные при разборе инструкции i, в
+    # порядке обнаружения, в виде (класс, сообщение, строка относительно
+    # lines[i], столбец), так что при сдвиге строк их не нужно
+    # пересчитывать. Разбор инструкции читает и первый токен следующей,
+    # поэтому его ошибки лексера тоже принадлежат куску i; ошибки первого
+    # токена файла хранит head_errors.
+
+    def __init__(self, source, symbols=None):
+        self.symbols = SymbolTable() if symbols is None else symbols
+        lexer = StatementLexer(source, self.symbols)
+        text = lexer.text
+        parser = Parser(lexer, recover=True)
+        statements, starts, lines, errors, self.head_errors = self.__parse(parser, 0, 1)
+        self.__statements = statements
+        self.__program = NodeProgram(statements)
+        self.pieces = [text[starts[i]:starts[i + 1]] for i in range(len(statements))]
+        self.tail = text[starts[-1]:]
+        self.starts = ShiftedArray(starts)
+        self.lines = ShiftedArray(lines)
+        self.numbered = array('q', lines[:-1])
+        self.piece_errors = errors
+        self.reparsed = len(statements)
+
+    def __len__(self):
+        return len(self.__statements)
+
+    @property
+    def text(self):
+        return ''.join(self.pieces) + self.tail
+
+    def statement(self, i):
+        # инструкция верхнего уровня i с актуальными номерами строк или
+        # Parser.SKIPPED, если кусок i не разобран
+        statement = self.__statements[i]
+        delta = self.lines[i] - self.numbered[i]
+        if delta:
+            if statement is not Parser.SKIPPED:
+                shift_lines(statement, delta)
+            self.numbered[i] = self.lines[i]
+        return statement
+
+    def find(self, offset):
+        # номер инструкции, в текст которой попадает смещение offset
+        return max(0, min(self.starts.bisect(offset) - 1, len(self) - 1))
+
+    @property
+    def program(self):
+        # дерево всей программы без неразобранных кусков; номера строк в
+        # токенах инструкций, сдвинутых правками, исправляются здесь
+        for i, (line, numbered) in enumerate(zip(self.lines, self.numbered)):
+            if line != numbered:
+                self.statement(i)
+        if Parser.SKIPPED in self.__statements:
+            self.__program.children = [statement for statement in self.__statements
+                                       if statement is not Parser.SKIPPED]
+        else:
+            self.__program.children = self.__statements
+        return self.__program
+
+    @property
+    def errors(self):
+        # ошибки лексера и парсера во всём тексте в порядке позиций, как
+        # в CompileErrors у Parser.parse с recover
+        errors = list(self.head_errors)
+        for i, piece_errors in enumerate(self.piece_errors):
+            if piece_errors:
+                line = self.lines[i]
+                errors.extend(cls(message, line + lineno, pos) for cls, message, lineno, pos in piece_errors)
+        if not len(self):
+            # позиция конца текста, как у лексера после последнего символа
+            tail = self.tail
+            errors.append(ParserError("Пустой файл!", self.lines[0] + tail.count('\n'),
+                                      len(tail) - tail.rfind('\n') + 1))
+        errors.sort(key=lambda error: (error.lineno, error.pos))
+        return errors
+
+    def __parse(self, parser, start, line, resync=None, head=True):
+        # разбирает инструкции с границы start до конца окна или до
+        # границы, на которой resync(end, line) возвращает истину.
+        # Возвращает инструкции (Parser.SKIPPED - испорченная), их границы,
+        # строки границ, ошибки инструкций и ошибки первого токена окна -
+        # только если окно - начало файла (head): иначе они уже записаны у
+        # предыдущего куска
+        lexer = parser.lexer
+        text = lexer.text
+        statements, starts, lines, errors = [], [start], [line], []
+        head_errors = list(parser.errors) if head else None
+        while parser.token.name != Token.EOF:
+            found = len(parser.errors)
+            statement = parser.terminated_statement()
+            if statement is parser.SKIPPED:
+                if parser.token.name == Token.RCBR:
+                    # лишняя закрывающая скобка верхнего уровня, как в
+                    # Parser.statements
+                    parser.next_token()
+            errors.append(tuple((type(error), error.message, error.lineno - line, error.pos)
+                                for error in parser.errors[found:]))
+            statements.append(statement)
+            end = lexer.previous_end
+            line += text.count('\n', start, end)
+            start = end
+            starts.append(end)
+            lines.append(line)
+            # граница за испорченной инструкцией зависит от следующего
+            # токена, поэтому разбор на ней не останавливается
+            if resync is not None and statement is not parser.SKIPPED and resync(end, line):
+                break
+        return statements, starts, lines, errors, head_errors
+
+    def __segment(self, i):
+        return self.pieces[i] if i < len(self.pieces) else self.tail
+
+    def __line_prefix(self, i):
+        # текст от начала строки до начала куска i
+        parts = []
+        for k in range(i - 1, -1, -1):
+            piece = self.pieces[k]
+            newline = piece.rfind('\n')
+            if newline >= 0:
+                parts.append(piece[newline + 1:])
+                break
+            parts.append(piece)
+        return ''.join(reversed(parts))
+
+    def __rest_is_blank(self, i):
+        # за началом куска i до конца строки только пробелы
+        for k in range(i, len(self.pieces) + 1):
+            segment = self.__segment(k)
+            newline = segment.find('\n')
+            rest = segment if newline < 0 else segment[:newline]
+            if rest and not rest.isspace():
+                return False
+            if newline >= 0:
+                break
+        return True
+
+    def edit(self, start, end, new_text):
+        # заменяет текст [start, end) на new_text и обновляет дерево разбора;
+        # возвращает номера заново разобранных инструкций
+        starts, lines = self.starts, self.lines
+        count = len(self)
+        if not 0 <= start <= end <= starts[count] + len(self.tail):
+            raise ValueError(f'Неверный диапазон правки [{start}, {end})')
+        if '\r' in new_text:
+            new_text = new_text.replace('\r\n', '\n').replace('\r', '\n')
+        delta = len(new_text) - (end - start)
+        edited_end = start + len(new_text)
+        # первая задетая инструкция: та, в чей текст попало начало правки;
+        # окно включает и кусок, в который попал конец правки, так что
+        # окно кончается неизменённой SEMI старого текста или концом файла
+        first = self.find(start)
+        if first:
+            # разбор предыдущей инструкции читает первый токен задетой, а
+            # конец испорченной инструкции зависит от следующего токена
+            # (лишняя } поглощается, как в Parser.statements)
+            first -= 1
+        base = starts[first]
+        prefix = self.__line_prefix(first)
+        # окно включает и кусок за задетыми: разбор последнего из них
+        # читает его первый токен
+        size = starts.bisect(end) - first + 1
+        while True:
+            stop = min(first + size, count + 1)
+            partial = stop <= count
+            window = ''.join(self.__segment(k) for k in range(first, stop))
+            window = prefix + window[:start - base] + new_text + window[end - base:]
+            window_end = len(window)
+            offset = base - len(prefix)
+
+            def resync(new_end, new_line):
+                # граница после правки совпадает со старой, и токены за ней
+                # стоят в тех же столбцах; прочитанный за границей токен
+                # не обрезан концом окна
+                if partial and lexer.index >= window_end:
+                    return False
+                old_end = new_end + offset - delta
+                if new_end + offset < edited_end or old_end < end:
+                    return False
+                i = starts.bisect(old_end) - 1
+                if starts[i] != old_end:
+                    return False
+                newline = window.find('\n', new_end)
+                rest = window[new_end:] if newline < 0 else window[new_end:newline]
+                blank = not rest or rest.isspace()
+                if blank and newline < 0 and new_end + len(rest) == window_end:
+                    blank = self.__rest_is_blank(stop)
+                if not blank:
+                    new_column = new_end - window.rfind('\n', 0, new_end)
+                    if new_column != len(self.__line_prefix(i)) + 1:
+                        return False
+                resync.index = i
+                resync.line_delta = new_line - lines[i]
+                return True
+            resync.index = None
+
+            lexer = StatementLexer(window, self.symbols, len(prefix), lines[first])
+            parser = Parser(lexer, recover=True)
+            new_statements, new_starts, new_lines, new_errors, head_errors = self.__parse(
+                parser, len(prefix), lines[first], resync, first == 0)
+            # ошибка в окне, за которым есть ещё текст, может оказаться
+            # следствием обрезанного окна: без совпавшей границы окно
+            # удваивается
+            if resync.index is not None or not partial:
+                break
+            size *= 2
+
+        reused = count if resync.index is None else resync.index
+        pieces = [window[new_starts[k]:new_starts[k + 1]] for k in range(len(new_statements))]
+        if resync.index is None:
+            self.tail = window[new_starts[-1]:]
+        self.pieces[first:reused] = pieces
+        # границы [first, reused] заменяются новыми, а переиспользуемые
+        # инструкции за ними сдвигаются на delta символов и line_delta строк
+        starts.replace(first, reused + 1, [s + offset for s in new_starts])
+        lines.replace(first, reused + 1, new_lines)
+        if resync.index is not None:
+            starts.add(first + len(new_starts), delta)
+            lines.add(first + len(new_lines), resync.line_delta)
+        self.numbered[first:reused] = array('q', new_lines[:-1])
+        self.__statements[first:reused] = new_statements
+        self.piece_errors[first:reused] = new_errors
+        if head_errors is not None:
+            self.head_errors = head_errors
+        self.reparsed = len(new_statements)
+        return range(first, first + len(new_statements))
+
+    def apply(self, edits):
+        # правки (start, end, new_text) в координатах исходного текста,
+        # не пересекающиеся между собой; применяются с конца, чтобы
+        # смещения ещё не применённых правок оставались верными
+        for start, end, new_text in sorted(edits, key=lambda edit: edit[:2], reverse=True):
+            self.edit(start, end, new_text)
@@ -0,0 +1,470 @@
+import argparse
+import sys
+
+from errors import CompileError, CompileErrors
+from lexer import TableLexer
+from optimizer import add_arguments, optimize
+from runtime import (RUNTIME_ERRORS, UNSET, ConstantSequence, assign_constant, assign_sequence,
+                     builtins, default_factory, execution_error, is_array, literal_values, memo_report,
+                     memoize, statements, unchecked_index, undefined_function)
+from slparser import (NodeAnd, NodeAssigning, NodeDeclaration, NodeDivision, NodeEQ,
+                      NodeFloatLiteral, NodeFunction, NodeFunctionCall, NodeG, NodeGE,
+                      NodeIDivision, NodeIfConstruction, NodeIndexAccess, NodeIntLiteral,
+                      NodeL, NodeLE, NodeMinus, NodeMod, NodeMultiply, NodeNEQ, NodeNot,
+                      NodeOr, NodePlus, NodeReturnStatement, NodeSequence, NodeStringLiteral,
+                      NodeUnaryMinus, NodeVar, NodeWhileConstruction, Parser)
+
+# Исполнитель SL, который один раз превращает дерево разбора в дерево
+# замыканий Python, а затем выполняет его. Тип узла разбирается только при
+# компиляции; во время выполнения каждое замыкание сразу вызывает
+# замыкания своих операндов.
+#
+# Все замыкания принимают кадр f - список значений локальных переменных
+# функции (на верхнем уровне None); глобальные переменные лежат в списке g,
+# который замыкания захватывают при создании. Номера переменных в кадре и
+# в g известны при компиляции. Замыкание инструкции возвращает None или,
+# для return, возвращаемое значение.
+#
+# Объявления глобальных переменных и функции верхнего уровня действуют с
+# начала программы: переменные получают значения по умолчанию, функции
+# можно вызывать до их объявления. Выполнение объявления переменной
+# сбрасывает её к значению по умолчанию. Локальные переменные функции - её
+# параметры и все объявленные в ней переменные; остальные имена глобальные.
+#
+# Если программа размечена семантическим анализом (program.frame не None),
+# номера переменных берутся из ref узлов: глубина 0 - глобальная
+# переменная, иначе локальная в кадре своей функции, а размеры кадров - из
+# frame. Без разметки переменные нумеруются по именам при компиляции.
+
+# виды операндов: константа, локальная и глобальная переменная и
+# произвольное выражение; для каждого вида - его код в шаблонах замыканий
+CONST, LOCAL, GLOBAL, CODE = 'const', 'local', 'global', 'code'
+OPERAND_CODE = {
+    CONST  : '{}',
+    LOCAL  : 'f[{}]',
+    GLOBAL : 'g[{}]',
+    CODE   : '{}(f)',
+}
+# операнды, код которых можно подставить в шаблон без вызова замыкания
+SIMPLE = (CONST, LOCAL, GLOBAL)
+
+OPERATORS = {
+    NodePlus      : '+',
+    NodeMinus     : '-',
+    NodeMultiply  : '*',
+    NodeDivision  : '/',
+    NodeIDivision : '//',
+    NodeMod       : '%',
+    NodeL         : '<',
+    NodeG         : '>',
+    NodeLE        : '<=',
+    NodeGE        : '>=',
+    NodeEQ        : '==',
+    NodeNEQ       : '!=',
+}
+
+def make_factories(templates):
+    # Фабрики замыканий по шаблонам: для каждого ключа - исходный текст
+    # фабрики с именем factory. Так для каждого сочетания оператора и
+    # видов операндов есть своё замыкание, в которое операнды подставлены
+    # прямо в код, а не вызываются через замыкания.
+    namespace = {}
+    names = {}
+    source = []
+    for n, (key, template) in enumerate(templates.items()):
+        names[key] = f'factory_{n}'
+        source.append(template.replace('factory', names[key], 1))
+    exec('\n'.join(source), namespace)
+    return {key: namespace[name] for key, name in names.items()}
+
+def operand_code(kind, name):
+    return OPERAND_CODE[kind].format(name)
+
+# BINARY[cls, left_kind, right_kind](g, x, y): замыкание "x op y"
+BINARY = make_factories({
+    (cls, lk, rk): f'def factory(g, x, y):\n'
+                   f'    return lambda f: {operand_code(lk, "x")} {symbol} {operand_code(rk, "y")}\n'
+    for cls, symbol in OPERATORS.items() for lk in OPERAND_CODE for rk in OPERAND_CODE
+})
+
+# ASSIGN[target_kind, value_kind](g, s, x): инструкция "s = x"
+ASSIGN = make_factories({
+    (tk, vk): f'def factory(g, s, x):\n'
+              f'    def run(f):\n'
+              f'        {operand_code(tk, "s")} = {operand_code(vk, "x")}\n'
+              f'    return run\n'
+    for tk in (LOCAL, GLOBAL) for vk in OPERAND_CODE
+})
+
+# ASSIGN_BINARY[target_kind, cls, left_kind, right_kind](g, s, x, y):
+# инструкция "s = x op y" с простыми операндами, например i = i + 1
+ASSIGN_BINARY = make_factories({
+    (tk, cls, lk, rk): f'def factory(g, s, x, y):\n'
+                       f'    def run(f):\n'
+                       f'        {operand_code(tk, "s")} = {operand_code(lk, "x")} {symbol} {operand_code(rk, "y")}\n'
+                       f'    return run\n'
+    for tk in (LOCAL, GLOBAL) for cls, symbol in OPERATORS.items() for lk in SIMPLE for rk in SIMPLE
+})
+
+# INDEX[array_kind, index_kind](g, a, i): обращение по индексу "a[i]"
+# без отрицательных индексов Python
+INDEX = make_factories({
+    (ak, ik): f'def factory(g, a, i):\n'
+              f'    def run(f):\n'
+              f'        k = {operand_code(ik, "i")}\n'
+              f'        if k < 0:\n'
+              f'            raise IndexError(k)\n'
+              f'        return {operand_code(ak, "a")}[k]\n'
+              f'    return run\n'
+    for ak in OPERAND_CODE for ik in OPERAND_CODE
+})
+
+# INDEX_UNCHECKED[array_kind, index_kind](g, a, i): "a[i]" с индексом,
+# неотрицательность которого доказана при компиляции
+INDEX_UNCHECKED = make_factories({
+    (ak, ik): f'def factory(g, a, i):\n'
+              f'    return lambda f: {operand_code(ak, "a")}[{operand_code(ik, "i")}]\n'
+    for ak in OPERAND_CODE for ik in OPERAND_CODE
+})
+
+class Function:
+    # скомпилированная функция SL: call(*args) и сведения для отладки
+    __slots__ = ('node', 'call', 'slots')
+
+    def __init__(self, node, call, slots):
+        self.node = node
+        self.call = call
+        self.slots = slots
+
+class Interpreter:
+    # глубина рекурсии Python, которой хватает на несколько тысяч
+    # вложенных вызовов функций SL
+    RECURSION_LIMIT = 20000
+
+    def __init__(self, program, out=None):
+        self.out = sys.stdout if out is None else out
+        self.builtins = builtins(self.out)
+        # значения глобальных переменных и их номера
+        self.globals = []
+        self.global_slots = {}
+        # глобальные имена, объявленные где-либо на верхнем уровне
+        self.declared = set()
+        # ячейки функций: имя -> [call]; вызовы обращаются к ячейке, так
+        # что повторное объявление функции подменяет её для всех вызовов
+        self.cells = {}
+        self.compiled = {}
+        # кэши мемоизированных функций для отчёта
+        self.memos = []
+        # номера переменных размечены семантическим анализом
+        self.resolved = program.frame is not None
+        if self.resolved:
+            self.globals.extend([UNSET] * program.frame)
+        self.main = self.compile_program(program)
+
+    def run(self):
+        if sys.getrecursionlimit() < self.RECURSION_LIMIT:
+            sys.setrecursionlimit(self.RECURSION_LIMIT)
+        self.main(None)
+
+    # имена
+
+    def global_slot(self, name):
+        slot = self.global_slots.get(name)
+        if slot is None:
+            slot = self.global_slots[name] = len(self.globals)
+            self.globals.append(UNSET)
+        return slot
+
+    def variable(self, node, scope):
+        # вид и номер переменной node (NodeVar или NodeDeclaration): по
+        # разметке анализа или локальная, если её имя есть в scope
+        if self.resolved:
+            depth, slot = node.ref
+            return (GLOBAL if depth == 0 else LOCAL), slot
+        name = node.id.value
+        if scope is not None and name in scope:
+            return LOCAL, scope[name]
+        return GLOBAL, self.global_slot(name)
+
+    # программа и функции
+
+    def compile_program(self, program):
+        for statement in statements(program.children):
+            if isinstance(statement, NodeDeclaration):
+                name = statement.id.value
+                if name not in self.declared:
+                    self.declared.add(name)
+                    _, slot = self.variable(statement, None)
+                    self.globals[slot] = default_factory(statement.type)()
+        # все функции программы, в том числе вложенные в другие функции
+        stack = list(program.children)
+        while stack:
+            node = stack.pop()
+            if isinstance(node, NodeFunction):
+                self.cells.setdefault(node.id.value, [undefined_function(node.id.value)])
+                stack.extend(node.block.children)
+            elif isinstance(node, NodeIfConstruction):
+                stack.extend(node.block.children)
+                stack.extend(node.else_block.children)
+            elif isinstance(node, NodeWhileConstruction):
+                stack.extend(node.block.children)
+        # функции верхнего уровня доступны с начала программы
+        for statement in program.children:
+            if isinstance(statement, NodeFunction):
+                self.cells[statement.id.value][0] = self.function(statement).call
+        return self.block(program.children, None)
+
+    def function(self, node):
+        compiled = self.compiled.get(id(node))
+        if compiled is not None:
+            return compiled
+        params = node.formal_params.params
+        slots = {}
+        factories = [None] * (node.frame if self.resolved else 0)
+        for declaration in [*params, *statements(node.block.children)]:
+            if isinstance(declaration, NodeDeclaration) and declaration.id.value not in slots:
+                if self.resolved:
+                    slots[declaration.id.value] = declaration.ref[1]
+                    factories[declaration.ref[1]] = default_factory(declaration.type)
+                else:
+                    slots[declaration.id.value] = len(factories)
+                    factories.append(default_factory(declaration.type))
+        body = self.block(node.block.children, slots)
+        name = node.id.value
+        count = len(params)
+        rest = [factory() for factory in factories[count:]]
+        arrays = [slot for slot, value in enumerate(rest, count) if is_array(value)]
+        result = default_factory(node.ret_type)
+
+        def call(*args):
+            if len(args) != count:
+                raise TypeError(f'функция {name} ожидает аргументов: {count}, передано: {len(args)}')
+            frame = [*args, *rest]
+            for slot in arrays:
+                frame[slot] = factories[slot]()
+            value = body(frame)
+            return result() if value is None else value
+
+        if node.memo:
+            call = memoize(name, call, node.memo, self.memos)
+        compiled = self.compiled[id(node)] = Function(node, call, slots)
+        return compiled
+
+    # инструкции
+
+    def block(self, nodes, scope):
+        closures = []
+        owners = {}
+        for node in nodes:
+            if node is None:
+                # пустая инструкция
+                continue
+            closure = self.statement(node, scope)
+            closures.append(closure)
+            owners[closure] = node
+        if not closures:
+            return lambda f: None
+
+        def run(f):
+            try:
+                for statement in closures:
+                    value = statement(f)
+                    if value is not None:
+                        return value
+            except RUNTIME_ERRORS as error:
+                raise execution_error(owners[statement], error) from None
+        return run
+
+    def statement(self, node, scope):
+        g = self.globals
+        match node:
+            case NodeDeclaration():
+                kind, slot = self.variable(node, scope)
+                factory = default_factory(node.type)
+                value = factory()
+                if not is_array(value):
+                    return ASSIGN[kind, CONST](g, slot, value)
+                return ASSIGN[kind, CODE](g, slot, lambda f: factory())
+
+            case NodeAssigning():
+                kind, slot = self.variable(node.left_side, scope)
+                right = node.right_side
+                if isinstance(right, NodeSequence):
+                    target = self.expression(node.left_side, scope)
+                    values = literal_values(right)
+                    if values is not None:
+                        constant = ConstantSequence(values)
+                        return ASSIGN[kind, CODE](g, slot, lambda f: assign_constant(target(f), constant))
+                    members = [self.expression(member, scope) for member in right.members]
+                    return ASSIGN[kind, CODE](g, slot, lambda f: assign_sequence(target(f), [m(f) for m in members]))
+                if type(right) in OPERATORS:
+                    left_kind, x = self.operand(right.left, scope)
+                    right_kind, y = self.operand(right.right, scope)
+                    if left_kind != CODE and right_kind != CODE:
+                        return ASSIGN_BINARY[kind, type(right), left_kind, right_kind](g, slot, x, y)
+                value_kind, x = self.operand(right, scope)
+                return ASSIGN[kind, value_kind](g, slot, x)
+
+            case NodeFunctionCall():
+                call = self.expression(node, scope)
+
+                def run(f):
+                    call(f)
+                return run
+
+            case NodeFunction():
+                cell = self.cells[node.id.value]
+                function = self.function(node)
+
+                def run(f):
+                    cell[0] = function.call
+                return run
+
+            case NodeIfConstruction():
+                condition = self.expression(node.condition, scope)
+                block = self.block(node.block.children, scope)
+                if not node.else_block.children:
+                    def run(f):
+                        if condition(f):
+                            return block(f)
+                    return run
+                else_block = self.block(node.else_block.children, scope)
+                return lambda f: block(f) if condition(f) else else_block(f)
+
+            case NodeWhileConstruction():
+                condition = self.expression(node.condition, scope)
+                block = self.block(node.block.children, scope)
+
+                def run(f):
+                    while condition(f):
+                        value = block(f)
+                        if value is not None:
+                            return value
+                return run
+
+            case NodeReturnStatement():
+                return self.expression(node.expression, scope)
+
+        raise CompileError(f'Неподдерживаемая инструкция {type(node).__name__}', 0, 0)
+
+    # выражения
+
+    def operand(self, node, scope):
+        # вид и значение операнда для шаблонов замыканий
+        match node:
+            case NodeIntLiteral():
+                return CONST, int(node.value.value)
+            case NodeFloatLiteral():
+                return CONST, float(node.value.value)
+            case NodeStringLiteral():
+                return CONST, node.value.value
+            case NodeVar():
+                name = node.id.value
+                kind, slot = self.variable(node, scope)
+                if kind == GLOBAL and name not in self.declared:
+                    # глобальная переменная без объявления может быть ещё
+                    # не присвоена
+                    g = self.globals
+
+                    def read(f):
+                        value = g[slot]
+                        if value is UNSET:
+                            raise NameError(f'Переменная {name} не определена')
+                        return value
+                    return CODE, read
+                return kind, slot
+        return CODE, self.expression(node, scope)
+
+    def expression(self, node, scope):
+        g = self.globals
+        cls = type(node)
+        if cls in OPERATORS:
+            left_kind, x = self.operand(node.left, scope)
+            right_kind, y = self.operand(node.right, scope)
+            return BINARY[cls, left_kind, right_kind](g, x, y)
+        match node:
+            case NodeIntLiteral() | NodeFloatLiteral() | NodeStringLiteral() | NodeVar():
+                kind, x = self.operand(node, scope)
+                if kind == CONST:
+                    return lambda f: x
+                if kind == LOCAL:
+                    return lambda f: f[x]
+                if kind == GLOBAL:
+                    return lambda f: g[x]
+                return x
+            case NodeAnd():
+                left = self.expression(node.left, scope)
+                right = self.expression(node.right, scope)
+                return lambda f: left(f) and right(f)
+            case NodeOr():
+                left = self.expression(node.left, scope)
+                right = self.expression(node.right, scope)
+                return lambda f: left(f) or right(f)
+            case NodeNot():
+                operand = self.expression(node.operand, scope)
+                return lambda f: not operand(f)
+            case NodeUnaryMinus():
+                kind, x = self.operand(node.operand, scope)
+                if kind == CONST:
+                    value = -x
+                    return lambda f: value
+                operand = self.expression(node.operand, scope)
+                return lambda f: -operand(f)
+            case NodeIndexAccess():
+                array_kind, a = self.operand(node.var, scope)
+                index_kind, i = self.operand(node.index, scope)
+                if unchecked_index(node):
+                    return INDEX_UNCHECKED[array_kind, index_kind](g, a, i)
+                return INDEX[array_kind, index_kind](g, a, i)
+            case NodeFunctionCall():
+                return self.call(node, scope)
+        raise CompileError(f'Неподдерживаемое выражение {cls.__name__}', 0, 0)
+
+    def call(self, node, scope):
+        name = node.id.value
+        args = [self.expression(arg, scope) for arg in node.actual_params.params]
+        cell = self.cells.get(name)
+        if cell is None:
+            function = self.builtins.get(name) or undefined_function(name)
+            cell = [function]
+        # вызов через ячейку: функцию можно переопределить во время выполнения
+        match args:
+            case []:
+                return lambda f: cell[0]()
+            case [a]:
+                return lambda f: cell[0](a(f))
+            case [a, b]:
+                return lambda f: cell[0](a(f), b(f))
+            case [a, b, c]:
+                return lambda f: cell[0](a(f), b(f), c(f))
+        return lambda f: cell[0](*[arg(f) for arg in args])
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Выполнение программы SL')
+    parser.add_argument('path')
+    parser.add_argument('-O', '--optimize', action='store_true', help='оптимизировать дерево разбора перед выполнением')
+    add_arguments(parser)
+    args = parser.parse_args(argv)
+    try:
+        with open(args.path, 'rb') as f:
+            program = Parser(TableLexer(f), recover=True).parse()
+        if args.optimize:
+            optimize(program, inline_nodes=args.inline_nodes, memo_size=args.memo_size)
+        interpreter = Interpreter(program)
+        interpreter.run()
+        if interpreter.memos:
+            print(memo_report(interpreter.memos), file=sys.stderr)
+    except CompileErrors as errors:
+        for error in errors.errors:
+            print(error)
+        return 1
+    except CompileError as error:
+        print(error)
+        return 1
+    except OSError as error:
+        print(f'Не удалось прочитать файл: {error.strerror}')
+        return 1
+    return 0
+
+if __name__ == '__main__':
+    sys.exit(main())
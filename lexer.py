@@ -1,4 +1,9 @@
-import sys
+import bisect
+import re
+import string
+from array import array
+
+from errors import LexerError
 
 class Token:
     EOF, STRING_LITERAL, ID, INT_LITERAL,\
@@ -7,7 +12,7 @@ class Token:
     PERCENT, LBR, RBR, LCBR, RCBR, LSBR,\
     RSBR, LE, GE, SEMI, COMMA,\
     FOR, WHILE, RETURN, FUNCTION, IF, ELSE,\
-    OR, AND, NOT = range(35)
+    OR, AND, NOT, IMPORT = range(36)
 
     token_names = {
             EOF             : "EOF",
@@ -19,6 +24,7 @@ class Token:
             L               : "L '<'",
             G               : "G '>'",
             EQ              : "EQ '=='",
+            NEQ             : "NEQ '!='",
             PLUS            : "PLUS '+'",
             MINUS           : "MINUS '-'",
             ASTERISK        : "ASTERISK '*'",
@@ -40,6 +46,11 @@ class Token:
             RETURN          : "RETURN",
             FUNCTION        : "FUNCTION",
             IF              : "IF",
+            ELSE            : "ELSE",
+            OR              : "OR",
+            AND             : "AND",
+            NOT             : "NOT",
+            IMPORT          : "IMPORT",
     }
 
     KEYWORDS = {
@@ -52,195 +63,693 @@ class Token:
         'or'        : OR,
         'and'       : AND,
         'not'       : NOT,
+        'import'    : IMPORT,
     }
 
-    def __init__(self, token, value, lineno, pos):
+    __slots__ = ('name', 'value', 'lineno', 'pos', 'sym')
+
+    def __init__(self, token, value, lineno, pos, sym=-1):
         self.name = token
         self.value = value
         self.lineno = lineno
         self.pos = pos 
+        # номер значения в SymbolTable лексера (-1, если оно не интернировано)
+        self.sym = sym
     
     def __repr__(self):
         return f'({self.token_names[self.name]}, {self.value}, ({self.lineno}, {self.pos}))'
 
+class SymbolTable:
+    # Таблица интернированных идентификаторов и текстов литералов, общая для
+    # лексера и следующих стадий: каждому тексту сопоставляется небольшой
+    # целый номер, и имена можно сравнивать по номеру, а не по строке.
+    # Первые номера занимают ключевые слова, поэтому один поиск в таблице
+    # заодно распознаёт ключевое слово.
+    KEYWORD_NAMES = tuple(Token.KEYWORDS.values())
+
+    def __init__(self):
+        self.ids = {}
+        self.names = []
+        for keyword in Token.KEYWORDS:
+            self.intern(keyword)
+
+    def __len__(self):
+        return len(self.names)
+
+    def __getitem__(self, sym):
+        return self.names[sym]
+
+    def intern(self, text):
+        sym = self.ids.get(text)
+        if sym is None:
+            sym = self.ids[text] = len(self.names)
+            self.names.append(text)
+        return sym
+
+    def token(self, name, text, lineno, pos):
+        # токен, значение которого - единственный в таблице экземпляр text
+        sym = self.ids.get(text)
+        if sym is None:
+            sym = self.ids[text] = len(self.names)
+            self.names.append(text)
+        else:
+            text = self.names[sym]
+            if name == Token.ID and sym < len(self.KEYWORD_NAMES):
+                name = self.KEYWORD_NAMES[sym]
+        return Token(name, text, lineno, pos, sym)
+
+def is_id_char(char):
+    return char.isalpha() or char.isdigit() or char == '_'
+
 class Lexer:
-    def __init__(self, file):
-        self.file = file
+    SPACES = frozenset('\t\n ')
+    DIGITS = frozenset(string.digits)
+    ID_CHARS = frozenset(string.ascii_letters + string.digits + '_')
+    SPACE_RUN = re.compile(r'[\t\n ]*')
+    DIGIT_RUN = re.compile(r'[0-9]*')
+    ID_RUN = re.compile(r'[A-Za-z0-9_]*')
+
+    def __init__(self, source, encoding='utf-8', symbols=None, errors=None):
+        # таблицу символов можно разделить между несколькими лексерами
+        self.symbols = SymbolTable() if symbols is None else symbols
+        self.errors = errors
+        self.text = self.__load(source, encoding)
+        self.length = len(self.text)
+        self.index = 0
         self.lineno = 1
         self.pos  = 1
         self.state = None
         self.char = None
-    
+
+    @classmethod
+    def __load(cls, source, encoding):
+        # исходный текст можно передать строкой, байтами или файловым
+        # объектом; файл читается целиком одним read(), а лексер сканирует
+        # полученную строку по индексу
+        if isinstance(source, str):
+            return cls.__normalize_newlines(source)
+        if isinstance(source, (bytes, bytearray, memoryview)):
+            return cls.__normalize_newlines(str(source, encoding))
+        data = source.read()
+        if isinstance(data, str):
+            return cls.__normalize_newlines(data)
+        return cls.__normalize_newlines(str(data, encoding))
+
+    @staticmethod
+    def __normalize_newlines(text):
+        # как при чтении в текстовом режиме: '\r\n' и '\r' превращаются в '\n'
+        if '\r' in text:
+            text = text.replace('\r\n', '\n').replace('\r', '\n')
+        return text
+
     def __get_next_char(self):
-        self.char = self.file.read(1)
+        index = self.index
+        if index < self.length:
+            self.char = char = self.text[index]
+            self.index = index + 1
+            if char == '\n':
+                self.lineno += 1
+                self.pos = 1
+                return
+        else:
+            self.char = ''
         self.pos += 1
-        if self.char == '\n':
-            self.lineno += 1
-            self.pos = 1
+
+    def __jump_to(self, end):
+        # то же, что вызывать __get_next_char, пока не будет прочитан символ
+        # с индексом end, но без обхода пропускаемых символов по одному
+        start = self.index
+        if end > start:
+            newlines = self.text.count('\n', start, end)
+            if newlines:
+                self.lineno += newlines
+                self.pos = end - self.text.rfind('\n', start, end)
+            else:
+                self.pos += end - start
+            self.index = end
+        self.__get_next_char()
+
+    def __read_run(self, run, chars, predicate):
+        # читает текущий символ и следующую за ним серию символов,
+        # удовлетворяющих predicate. ASCII-символы серии (chars) проглатываются
+        # регулярным выражением run, остальные проверяются теми же методами
+        # str, что и раньше. Переводов строк в серии не бывает.
+        text = self.text
+        start = end = self.index
+        while end < self.length:
+            char = text[end]
+            if char in chars:
+                end = run.match(text, end).end()
+            elif char > '\x7f' and predicate(char):
+                end += 1
+            else:
+                break
+        # следующий за серией символ читаем сразу, без вызова __get_next_char
+        if end < self.length:
+            self.char = char = text[end]
+            self.index = end + 1
+            if char == '\n':
+                self.lineno += 1
+                self.pos = 1
+            else:
+                self.pos += end - start + 1
+        else:
+            self.char = ''
+            self.index = end
+            self.pos += end - start + 1
+        return text[start - 1:end]
 
     def error(self, msg):
-        print(f'Ошибка лексического анализа ({self.lineno}, {self.pos}): {msg}')
-        sys.exit(1)
+        # без списка errors ошибка прерывает разбор; со списком она
+        # записывается, и лексер продолжает работу за ошибочным фрагментом
+        error = LexerError(msg, self.lineno, self.pos)
+        if self.errors is None:
+            raise error
+        self.errors.append(error)
+
+    def tokens(self):
+        # ленивый поток токенов до EOF включительно
+        while True:
+            token = self.get_next_token()
+            yield token
+            if token.name == Token.EOF:
+                return
 
     def get_next_token(self):
-        match self.state:
-            case None:
-                if self.char is None:
-                    self.__get_next_char()
-                    return self.get_next_token()
-                elif self.char in ['\t', '\n', ' ']:
-                    self.__get_next_char()
-                    return self.get_next_token()
-                elif self.char == '':
-                    return Token(Token.EOF, "", self.lineno, self.pos)
-                elif self.char == '+':
-                    self.__get_next_char()
-                    return Token(Token.PLUS, "+", self.lineno, self.pos)
-                elif self.char == '-':
-                    self.__get_next_char()
-                    return Token(Token.MINUS, "-", self.lineno, self.pos)
-                elif self.char == '*':
-                    self.__get_next_char()
-                    return Token(Token.ASTERISK, "*", self.lineno, self.pos)
-                elif self.char == '%':
-                    self.__get_next_char()
-                    return Token(Token.PERCENT, "%", self.lineno, self.pos)
-                elif self.char == '(':
-                    self.__get_next_char()
-                    return Token(Token.LBR, "(", self.lineno, self.pos)
-                elif self.char == ')':
-                    self.__get_next_char()
-                    return Token(Token.RBR, ")", self.lineno, self.pos)
-                elif self.char == '{':
-                    self.__get_next_char()
-                    return Token(Token.LCBR, "{", self.lineno, self.pos)
-                elif self.char == '}':
-                    self.__get_next_char()
-                    return Token(Token.RCBR, "}", self.lineno, self.pos)
-                elif self.char == '[':
-                    self.__get_next_char()
-                    return Token(Token.LSBR, "[", self.lineno, self.pos)
-                elif self.char == ']':
-                    self.__get_next_char()
-                    return Token(Token.RSBR, "]", self.lineno, self.pos)
-                elif self.char == ';':
-                    self.__get_next_char()
-                    return Token(Token.SEMI, ";", self.lineno, self.pos)
-                elif self.char == ',':
+        # состояния сменяются в цикле, а не рекурсивными вызовами, поэтому
+        # глубина стека не зависит от длины пробелов и числа переходов
+        while True:
+            match self.state:
+                case None:
+                    if self.char is None:
+                        self.__get_next_char()
+                        continue
+                    elif self.char in ['\t', '\n', ' ']:
+                        if self.index < self.length and self.text[self.index] in self.SPACES:
+                            # пропускаем сразу всю последовательность пробельных символов
+                            self.__jump_to(self.SPACE_RUN.match(self.text, self.index).end())
+                        else:
+                            self.__get_next_char()
+                        continue
+                    elif self.char == '':
+                        return Token(Token.EOF, "", self.lineno, self.pos)
+                    elif self.char == '+':
+                        self.__get_next_char()
+                        return Token(Token.PLUS, "+", self.lineno, self.pos)
+                    elif self.char == '-':
+                        self.__get_next_char()
+                        return Token(Token.MINUS, "-", self.lineno, self.pos)
+                    elif self.char == '*':
+                        self.__get_next_char()
+                        return Token(Token.ASTERISK, "*", self.lineno, self.pos)
+                    elif self.char == '%':
+                        self.__get_next_char()
+                        return Token(Token.PERCENT, "%", self.lineno, self.pos)
+                    elif self.char == '(':
+                        self.__get_next_char()
+                        return Token(Token.LBR, "(", self.lineno, self.pos)
+                    elif self.char == ')':
+                        self.__get_next_char()
+                        return Token(Token.RBR, ")", self.lineno, self.pos)
+                    elif self.char == '{':
+                        self.__get_next_char()
+                        return Token(Token.LCBR, "{", self.lineno, self.pos)
+                    elif self.char == '}':
+                        self.__get_next_char()
+                        return Token(Token.RCBR, "}", self.lineno, self.pos)
+                    elif self.char == '[':
+                        self.__get_next_char()
+                        return Token(Token.LSBR, "[", self.lineno, self.pos)
+                    elif self.char == ']':
+                        self.__get_next_char()
+                        return Token(Token.RSBR, "]", self.lineno, self.pos)
+                    elif self.char == ';':
+                        self.__get_next_char()
+                        return Token(Token.SEMI, ";", self.lineno, self.pos)
+                    elif self.char == ',':
+                        self.__get_next_char()
+                        return Token(Token.COMMA, ",", self.lineno, self.pos)
+                    elif self.char == '!':
+                        self.__get_next_char()
+                        if self.char == '=':
+                            self.__get_next_char()
+                            return Token(Token.NEQ, "!=", self.lineno, self.pos)
+                        else:
+                            # '!' пропускается
+                            self.error("Ожидался оператор !=")
+                            continue
+                    elif self.char == '/':
+                        self.state = Token.SLASH
+                        continue
+                    elif self.char == '=':
+                        self.state = Token.ASSIGN
+                        continue
+                    elif self.char == '<':
+                        self.state = Token.L
+                        continue
+                    elif self.char == '>':
+                        self.state = Token.G
+                        continue
+                    elif self.char == '"':
+                        self.state = Token.STRING_LITERAL
+                        continue
+                    elif self.char.isalpha() or self.char == '_':
+                        self.state = Token.ID
+                        continue
+                    elif self.char.isdigit():
+                        self.state = Token.INT_LITERAL
+                        continue
+                    else:
+                        self.error("Неожиданный символ")
+                        self.__get_next_char()
+                        continue
+                case Token.SLASH:
                     self.__get_next_char()
-                    return Token(Token.COMMA, ",", self.lineno, self.pos)
-                elif self.char == '!':
+                    if self.char == '/':
+                        self.state = None
+                        self.__get_next_char()
+                        return Token(Token.DSLASH, "//", self.lineno, self.pos)
+                    else:
+                        self.state = None
+                        return Token(Token.SLASH, "/", self.lineno, self.pos)
+                case Token.ASSIGN:
                     self.__get_next_char()
                     if self.char == '=':
+                        self.state = None
                         self.__get_next_char()
-                        return Token(Token.NEQ, "!=", self.lineno, self.pos)
+                        return Token(Token.EQ, "==", self.lineno, self.pos)
                     else:
-                        self.error("Ожидался оператор !=")
-                elif self.char == '/':
-                    self.state = Token.SLASH
-                    return self.get_next_token()
-                elif self.char == '=':
-                    self.state = Token.ASSIGN
-                    return self.get_next_token()
-                elif self.char == '<':
-                    self.state = Token.L
-                    return self.get_next_token()
-                elif self.char == '>':
-                    self.state = Token.G
-                    return self.get_next_token()
-                elif self.char == '"':
-                    self.state = Token.STRING_LITERAL
-                    return self.get_next_token()
-                elif self.char.isalpha() or self.char == '_':
-                    self.state = Token.ID
-                    return self.get_next_token()
-                elif self.char.isdigit():
-                    self.state = Token.INT_LITERAL
-                    return self.get_next_token()
-                else:
-                    self.error("Неожиданный символ")
-            case Token.SLASH:
-                self.__get_next_char()
-                if self.char == '/':
-                    self.state = None
-                    self.__get_next_char()
-                    return Token(Token.DSLASH, "//", self.lineno, self.pos)
-                else:
-                    self.state = None
-                    return Token(Token.SLASH, "/", self.lineno, self.pos)
-            case Token.ASSIGN:
-                self.__get_next_char()
-                if self.char == '=':
-                    self.state = None
-                    self.__get_next_char()
-                    return Token(Token.EQ, "==", self.lineno, self.pos)
-                else:
-                    self.state = None
-                    return Token(Token.ASSIGN, "=", self.lineno, self.pos)
-            case Token.L:
-                self.__get_next_char()
-                if self.char == '=':
-                    self.state = None
-                    self.__get_next_char()
-                    return Token(Token.LE, "<=", self.lineno, self.pos)
-                else:
-                    self.state = None
-                    return Token(Token.L, "<", self.lineno, self.pos)
-            case Token.G:
-                self.__get_next_char()
-                if self.char == '=':
-                    self.state = None
+                        self.state = None
+                        return Token(Token.ASSIGN, "=", self.lineno, self.pos)
+                case Token.L:
                     self.__get_next_char()
-                    return Token(Token.GE, ">=", self.lineno, self.pos)
-                else:
-                    self.state = None
-                    return Token(Token.G, ">", self.lineno, self.pos)
-            case Token.STRING_LITERAL:
-                self.__get_next_char()
-                string_literal = ""
-                while self.char != '"':
-                    if self.char == '': # если достигнут конец файла
-                        self.error('Ожидалась закрывающая кавычка!')
-                    string_literal += self.char
-                    self.__get_next_char()
-                self.__get_next_char()
-                self.state = None
-                # self.pos минус 2 потому что токен оканчивается за 2 символа
-                # до текущего положения чтения (оно сейчас указывает на символ
-                # после кавычки, а не на последний символ строки)
-                return Token(Token.STRING_LITERAL, string_literal, self.lineno, self.pos-2)
-            case Token.INT_LITERAL:
-                int_literal = ""
-                while self.char.isdigit():
-                    int_literal += self.char
-                    self.__get_next_char()
-                if self.char == '.':
-                    self.state = Token.FLOAT_LITERAL
-                    float_literal = int_literal + '.'
+                    if self.char == '=':
+                        self.state = None
+                        self.__get_next_char()
+                        return Token(Token.LE, "<=", self.lineno, self.pos)
+                    else:
+                        self.state = None
+                        return Token(Token.L, "<", self.lineno, self.pos)
+                case Token.G:
                     self.__get_next_char()
-                    while self.char.isdigit():
-                        float_literal += self.char
+                    if self.char == '=':
+                        self.state = None
                         self.__get_next_char()
-                if self.char.isalpha() or self.char == '_':
-                    self.error("Неверная запись идентификатора!")
-                if self.state == Token.INT_LITERAL:
+                        return Token(Token.GE, ">=", self.lineno, self.pos)
+                    else:
+                        self.state = None
+                        return Token(Token.G, ">", self.lineno, self.pos)
+                case Token.STRING_LITERAL:
+                    end = self.text.find('"', self.index)
+                    if end == -1: # если достигнут конец файла
+                        self.__jump_to(self.length)
+                        self.error('Ожидалась закрывающая кавычка!')
+                        self.state = None
+                        continue
+                    string_literal = self.text[self.index:end]
+                    self.__jump_to(end + 1)
                     self.state = None
-                    return Token(Token.INT_LITERAL, int_literal, self.lineno, self.pos-1)
-                if self.state == Token.FLOAT_LITERAL:
+                    # self.pos минус 2 потому что токен оканчивается за 2 символа
+                    # до текущего положения чтения (оно сейчас указывает на символ
+                    # после кавычки, а не на последний символ строки)
+                    return self.symbols.token(Token.STRING_LITERAL, string_literal, self.lineno, self.pos-2)
+                case Token.INT_LITERAL:
+                    int_literal = self.__read_run(self.DIGIT_RUN, self.DIGITS, str.isdigit)
+                    if self.char == '.':
+                        self.state = Token.FLOAT_LITERAL
+                        float_literal = int_literal + self.__read_run(self.DIGIT_RUN, self.DIGITS, str.isdigit)
+                    if self.char.isalpha() or self.char == '_':
+                        # число пропускается вместе с приклеенными буквами
+                        self.error("Неверная запись идентификатора!")
+                        self.__read_run(self.ID_RUN, self.ID_CHARS, is_id_char)
+                        self.state = None
+                        continue
+                    if self.state == Token.INT_LITERAL:
+                        self.state = None
+                        return self.symbols.token(Token.INT_LITERAL, int_literal, self.lineno, self.pos-1)
+                    if self.state == Token.FLOAT_LITERAL:
+                        self.state = None
+                        return self.symbols.token(Token.FLOAT_LITERAL, float_literal, self.lineno, self.pos-1)
+                case Token.ID:
+                    id = self.__read_run(self.ID_RUN, self.ID_CHARS, is_id_char)
                     self.state = None
-                    return Token(Token.FLOAT_LITERAL, float_literal, self.lineno, self.pos-1)
-            case Token.ID:
-                id = self.char
-                self.__get_next_char()
-                while self.char.isalpha() or self.char.isdigit() or self.char == '_':
-                    id += self.char
-                    self.__get_next_char()
-                self.state = None
-                if id in Token.KEYWORDS:
-                    return Token(Token.KEYWORDS[id], id, self.lineno, self.pos-1)
+                    # ключевые слова распознаются по таблице символов
+                    return self.symbols.token(Token.ID, id, self.lineno, self.pos-1)
+
+
+# Таблицы TableLexer. Они вынесены на уровень модуля, чтобы в горячем цикле
+# обращаться к ним как к глобальным именам, а не атрибутам экземпляра.
+
+# классы первого символа токена
+SPACE, SINGLE, DOUBLE, QUOTE, DIGIT, LETTER = range(6)
+
+SINGLE_TOKENS = {
+    '+' : Token.PLUS,
+    '-' : Token.MINUS,
+    '*' : Token.ASTERISK,
+    '%' : Token.PERCENT,
+    '(' : Token.LBR,
+    ')' : Token.RBR,
+    '{' : Token.LCBR,
+    '}' : Token.RCBR,
+    '[' : Token.LSBR,
+    ']' : Token.RSBR,
+    ';' : Token.SEMI,
+    ',' : Token.COMMA,
+}
+
+# первый символ : (второй символ, токен из одного символа, токен из двух)
+DOUBLE_TOKENS = {
+    '/' : ('/', Token.SLASH, Token.DSLASH),
+    '=' : ('=', Token.ASSIGN, Token.EQ),
+    '<' : ('=', Token.L, Token.LE),
+    '>' : ('=', Token.G, Token.GE),
+    '!' : ('=', None, Token.NEQ),
+}
+
+CHAR_CLASSES = {
+    **dict.fromkeys(Lexer.SPACES, SPACE),
+    **dict.fromkeys(SINGLE_TOKENS, SINGLE),
+    **dict.fromkeys(DOUBLE_TOKENS, DOUBLE),
+    '"' : QUOTE,
+    **dict.fromkeys(string.digits, DIGIT),
+    **dict.fromkeys(string.ascii_letters + '_', LETTER),
+}
+
+OPERATORS = {
+    **SINGLE_TOKENS,
+    **{first: single for first, (_, single, _) in DOUBLE_TOKENS.items() if single is not None},
+    **{first + second: double for first, (second, _, double) in DOUBLE_TOKENS.items()},
+}
+
+# пробелы и следующий за ними ASCII-токен за одно сопоставление;
+# номера групп - MASTER_ID, MASTER_NUMBER, MASTER_OPERATOR, MASTER_STRING
+MASTER_ID, MASTER_NUMBER, MASTER_OPERATOR, MASTER_STRING = range(1, 5)
+MASTER = re.compile(r"""[\t\n ]*(?:
+    ([A-Za-z_][A-Za-z0-9_]*)
+    | ([0-9]+(?:\.[0-9]*)?)
+    | (//|==|<=|>=|!=|[-+*/%(){}\[\];,=<>])
+    | ("[^"]*")
+)""", re.VERBOSE)
+
+ID_CHARS = Lexer.ID_CHARS
+
+class TableLexer(Lexer):
+    # Лексер, выдающий тот же поток токенов, что и Lexer, но без конечного
+    # автомата. Пробелы и следующий за ними ASCII-токен забираются одним
+    # сопоставлением с MASTER, а конец файла, ошибки и символы вне ASCII
+    # разбираются в __scan по таблице классов первого символа токена.
+    #
+    # Позиции токенов считаются так же, как у Lexer: (lineno, pos) - это
+    # положение чтения после символа, следующего за токеном.
+
+    def __init__(self, source, encoding='utf-8', symbols=None, errors=None):
+        super().__init__(source, encoding, symbols, errors)
+        # номер строки и индекс её первого символа для позиции self.index
+        self.line = 1
+        self.line_start = 0
+
+    def __skip_lines(self, start, end):
+        newlines = self.text.count('\n', start, end)
+        if newlines:
+            self.line += newlines
+            self.line_start = self.text.rfind('\n', start, end) + 1
+
+    def __move_to(self, end):
+        # переносит положение чтения за токен, оканчивающийся перед end,
+        # и выставляет lineno, pos так, как их оставил бы Lexer
+        self.index = end
+        if end < self.length and self.text[end] == '\n':
+            self.lineno = self.line + 1
+            self.pos = 1
+        else:
+            self.lineno = self.line
+            self.pos = end - self.line_start + 2
+
+    def __run_end(self, run, chars, predicate, end):
+        text = self.text
+        while end < self.length:
+            char = text[end]
+            if char in chars:
+                end = run.match(text, end).end()
+            elif char > '\x7f' and predicate(char):
+                end += 1
+            else:
+                break
+        return end
+
+    def error_at(self, index, msg):
+        self.__skip_lines(self.index, index)
+        self.__move_to(index)
+        self.error(msg)
+
+    def tokenize(self):
+        # весь поток токенов разом, в компактном буфере TokenBuffer
+        text = self.text
+        offset_type = 'I' if self.length < 1 << 32 else 'Q'
+        buffer = TokenBuffer(text, offset_type, self.symbols)
+        kinds, starts, ends, lines = buffer.kinds, buffer.starts, buffer.ends, buffer.lines
+        while True:
+            token = self.get_next_token()
+            end = self.index
+            start = end - len(token.value)
+            line = self.line
+            if token.name == Token.STRING_LITERAL:
+                start -= 2
+                line -= text.count('\n', start, end)
+            kinds.append(token.name)
+            starts.append(start)
+            ends.append(end)
+            lines.append(line)
+            if token.name == Token.EOF:
+                return buffer
+
+    def get_next_token(self):
+        text = self.text
+        index = self.index
+        match = MASTER.match(text, index)
+        if match is None:
+            return self.__scan()
+        end = match.end()
+        if end < self.length:
+            next_char = text[end]
+            if next_char > '\x7f':
+                # символ вне ASCII может продолжать идентификатор или число
+                return self.__scan()
+        else:
+            next_char = ''
+        group = match.lastindex
+        start = match.start(group)
+        if start > index:
+            newlines = text.count('\n', index, start)
+            if newlines:
+                self.line += newlines
+                self.line_start = text.rfind('\n', index, start) + 1
+        if group == MASTER_NUMBER and next_char in ID_CHARS:
+            # число, за которым идёт буква: ошибку сообщит __scan
+            self.index = start
+            return self.__scan()
+        if group == MASTER_STRING:
+            self.__skip_lines(start, end)
+        # то же, что __move_to(end)
+        self.index = end
+        if next_char == '\n':
+            self.lineno = lineno = self.line + 1
+            self.pos = pos = 1
+        else:
+            self.lineno = lineno = self.line
+            self.pos = pos = end - self.line_start + 2
+        value = text[start:end]
+        if group == MASTER_ID:
+            return self.symbols.token(Token.ID, value, lineno, pos-1)
+        if group == MASTER_OPERATOR:
+            return Token(OPERATORS[value], value, lineno, pos)
+        if group == MASTER_NUMBER:
+            if '.' in value:
+                return self.symbols.token(Token.FLOAT_LITERAL, value, lineno, pos-1)
+            return self.symbols.token(Token.INT_LITERAL, value, lineno, pos-1)
+        return self.symbols.token(Token.STRING_LITERAL, value[1:-1], lineno, pos-2)
+
+    def __scan(self):
+        # после записанной ошибки (см. Lexer.error) разбор продолжается
+        # за ошибочным фрагментом
+        text = self.text
+        while True:
+            index = self.index
+            if index >= self.length:
+                self.__move_to(index)
+                return Token(Token.EOF, "", self.lineno, self.pos)
+            char = text[index]
+            char_class = CHAR_CLASSES.get(char)
+            if char_class == SPACE:
+                end = self.SPACE_RUN.match(text, index).end()
+                self.__skip_lines(index, end)
+                self.index = index = end
+                if index >= self.length:
+                    self.__move_to(index)
+                    return Token(Token.EOF, "", self.lineno, self.pos)
+                char = text[index]
+                char_class = CHAR_CLASSES.get(char)
+            if char_class is None:
+                # символы вне ASCII классифицируются методами str, как в Lexer
+                if char.isalpha():
+                    char_class = LETTER
+                elif char.isdigit():
+                    char_class = DIGIT
                 else:
-                    return Token(Token.ID, id, self.lineno, self.pos-1)
+                    self.error_at(index, "Неожиданный символ")
+                    self.index = index + 1
+                    continue
+
+            if char_class == SINGLE:
+                self.__move_to(index + 1)
+                return Token(SINGLE_TOKENS[char], char, self.lineno, self.pos)
+
+            if char_class == LETTER:
+                end = self.__run_end(self.ID_RUN, ID_CHARS, is_id_char, index + 1)
+                id = text[index:end]
+                self.__move_to(end)
+                return self.symbols.token(Token.ID, id, self.lineno, self.pos-1)
+
+            if char_class == DOUBLE:
+                second, single, double = DOUBLE_TOKENS[char]
+                # максимальный захват: '//', '==', '<=', '>=', '!='
+                if text.startswith(second, index + 1):
+                    self.__move_to(index + 2)
+                    return Token(double, char + second, self.lineno, self.pos)
+                if single is None:
+                    self.error_at(index + 1, "Ожидался оператор !=")
+                    continue
+                self.__move_to(index + 1)
+                return Token(single, char, self.lineno, self.pos)
+
+            if char_class == DIGIT:
+                end = self.__run_end(self.DIGIT_RUN, self.DIGITS, str.isdigit, index + 1)
+                name = Token.INT_LITERAL
+                if text.startswith('.', end):
+                    name = Token.FLOAT_LITERAL
+                    end = self.__run_end(self.DIGIT_RUN, self.DIGITS, str.isdigit, end + 1)
+                if end < self.length and (text[end].isalpha() or text[end] == '_'):
+                    self.error_at(end, "Неверная запись идентификатора!")
+                    self.index = self.__run_end(self.ID_RUN, ID_CHARS, is_id_char, end)
+                    continue
+                self.__move_to(end)
+                return self.symbols.token(name, text[index:end], self.lineno, self.pos-1)
+
+            # char_class == QUOTE
+            end = text.find('"', index + 1)
+            if end == -1: # если достигнут конец файла
+                self.error_at(self.length, 'Ожидалась закрывающая кавычка!')
+                continue
+            self.__skip_lines(index, end)
+            self.__move_to(end + 1)
+            return self.symbols.token(Token.STRING_LITERAL, text[index + 1:end], self.lineno, self.pos-2)
+
+class TokenBuffer:
+    # Поток токенов файла в виде параллельных массивов: код токена, начало и
+    # конец токена в исходном тексте, номер строки начала токена. Значения
+    # токенов - срезы исходного текста, они создаются только по запросу,
+    # как и объекты Token, строки и колонки.
+
+    def __init__(self, text, offset_type='I', symbols=None):
+        self.text = text
+        self.symbols = SymbolTable() if symbols is None else symbols
+        self.kinds = array('B')
+        self.starts = array(offset_type)
+        self.ends = array(offset_type)
+        self.lines = array('I')
+        self.__line_starts = None
 
+    def __len__(self):
+        return len(self.kinds)
+
+    def __getitem__(self, i):
+        return self.token(i)
+
+    def __iter__(self):
+        for i in range(len(self.kinds)):
+            yield self.token(i)
+
+    @property
+    def line_starts(self):
+        # индексы первых символов строк, строятся при первом обращении
+        if self.__line_starts is None:
+            text = self.text
+            line_starts = array(self.starts.typecode, [0])
+            newline = text.find('\n')
+            while newline != -1:
+                line_starts.append(newline + 1)
+                newline = text.find('\n', newline + 1)
+            self.__line_starts = line_starts
+        return self.__line_starts
+
+    def value(self, i):
+        if self.kinds[i] == Token.STRING_LITERAL:
+            return self.text[self.starts[i] + 1:self.ends[i] - 1]
+        return self.text[self.starts[i]:self.ends[i]]
+
+    def line_col(self, i):
+        # строка и колонка (с единицы) первого символа токена
+        line = self.lines[i]
+        return line, self.starts[i] - self.line_starts[line - 1] + 1
+
+    def position(self, i):
+        # (lineno, pos) положения чтения, в котором лексер выдал токен i
+        end = self.ends[i]
+        if end < len(self.text) and self.text[end] == '\n':
+            return bisect.bisect_right(self.line_starts, end) + 1, 1
+        line = bisect.bisect_right(self.line_starts, end)
+        return line, end - self.line_starts[line - 1] + 2
+
+    def token(self, i):
+        name = self.kinds[i]
+        lineno, pos = self.position(i)
+        shift = POS_SHIFTS.get(name, 0)
+        if shift:
+            # сдвиг есть ровно у токенов со значением из таблицы символов:
+            # ключевых слов, идентификаторов и литералов
+            return self.symbols.token(name, self.value(i), lineno, pos - shift)
+        return Token(name, self.value(i), lineno, pos)
+
+    def lexer(self):
+        return BufferLexer(self)
+
+    def nbytes(self):
+        # память под массивы буфера, без исходного текста
+        arrays = (self.kinds, self.starts, self.ends, self.lines)
+        if self.__line_starts is not None:
+            arrays += (self.__line_starts,)
+        return sum(a.itemsize * len(a) for a in arrays)
+
+# насколько pos токена меньше положения чтения, в котором он выдан
+POS_SHIFTS = {
+    Token.STRING_LITERAL    : 2,
+    Token.ID                : 1,
+    Token.INT_LITERAL       : 1,
+    Token.FLOAT_LITERAL     : 1,
+    **dict.fromkeys(Token.KEYWORDS.values(), 1),
+}
+
+class BufferLexer:
+    # выдаёт токены TokenBuffer через интерфейс лексера для Parser
+    def __init__(self, buffer):
+        self.buffer = buffer
+        self.symbols = buffer.symbols
+        self.index = 0
+        self.lineno = 1
+        self.pos = 1
+
+    def get_next_token(self):
+        i = min(self.index, len(self.buffer) - 1)
+        self.index = i + 1
+        self.lineno, self.pos = self.buffer.position(i)
+        return self.buffer.token(i)
 
-        
+    def tokens(self):
+        return iter(self.buffer)
 
+# движки лексера, выбираемые по имени; оба дают одинаковый поток токенов
+ENGINES = {
+    'fsm'   : Lexer,
+    'table' : TableLexer,
+}
@@ -0,0 +1,1414 @@
+import argparse
+import math
+import sys
+
+from errors import CompileError, CompileErrors
+from lexer import TableLexer, Token
+from runtime import builtins, first_token, statements, type_name
+from semantic import analyze
+from slparser import (Node, NodeAnd, NodeAssigning, NodeBlock, NodeDeclaration, NodeDivision, NodeEQ,
+                      NodeFloatLiteral, NodeFunction, NodeFunctionCall, NodeG, NodeGE,
+                      NodeIDivision, NodeIfConstruction, NodeIndexAccess, NodeIntLiteral, NodeL,
+                      NodeAtomType, NodeComplexType, NodeElseBlock, NodeLE, NodeLiteral, NodeMinus, NodeMod, NodeMultiply, NodeNEQ, NodeNot, NodeOr,
+                      NodePlus, NodeReturnStatement, NodeSequence, NodeStringLiteral,
+                      NodeUnaryMinus, NodeVar, NodeWhileConstruction, Parser)
+
+# Оптимизирующие проходы по дереву разбора. Проходы меняют дерево на месте
+# и считают, сколько узлов удалили. Арифметика SL совпадает с арифметикой
+# Python (см. runtime.py), поэтому константы вычисляются операторами Python;
+# выражение, вычисление которого бросает исключение (например, деление на
+# ноль), не сворачивается и даёт ошибку во время выполнения, как и без
+# оптимизации.
+
+ARITHMETIC = {
+    NodePlus      : lambda a, b: a + b,
+    NodeMinus     : lambda a, b: a - b,
+    NodeMultiply  : lambda a, b: a * b,
+    NodeDivision  : lambda a, b: a / b,
+    NodeIDivision : lambda a, b: a // b,
+    NodeMod       : lambda a, b: a % b,
+}
+
+COMPARISONS = {
+    NodeL   : lambda a, b: a < b,
+    NodeG   : lambda a, b: a > b,
+    NodeLE  : lambda a, b: a <= b,
+    NodeGE  : lambda a, b: a >= b,
+    NodeEQ  : lambda a, b: a == b,
+    NodeNEQ : lambda a, b: a != b,
+}
+
+# узлы, значение которых всегда True или False
+BOOLEAN = (NodeNot, *COMPARISONS)
+
+# значение выражения, которое нельзя вычислить при компиляции
+UNKNOWN = object()
+
+# типы, значения которых можно хранить во временных переменных
+SCALARS = ('int', 'float', 'string')
+
+def count_nodes(node):
+    # число узлов поддерева (без токенов)
+    count = 0
+    stack = [node]
+    while stack:
+        node = stack.pop()
+        if isinstance(node, Node):
+            count += 1
+            if node.sequence:
+                stack.extend(getattr(node, node.fields[0]))
+            else:
+                stack.extend(getattr(node, name) for name in node.fields)
+    return count
+
+def literal_value(node):
+    match node:
+        case NodeIntLiteral():
+            return int(node.value.value)
+        case NodeFloatLiteral():
+            return float(node.value.value)
+        case NodeStringLiteral():
+            return node.value.value
+    return UNKNOWN
+
+class ConstantFolder:
+    # Свёртка констант: подвыражения из литералов заменяются литералом,
+    # тождества x + 0, x - 0, x * 1, 1 * x, - - x и not not c - своим
+    # операндом, а if и while с условием, известным при компиляции, - одной
+    # из веток или ничем. Тождества x + 0, x - 0, x * 1 и - - x верны только
+    # для чисел: для строки x выражение x + 0 - ошибка типов, которую
+    # свёртка убрала бы. Поэтому они применяются, только если typed -
+    # программа прошла семантический анализ (optimize проверяет это сам).
+
+    # предельные размеры результата: свёртка не должна раздувать дерево
+    MAX_STRING = 4096
+    MAX_INT_BITS = 4096
+
+    def __init__(self, typed=False):
+        self.typed = typed
+        self.folded = 0
+        self.simplified = 0
+        self.conditions = 0
+        self.before = 0
+        self.after = 0
+
+    @property
+    def removed(self):
+        return self.before - self.after
+
+    def fold(self, program):
+        # проход меняет дерево: номера переменных semantic.py устаревают
+        program.frame = None
+        self.before += count_nodes(program)
+        program.children = self.block(program.children)
+        self.after += count_nodes(program)
+        return program
+
+    def report(self):
+        return (f'свёртка констант: свёрнуто выражений {self.folded}, упрощено тождеств {self.simplified}, '
+                f'вычислено условий {self.conditions}, удалено узлов {self.removed} '
+                f'(было {self.before}, стало {self.after})')
+
+    # инструкции
+
+    def block(self, statements):
+        result = []
+        for statement in statements:
+            result.extend(self.statement(statement))
+        return result
+
+    def statement(self, node):
+        # список инструкций, которыми заменяется node
+        match node:
+            case NodeAssigning():
+                if isinstance(node.right_side, NodeSequence):
+                    node.right_side.members = [self.expression(member) for member in node.right_side.members]
+                else:
+                    node.right_side = self.expression(node.right_side)
+            case NodeFunctionCall():
+                self.call(node)
+            case NodeFunction():
+                node.block.children = self.block(node.block.children)
+            case NodeReturnStatement():
+                node.expression = self.expression(node.expression)
+            case NodeIfConstruction():
+                node.condition = self.expression(node.condition, truth=True)
+                value = self.value(node.condition)
+                if value is not UNKNOWN:
+                    # блоки SL не создают областей видимости, поэтому
+                    # инструкции ветки можно поставить на место if
+                    self.conditions += 1
+                    if value:
+                        return self.block(node.block.children) + self.residue(node.else_block.children, node)
+                    return self.residue(node.block.children, node) + self.block(node.else_block.children)
+                node.block.children = self.block(node.block.children)
+                node.else_block.children = self.block(node.else_block.children)
+            case NodeWhileConstruction():
+                node.condition = self.expression(node.condition, truth=True)
+                value = self.value(node.condition)
+                if value is not UNKNOWN and not value:
+                    self.conditions += 1
+                    return self.residue(node.block.children, node)
+                node.block.children = self.block(node.block.children)
+        return [node]
+
+    @staticmethod
+    def residue(children, node):
+        # что остаётся от невыполняемого блока children инструкции node.
+        # Объявление в нём всё равно делает имя локальным для функции (и
+        # задаёт значение по умолчанию глобальной переменной), а функция
+        # занимает имя, поэтому объявления и функции блока сохраняются - в
+        # if с ложным условием, чтобы они по-прежнему не выполнялись
+        kept = [statement for statement in statements(children)
+                if isinstance(statement, (NodeDeclaration, NodeFunction))]
+        if not kept:
+            return []
+        token = first_token(node)
+        false = NodeIntLiteral(Token(Token.INT_LITERAL, '0', token.lineno, token.pos))
+        return [NodeIfConstruction(false, NodeBlock(kept), NodeElseBlock([]))]
+
+    # выражения
+
+    def call(self, node):
+        params = node.actual_params
+        params.params = [self.expression(arg) for arg in params.params]
+        return node
+
+    def expression(self, node, truth=False):
+        # свёрнутое выражение; truth - значение нужно только как условие
+        # (истинно или ложно), а не само по себе
+        cls = type(node)
+        if cls in ARITHMETIC:
+            node.left = self.expression(node.left)
+            node.right = self.expression(node.right)
+            folded = self.literal(node, self.value(node))
+            if folded is not None:
+                return folded
+            return self.identity(node) if self.typed else node
+        if cls in COMPARISONS:
+            node.left = self.expression(node.left)
+            node.right = self.expression(node.right)
+            return node
+        match node:
+            case NodeAnd() | NodeOr():
+                node.left = self.expression(node.left, truth)
+                node.right = self.expression(node.right, truth)
+            case NodeNot():
+                node.operand = self.expression(node.operand, truth=True)
+                inner = node.operand
+                if isinstance(inner, NodeNot) and (truth or isinstance(inner.operand, BOOLEAN)):
+                    self.simplified += 1
+                    return inner.operand
+            case NodeUnaryMinus():
+                node.operand = self.expression(node.operand)
+                if self.typed and isinstance(node.operand, NodeUnaryMinus):
+                    self.simplified += 1
+                    return node.operand.operand
+                folded = self.literal(node, self.value(node))
+                if folded is not None:
+                    return folded
+            case NodeIndexAccess():
+                node.index = self.expression(node.index)
+            case NodeFunctionCall():
+                self.call(node)
+        return node
+
+    def identity(self, node):
+        left, right = literal_value(node.left), literal_value(node.right)
+        match node:
+            case NodePlus() if type(right) is int and right == 0:
+                result = node.left
+            case NodePlus() if type(left) is int and left == 0:
+                result = node.right
+            case NodeMinus() if type(right) is int and right == 0:
+                result = node.left
+            case NodeMultiply() if type(right) is int and right == 1:
+                result = node.left
+            case NodeMultiply() if type(left) is int and left == 1:
+                result = node.right
+            case _:
+                return node
+        self.simplified += 1
+        return result
+
+    def value(self, node):
+        # значение выражения из литералов или UNKNOWN
+        cls = type(node)
+        operation = ARITHMETIC.get(cls) or COMPARISONS.get(cls)
+        if operation is not None:
+            left = self.value(node.left)
+            if left is UNKNOWN:
+                return UNKNOWN
+            right = self.value(node.right)
+            if right is UNKNOWN:
+                return UNKNOWN
+            try:
+                return operation(left, right)
+            except (TypeError, ValueError, ZeroDivisionError, OverflowError):
+                return UNKNOWN
+        match node:
+            case NodeAnd():
+                left = self.value(node.left)
+                if left is UNKNOWN or not left:
+                    return left
+                return self.value(node.right)
+            case NodeOr():
+                left = self.value(node.left)
+                if left is UNKNOWN or left:
+                    return left
+                return self.value(node.right)
+            case NodeNot():
+                operand = self.value(node.operand)
+                return UNKNOWN if operand is UNKNOWN else not operand
+            case NodeUnaryMinus():
+                operand = self.value(node.operand)
+                try:
+                    return UNKNOWN if operand is UNKNOWN else -operand
+                except TypeError:
+                    return UNKNOWN
+        return literal_value(node)
+
+    def literal(self, node, value):
+        # литерал со значением value на месте node или None, если значение
+        # нельзя записать литералом
+        token = first_token(node)
+        lineno, pos = (token.lineno, token.pos) if token is not None else (0, 0)
+        match value:
+            case bool():
+                return None
+            case int() if value.bit_length() <= self.MAX_INT_BITS:
+                result = NodeIntLiteral(Token(Token.INT_LITERAL, str(value), lineno, pos))
+            case float() if math.isfinite(value):
+                result = NodeFloatLiteral(Token(Token.FLOAT_LITERAL, repr(value), lineno, pos))
+            case str() if len(value) <= self.MAX_STRING:
+                result = NodeStringLiteral(Token(Token.STRING_LITERAL, value, lineno, pos))
+            case _:
+                return None
+        self.folded += 1
+        return result
+
+def children(node):
+    if node.sequence:
+        return getattr(node, node.fields[0])
+    return [getattr(node, name) for name in node.fields]
+
+def block_children(node):
+    # блоки инструкций узла (у программы - она сама)
+    match node:
+        case NodeFunction() | NodeWhileConstruction():
+            return [node.block]
+        case NodeIfConstruction():
+            return [node.block, node.else_block]
+    return []
+
+class DeadCodeEliminator:
+    # Удаление мёртвого кода во всей программе:
+    #   - инструкции после безусловного return (и после if, обе ветки
+    #     которого заканчиваются return);
+    #   - функции, которые нельзя вызвать: граф вызовов строится по именам
+    #     от вызовов вне функций, и функция остаётся, если вызывается хоть
+    #     одна функция с её именем;
+    #   - присваивания переменным, имя которых нигде не читается, и затем
+    #     объявления таких переменных, если присваиваний им не осталось.
+    # Объявления и функции после return не удаляются: объявление делает
+    # переменную локальной для всей функции, а функции верхнего уровня
+    # доступны с начала программы, так что они влияют на выполнение, даже
+    # если до них не доходит управление. Присваивание удаляется, только
+    # если вычисление правой части не может ни иметь побочных эффектов, ни
+    # завершиться ошибкой: в ней нет вызовов, деления и индексов, а
+    # переменные объявлены. Это верно лишь для правильно типизированной
+    # программы (сложение строки с числом бросает исключение), поэтому, как
+    # и тождества свёртки констант, присваивания удаляются только с
+    # typed=True - для программы, прошедшей семантическую проверку.
+    # Присваивание последовательности может не поместиться в массив и не
+    # удаляется.
+    #
+    # Повторные объявления функции с тем же именем в одном блоке не
+    # ошибка (действует последнее), но почти всегда опечатка - проход
+    # собирает их в duplicates.
+
+    # операции, которые не бросают исключений на правильно типизированных
+    # операндах
+    SAFE = (NodePlus, NodeMinus, NodeMultiply, NodeUnaryMinus, NodeNot, NodeAnd, NodeOr, *COMPARISONS)
+
+    def __init__(self, typed=False):
+        self.typed = typed
+        self.statements = 0
+        self.functions = 0
+        self.assignments = 0
+        self.declarations = 0
+        self.before = 0
+        self.after = 0
+        # (имя, строка повторного объявления, строка предыдущего)
+        self.duplicates = []
+
+    @property
+    def removed(self):
+        return self.before - self.after
+
+    def eliminate(self, program):
+        program.frame = None
+        self.before += count_nodes(program)
+        self.find_duplicates(program)
+        self.truncate(program)
+        self.remove_functions(program)
+        if self.typed:
+            self.remove_assignments(program)
+        self.after += count_nodes(program)
+        return program
+
+    def report(self):
+        lines = [f'удаление мёртвого кода: недостижимых инструкций {self.statements}, '
+                 f'неиспользуемых функций {self.functions}, присваиваний {self.assignments}, '
+                 f'объявлений {self.declarations}, удалено узлов {self.removed} '
+                 f'(было {self.before}, стало {self.after})']
+        for name, lineno, previous in self.duplicates:
+            lines.append(f'  функция {name} в строке {lineno} повторно объявлена (предыдущее объявление в строке {previous})')
+        return '\n'.join(lines)
+
+    @staticmethod
+    def blocks(program):
+        # все блоки программы, включая её саму
+        stack = [program]
+        while stack:
+            block = stack.pop()
+            yield block
+            for node in block.children:
+                stack.extend(block_children(node))
+
+    def find_duplicates(self, program):
+        for block in self.blocks(program):
+            seen = {}
+            for node in block.children:
+                if isinstance(node, NodeFunction):
+                    name = node.id.value
+                    if name in seen:
+                        self.duplicates.append((name, node.id.lineno, seen[name]))
+                    seen[name] = node.id.lineno
+        self.duplicates.sort(key=lambda duplicate: duplicate[1])
+
+    # инструкции после return
+
+    def truncate(self, program):
+        for block in self.blocks(program):
+            block.children = self.reachable(block.children)
+
+    def reachable(self, statements):
+        for index, node in enumerate(statements):
+            if self.terminates(node):
+                rest = statements[index + 1:]
+                kept = [node for node in rest if isinstance(node, (NodeDeclaration, NodeFunction))]
+                self.statements += len(rest) - len(kept)
+                return statements[:index + 1] + kept
+        return statements
+
+    def terminates(self, node):
+        match node:
+            case NodeReturnStatement():
+                return True
+            case NodeIfConstruction():
+                return (any(map(self.terminates, node.block.children))
+                        and any(map(self.terminates, node.else_block.children)))
+        return False
+
+    # граф вызовов
+
+    @staticmethod
+    def calls(statements):
+        # имена функций, вызываемых в statements, без тел вложенных функций
+        names = set()
+        stack = list(statements)
+        while stack:
+            node = stack.pop()
+            if not isinstance(node, Node) or isinstance(node, NodeFunction):
+                continue
+            if isinstance(node, NodeFunctionCall):
+                names.add(node.id.value)
+            stack.extend(children(node))
+        return names
+
+    def remove_functions(self, program):
+        functions = {}
+        for block in self.blocks(program):
+            for node in block.children:
+                if isinstance(node, NodeFunction):
+                    functions.setdefault(node.id.value, []).append(node)
+        reachable = self.calls(program.children)
+        queue = list(reachable)
+        while queue:
+            for function in functions.get(queue.pop(), ()):
+                for name in self.calls(function.block.children) - reachable:
+                    reachable.add(name)
+                    queue.append(name)
+        if reachable.issuperset(functions):
+            return
+        for block in self.blocks(program):
+            kept = [node for node in block.children
+                    if not isinstance(node, NodeFunction) or node.id.value in reachable]
+            self.functions += len(block.children) - len(kept)
+            block.children = kept
+
+    # неиспользуемые переменные
+
+    def remove_assignments(self, program):
+        reads = set()
+        written = set()
+        stack = [program]
+        while stack:
+            node = stack.pop()
+            if isinstance(node, NodeAssigning):
+                stack.append(node.right_side)
+                continue
+            if isinstance(node, NodeVar):
+                reads.add(node.id.value)
+            elif isinstance(node, Node):
+                stack.extend(children(node))
+        self.sweep(program, reads, written, self.declared(program.children), set())
+        for block in self.blocks(program):
+            kept = [node for node in block.children
+                    if not isinstance(node, NodeDeclaration)
+                    or node.id.value in reads or node.id.value in written]
+            self.declarations += len(block.children) - len(kept)
+            block.children = kept
+
+    def sweep(self, block, reads, written, scope, locals):
+        # удаляет из block и вложенных блоков присваивания непрочитанным
+        # переменным; scope - имена, объявленные в программе, locals - в
+        # функции, в теле которой находится block
+        kept = []
+        for node in block.children:
+            if isinstance(node, NodeAssigning):
+                name = node.left_side.id.value
+                if name not in reads and self.safe(node.right_side, scope, locals):
+                    self.assignments += 1
+                    continue
+                written.add(name)
+            elif isinstance(node, NodeFunction):
+                params = {param.id.value for param in node.formal_params.params}
+                self.sweep(node.block, reads, written, scope, params | self.declared(node.block.children))
+            else:
+                for inner in block_children(node):
+                    self.sweep(inner, reads, written, scope, locals)
+            kept.append(node)
+        block.children = kept
+
+    def safe(self, node, scope, locals):
+        stack = [node]
+        while stack:
+            node = stack.pop()
+            if isinstance(node, NodeLiteral):
+                continue
+            if isinstance(node, NodeVar):
+                if node.id.value not in scope and node.id.value not in locals:
+                    return False
+            elif isinstance(node, self.SAFE):
+                stack.extend(children(node))
+            else:
+                return False
+        return True
+
+    @staticmethod
+    def declared(statements):
+        # имена, объявленные в statements и их блоках (не в функциях): такие
+        # переменные получают значение по умолчанию до начала выполнения
+        # и никогда не бывают не определены
+        names = set()
+        stack = list(statements)
+        while stack:
+            node = stack.pop()
+            if isinstance(node, NodeDeclaration):
+                names.add(node.id.value)
+            elif not isinstance(node, NodeFunction):
+                for block in block_children(node):
+                    stack.extend(block.children)
+        return names
+
+class LoopOptimizer:
+    # Оптимизация циклов while.
+    #
+    # Вынос инвариантов: подвыражение тела или условия цикла, все
+    # переменные которого не меняются в цикле, вычисляется один раз перед
+    # циклом во временную переменную. Выносятся только выражения из + - * и
+    # унарного минуса над литералами и объявленными переменными: они не
+    # бросают исключений, поэтому их можно вычислить, даже если цикл не
+    # выполнится ни разу. Глобальная переменная не инвариантна, если в
+    # цикле вызывается функция SL - функция может её изменить.
+    #
+    # Понижение силы: индуктивная переменная i - целая переменная, которая
+    # меняется в цикле ровно одной инструкцией тела i = i + c или
+    # i = i - c с целым литералом c. Произведение i * k на целый литерал или
+    # инвариантную целую переменную k заменяется переменной t, которая
+    # вычисляется перед циклом и увеличивается на c * k сразу после i.
+    # Сложение стоит столько же, сколько умножение, поэтому замена выгодна,
+    # только если произведение встречается в цикле не меньше MIN_USES раз.
+    #
+    # Временные переменные получают имена PREFIX<n>, не совпадающие с
+    # именами программы, и объявляются перед циклом.
+    #
+    # Вложенные циклы оптимизируются изнутри наружу. Вынесенное из
+    # внутреннего цикла выражение, которое инвариантно и во внешнем цикле,
+    # переносится вместе со своей временной переменной перед внешним
+    # циклом, а не выносится заново во вторую временную переменную: так
+    # каждый инвариант вычисляется один раз перед самым внешним циклом, в
+    # котором он не меняется.
+
+    PREFIX = '_loop'
+    MIN_USES = 2
+
+    # операции, которые можно вынести из цикла
+    MOVABLE = (NodePlus, NodeMinus, NodeMultiply, NodeUnaryMinus)
+    BUILTINS = frozenset(builtins(None))
+
+    def __init__(self):
+        self.loops = 0
+        self.hoisted = 0
+        self.reduced = 0
+        # число узлов, вычисляемых за одну итерацию (условие и тело), до и
+        # после оптимизации по всем циклам
+        self.steps_before = 0
+        self.steps_after = 0
+        self.before = 0
+        self.after = 0
+        self.temps = 0
+        self.names = set()
+        self.functions = set()
+        # присваивания вынесенных выражений временным переменным: id
+        # присваивания -> объявление временной переменной
+        self.hoists = {}
+
+    def optimize(self, program):
+        program.frame = None
+        self.before += count_nodes(program)
+        stack = [program]
+        while stack:
+            node = stack.pop()
+            if isinstance(node, NodeFunction):
+                self.functions.add(node.id.value)
+            if isinstance(node, (NodeDeclaration, NodeVar, NodeFunction)):
+                self.names.add(node.id.value)
+            if isinstance(node, Node):
+                stack.extend(children(node))
+        types = self.types(program.children)
+        self.block(program, types, None)
+        self.after += count_nodes(program)
+        return program
+
+    def report(self):
+        return (f'оптимизация циклов: циклов {self.loops}, вынесено выражений {self.hoisted}, '
+                f'понижено умножений {self.reduced}, узлов за итерацию {self.steps_before} -> '
+                f'{self.steps_after}, узлов в программе {self.before} -> {self.after}')
+
+    @staticmethod
+    def types(statements, params=()):
+        # типы переменных, объявленных в statements и их блоках (не в
+        # функциях); None - массив или разные типы у одного имени
+        types = {param.id.value: scalar_type(param.type) for param in params}
+        stack = list(statements)
+        while stack:
+            node = stack.pop()
+            if isinstance(node, NodeDeclaration):
+                name = node.id.value
+                declared = scalar_type(node.type)
+                types[name] = declared if types.get(name, declared) == declared else None
+            elif not isinstance(node, NodeFunction):
+                for block in block_children(node):
+                    stack.extend(block.children)
+        return types
+
+    def temp(self):
+        while True:
+            self.temps += 1
+            name = f'{self.PREFIX}{self.temps}'
+            if name not in self.names:
+                self.names.add(name)
+                return name
+
+    def block(self, block, globals, locals):
+        # оптимизирует циклы в block; globals - типы глобальных переменных,
+        # locals - типы локальных переменных функции или None
+        result = []
+        for node in block.children:
+            if isinstance(node, NodeFunction):
+                self.block(node.block, globals, self.types(node.block.children, node.formal_params.params))
+            else:
+                for inner in block_children(node):
+                    self.block(inner, globals, locals)
+            if isinstance(node, NodeWhileConstruction):
+                result.extend(self.loop(node, globals, locals))
+            result.append(node)
+        block.children = result
+
+    def loop(self, node, globals, locals):
+        # инструкции, которые нужно вставить перед циклом node
+        self.loops += 1
+        self.steps_before += self.steps(node)
+        loop = Loop(self, node, globals, locals)
+        prelude = []
+        loop.lift(prelude)
+        loop.reduce(prelude)
+        loop.hoist(prelude)
+        self.steps_after += self.steps(node)
+        return prelude
+
+    @staticmethod
+    def assignments(nodes):
+        # имена переменных, которые присваиваются или объявляются в nodes,
+        # кроме тел функций
+        names = set()
+        stack = list(nodes)
+        while stack:
+            node = stack.pop()
+            if isinstance(node, NodeFunction) or not isinstance(node, Node):
+                continue
+            if isinstance(node, NodeAssigning):
+                names.add(node.left_side.id.value)
+            elif isinstance(node, NodeDeclaration):
+                names.add(node.id.value)
+            stack.extend(children(node))
+        return names
+
+    @staticmethod
+    def steps(node):
+        return count_nodes(node.condition) + sum(count_nodes(statement) for statement in node.block.children)
+
+    def declare(self, name, type, token):
+        return NodeDeclaration(NodeAtomType(Token(Token.ID, type, token.lineno, token.pos)),
+                               Token(Token.ID, name, token.lineno, token.pos))
+
+    @staticmethod
+    def var(name, token):
+        return NodeVar(Token(Token.ID, name, token.lineno, token.pos))
+
+class Loop:
+    # сведения об одном цикле для LoopOptimizer
+
+    def __init__(self, optimizer, node, globals, locals):
+        self.optimizer = optimizer
+        self.node = node
+        self.globals = globals
+        self.locals = locals if locals is not None else {}
+        self.token = first_token(node)
+        # сколько раз каждая переменная присваивается или объявляется в цикле
+        self.assigned = {}
+        self.clobbers = False
+        stack = [node.condition, *node.block.children]
+        while stack:
+            inner = stack.pop()
+            if isinstance(inner, NodeFunction) or not isinstance(inner, Node):
+                continue
+            if isinstance(inner, (NodeAssigning, NodeDeclaration)):
+                name = inner.left_side.id.value if isinstance(inner, NodeAssigning) else inner.id.value
+                self.assigned[name] = self.assigned.get(name, 0) + 1
+            elif isinstance(inner, NodeFunctionCall):
+                name = inner.id.value
+                if name not in optimizer.BUILTINS or name in optimizer.functions:
+                    self.clobbers = True
+            stack.extend(children(inner))
+
+    def type(self, name):
+        # тип объявленной скалярной переменной или None
+        if name in self.locals:
+            return self.locals[name]
+        type = self.globals.get(name)
+        return type if type in SCALARS else None
+
+    def invariant(self, name):
+        if name in self.assigned or self.type(name) not in SCALARS:
+            return False
+        return name in self.locals or not self.clobbers
+
+    def expression_type(self, node):
+        # тип выражения, если его можно вынести из цикла, иначе None
+        match node:
+            case NodeIntLiteral():
+                return 'int'
+            case NodeFloatLiteral():
+                return 'float'
+            case NodeStringLiteral():
+                return 'string'
+            case NodeVar():
+                return self.type(node.id.value) if self.invariant(node.id.value) else None
+            case NodeUnaryMinus():
+                operand = self.expression_type(node.operand)
+                return operand if operand in ('int', 'float') else None
+            case NodePlus() | NodeMinus() | NodeMultiply():
+                left = self.expression_type(node.left)
+                right = self.expression_type(node.right)
+                if left is None or right is None:
+                    return None
+                if left in ('int', 'float') and right in ('int', 'float'):
+                    return 'int' if left == right == 'int' else 'float'
+                if isinstance(node, NodePlus) and left == right == 'string':
+                    return 'string'
+        return None
+
+    def rewrite(self, replace):
+        # заменяет выражения условия и тела цикла: replace(node) возвращает
+        # замену узла или None, если нужно заменить его потомков
+        def expression(node):
+            if not isinstance(node, Node):
+                return node
+            replacement = replace(node)
+            if replacement is not None:
+                return replacement
+            if node.sequence:
+                setattr(node, node.fields[0], [expression(child) for child in getattr(node, node.fields[0])])
+            else:
+                for name in node.fields:
+                    setattr(node, name, expression(getattr(node, name)))
+            return node
+
+        def statements(block):
+            for statement in block.children:
+                match statement:
+                    case NodeAssigning():
+                        statement.right_side = expression(statement.right_side)
+                    case NodeFunctionCall():
+                        expression(statement.actual_params)
+                    case NodeReturnStatement():
+                        statement.expression = expression(statement.expression)
+                    case NodeIfConstruction():
+                        statement.condition = expression(statement.condition)
+                        statements(statement.block)
+                        statements(statement.else_block)
+                    case NodeWhileConstruction():
+                        statement.condition = expression(statement.condition)
+                        statements(statement.block)
+
+        self.node.condition = expression(self.node.condition)
+        statements(self.node.block)
+
+    def hoist(self, prelude):
+        temps = {}
+
+        def replace(node):
+            if not isinstance(node, self.optimizer.MOVABLE):
+                return None
+            type = self.expression_type(node)
+            if type is None or not self.has_variable(node):
+                return None
+            key = expression_key(node)
+            if key not in temps:
+                name = self.optimizer.temp()
+                declaration = self.optimizer.declare(name, type, self.token)
+                assigning = NodeAssigning(self.optimizer.var(name, self.token), node)
+                prelude.extend((declaration, assigning))
+                self.optimizer.hoists[id(assigning)] = declaration
+                temps[key] = name
+                self.optimizer.hoisted += 1
+            return self.optimizer.var(temps[key], self.token)
+
+        self.rewrite(replace)
+
+    def lift(self, prelude):
+        # переносит в prelude вынесенные из вложенных циклов выражения,
+        # инвариантные и в этом цикле
+        hoists = self.optimizer.hoists
+
+        def statements(block):
+            kept = []
+            for statement in block.children:
+                if (isinstance(statement, NodeAssigning) and id(statement) in hoists
+                        and self.expression_type(statement.right_side) is not None):
+                    declaration = hoists[id(statement)]
+                    if kept and kept[-1] is declaration:
+                        kept.pop()
+                        prelude.extend((declaration, statement))
+                        # временная переменная больше не меняется в цикле
+                        del self.assigned[statement.left_side.id.value]
+                        continue
+                if not isinstance(statement, NodeFunction):
+                    for inner in block_children(statement):
+                        statements(inner)
+                kept.append(statement)
+            block.children = kept
+
+        statements(self.node.block)
+
+    @staticmethod
+    def has_variable(node):
+        stack = [node]
+        while stack:
+            node = stack.pop()
+            if isinstance(node, NodeVar):
+                return True
+            if isinstance(node, Node):
+                stack.extend(children(node))
+        return False
+
+    def induction_variables(self):
+        # {имя: (индекс инструкции в теле, шаг)}
+        result = {}
+        for index, statement in enumerate(self.node.block.children):
+            if not isinstance(statement, NodeAssigning):
+                continue
+            name = statement.left_side.id.value
+            if self.assigned.get(name) != 1 or self.type(name) != 'int':
+                continue
+            if name not in self.locals and self.clobbers:
+                continue
+            right = statement.right_side
+            if not isinstance(right, (NodePlus, NodeMinus)):
+                continue
+            if isinstance(right.left, NodeVar) and right.left.id.value == name:
+                step = right.right
+            elif isinstance(right, NodePlus) and isinstance(right.right, NodeVar) and right.right.id.value == name:
+                step = right.left
+            else:
+                continue
+            if isinstance(step, NodeIntLiteral):
+                step = int(step.value.value)
+                result[name] = (index, -step if isinstance(right, NodeMinus) else step)
+        return result
+
+    def factor(self, node, variables):
+        # (индуктивная переменная, множитель) для произведения node или None
+        if not isinstance(node, NodeMultiply):
+            return None
+        for variable, factor in ((node.left, node.right), (node.right, node.left)):
+            if isinstance(variable, NodeVar) and variable.id.value in variables:
+                if isinstance(factor, NodeIntLiteral) or (
+                        isinstance(factor, NodeVar) and self.invariant(factor.id.value)
+                        and self.type(factor.id.value) == 'int'):
+                    return variable.id.value, factor
+        return None
+
+    def reduce(self, prelude):
+        variables = self.induction_variables()
+        if not variables:
+            return
+        uses = {}
+
+        def count(node):
+            found = self.factor(node, variables)
+            if found is not None:
+                key = (found[0], expression_key(found[1]))
+                uses[key] = uses.get(key, 0) + 1
+            return None
+
+        self.rewrite(count)
+        temps = {}
+        updates = []
+
+        def replace(node):
+            found = self.factor(node, variables)
+            if found is None:
+                return None
+            name, factor = found
+            key = (name, expression_key(factor))
+            if uses[key] < self.optimizer.MIN_USES:
+                return None
+            if key not in temps:
+                temp = self.optimizer.temp()
+                temps[key] = temp
+                prelude.append(self.optimizer.declare(temp, 'int', self.token))
+                prelude.append(NodeAssigning(self.optimizer.var(temp, self.token), node))
+                index, step = variables[name]
+                if isinstance(factor, NodeIntLiteral):
+                    increment = int(factor.value.value) * step
+                    increment = NodeIntLiteral(Token(Token.INT_LITERAL, str(increment), self.token.lineno, self.token.pos))
+                else:
+                    literal = NodeIntLiteral(Token(Token.INT_LITERAL, str(step), self.token.lineno, self.token.pos))
+                    increment = NodeMultiply(literal, self.optimizer.var(factor.id.value, self.token))
+                update = NodeAssigning(self.optimizer.var(temp, self.token),
+                                       NodePlus(self.optimizer.var(temp, self.token), increment))
+                updates.append((index, update))
+                self.optimizer.reduced += 1
+            return self.optimizer.var(temps[key], self.token)
+
+        self.rewrite(replace)
+        children = self.node.block.children
+        for index, update in sorted(updates, key=lambda update: update[0], reverse=True):
+            children.insert(index + 1, update)
+        # новые временные переменные меняются в цикле
+        for name in temps.values():
+            self.assigned[name] = 1
+
+class BoundsCheckEliminator:
+    # Снятие проверок индексов. Обращение a[i] проверяет при выполнении,
+    # что i >= 0 (отрицательный индекс Python читал бы с конца массива);
+    # верхнюю границу проверяет сам массив. Проход отмечает NodeIndexAccess.safe
+    # у обращений, индекс которых доказанно неотрицателен:
+    #   - неотрицательный литерал;
+    #   - счётчик цикла while: переменная, которая меняется в цикле ровно
+    #     одной инструкцией тела i = i + c с литералом c >= 0, а перед циклом
+    #     в том же блоке получает неотрицательное значение (или объявлена и
+    #     равна 0), причём между этим присваиванием и циклом её ничто не
+    #     меняет;
+    #   - сумма и произведение неотрицательных выражений, деление // и
+    #     остаток % от деления на положительный литерал.
+    # Глобальная переменная не считается счётчиком, если в цикле или перед
+    # ним вызывается функция SL - функция может её изменить.
+
+    def __init__(self):
+        self.total = 0
+        self.removed = 0
+        self.functions = set()
+
+    def eliminate(self, program):
+        stack = [program]
+        while stack:
+            node = stack.pop()
+            if isinstance(node, NodeFunction):
+                self.functions.add(node.id.value)
+            if isinstance(node, NodeIndexAccess):
+                self.total += 1
+            if isinstance(node, Node):
+                stack.extend(children(node))
+        self.block(program, frozenset(), None)
+        return program
+
+    def report(self):
+        return f'проверки индексов: снято {self.removed} из {self.total}'
+
+    def block(self, block, proven, locals):
+        # proven - переменные, неотрицательные во всём block; locals - имена
+        # локальных переменных функции или None на верхнем уровне
+        for index, node in enumerate(block.children):
+            match node:
+                case NodeFunction():
+                    params = {param.id.value for param in node.formal_params.params}
+                    self.block(node.block, frozenset(), params | DeadCodeEliminator.declared(node.block.children))
+                case NodeWhileConstruction():
+                    inner = proven | self.counters(node, block.children[:index], locals)
+                    self.mark(node.condition, inner)
+                    self.block(node.block, inner, locals)
+                case NodeIfConstruction():
+                    self.mark(node.condition, proven)
+                    self.block(node.block, proven, locals)
+                    self.block(node.else_block, proven, locals)
+                case NodeAssigning():
+                    self.mark(node.right_side, proven)
+                case NodeFunctionCall() | NodeReturnStatement():
+                    self.mark(node, proven)
+
+    def mark(self, node, proven):
+        stack = [node]
+        while stack:
+            node = stack.pop()
+            if isinstance(node, NodeIndexAccess) and not node.safe and self.non_negative(node.index, proven):
+                node.safe = True
+                self.removed += 1
+            if isinstance(node, Node):
+                stack.extend(children(node))
+
+    def non_negative(self, node, proven):
+        match node:
+            case NodeIntLiteral():
+                return int(node.value.value) >= 0
+            case NodeVar():
+                return node.id.value in proven
+            case NodePlus() | NodeMultiply():
+                return self.non_negative(node.left, proven) and self.non_negative(node.right, proven)
+            case NodeIDivision():
+                return self.non_negative(node.left, proven) and self.positive(node.right)
+            case NodeMod():
+                return self.positive(node.right)
+        return False
+
+    @staticmethod
+    def positive(node):
+        return isinstance(node, NodeIntLiteral) and int(node.value.value) > 0
+
+    def calls(self, nodes):
+        # есть ли в nodes вызовы функций SL
+        names = DeadCodeEliminator.calls(nodes)
+        return any(name in self.functions or name not in LoopOptimizer.BUILTINS for name in names)
+
+    def counters(self, loop, before, locals):
+        # счётчики цикла loop; before - инструкции блока перед циклом
+        assigned = {}
+        stack = [loop.condition, *loop.block.children]
+        while stack:
+            node = stack.pop()
+            if isinstance(node, NodeFunction) or not isinstance(node, Node):
+                continue
+            if isinstance(node, NodeAssigning):
+                name = node.left_side.id.value
+                assigned[name] = assigned.get(name, 0) + 1
+            elif isinstance(node, NodeDeclaration):
+                assigned[node.id.value] = 2
+            stack.extend(children(node))
+        clobbers = self.calls([loop])
+        counters = set()
+        for statement in loop.block.children:
+            if not isinstance(statement, NodeAssigning):
+                continue
+            name = statement.left_side.id.value
+            if assigned[name] != 1 or (clobbers and (locals is None or name not in locals)):
+                continue
+            right = statement.right_side
+            if (isinstance(right, NodePlus) and isinstance(right.left, NodeVar) and right.left.id.value == name
+                    and isinstance(right.right, NodeIntLiteral) and int(right.right.value.value) >= 0
+                    and self.initialized(name, before, locals)):
+                counters.add(name)
+        return counters
+
+    def initialized(self, name, before, locals):
+        # неотрицательна ли переменная name после инструкций before
+        is_global = locals is None or name not in locals
+        for node in reversed(before):
+            match node:
+                case NodeAssigning() if node.left_side.id.value == name:
+                    return self.non_negative(node.right_side, frozenset())
+                case NodeDeclaration() if node.id.value == name:
+                    return isinstance(node.type, NodeAtomType) and type_name(node.type) == 'int'
+            if isinstance(node, NodeFunction):
+                continue
+            if is_global and self.calls([node]):
+                return False
+            if name in LoopOptimizer.assignments([node]):
+                return False
+        return False
+
+class Inliner:
+    # Встраивание и мемоизация чистых функций.
+    #
+    # Чистая функция не печатает, не присваивает глобальным переменным, не
+    # меняет массивы, переданные параметрами, не объявляет функций и
+    # вызывает только чистые функции и встроенные str, int, float и len.
+    # Кроме того, она не читает глобальных переменных: её результат зависит
+    # только от аргументов, поэтому его можно запоминать. Рассматриваются
+    # только функции, объявленные один раз и на верхнем уровне: такая
+    # функция доступна с начала программы, и никакое объявление не
+    # подменяет её во время выполнения.
+    #
+    # Встраивается чистая функция с телом не больше max_nodes узлов, без
+    # рекурсивных вызовов, со скалярными параметрами и с return только в
+    # конце тела (в том числе в конце обеих веток if в конце тела). Вызов
+    # встраивается, если это вся правая часть присваивания x = f(...) или
+    # выражение return f(...): параметры и локальные переменные функции
+    # получают новые имена PREFIX<n>_<имя> и объявляются на месте вызова,
+    # аргументы присваиваются параметрам по порядку, а return e в теле
+    # становится x = e (или остаётся return e). Функция не читает глобальных
+    # переменных, так что имена её тела не могут совпасть с локальными
+    # переменными вызывающего кода.
+    #
+    # Остальные чистые функции со скалярными параметрами и результатом
+    # отмечаются для мемоизации: NodeFunction.memo - размер LRU-кэша,
+    # который исполнители добавляют к функции.
+
+    MAX_NODES = 40
+    MEMO_SIZE = 1024
+    PREFIX = '_inline'
+
+    def __init__(self, max_nodes=MAX_NODES, memo_size=MEMO_SIZE):
+        self.max_nodes = max_nodes
+        self.memo_size = memo_size
+        self.pure = set()
+        self.inlinable = set()
+        self.memoized = set()
+        self.sites = 0
+        self.temps = 0
+        self.names = set()
+
+    def inline(self, program):
+        program.frame = None
+        definitions = {}
+        stack = [program]
+        while stack:
+            node = stack.pop()
+            if isinstance(node, NodeFunction):
+                definitions.setdefault(node.id.value, []).append(node)
+            if isinstance(node, (NodeDeclaration, NodeVar, NodeFunction)):
+                self.names.add(node.id.value)
+            if isinstance(node, Node):
+                stack.extend(children(node))
+        functions = {node.id.value: node for node in program.children
+                     if isinstance(node, NodeFunction) and len(definitions[node.id.value]) == 1}
+        self.find_pure(functions, set(definitions))
+        for name in self.pure:
+            node = functions[name]
+            scalar = (scalar_type(node.ret_type) is not None
+                      and all(scalar_type(param.type) is not None for param in node.formal_params.params))
+            if not scalar:
+                continue
+            if (count_nodes(node.block) <= self.max_nodes and name not in DeadCodeEliminator.calls(node.block.children)
+                    and self.tail_returns(node.block.children)):
+                self.inlinable.add(name)
+            elif self.memo_size > 0:
+                node.memo = self.memo_size
+                self.memoized.add(name)
+        if self.inlinable:
+            self.scope(program, functions)
+        return program
+
+    def report(self):
+        return (f'встраивание: чистых функций {len(self.pure)}, встраиваемых {len(self.inlinable)}, '
+                f'встроено вызовов {self.sites}, мемоизируемых функций {len(self.memoized)}'
+                + (f' ({", ".join(sorted(self.memoized))})' if self.memoized else ''))
+
+    # чистые функции
+
+    def find_pure(self, functions, defined):
+        # функции без побочных эффектов, которые не читают глобальных
+        # переменных; callees - вызываемые функции SL
+        callees = {}
+        for name, node in functions.items():
+            found = self.callees(node, defined)
+            if found is not None:
+                callees[name] = found
+        # исключаем функции, вызывающие нечистые, пока что-то меняется
+        pure = set(callees)
+        changed = True
+        while changed:
+            changed = False
+            for name in list(pure):
+                if not callees[name] <= pure:
+                    pure.discard(name)
+                    changed = True
+        self.pure = pure
+
+    def callees(self, function, defined):
+        # имена функций SL, которые вызывает function, или None, если у
+        # неё есть собственные побочные эффекты или она читает глобальные
+        # переменные
+        params = {param.id.value: param for param in function.formal_params.params}
+        locals = set(params) | DeadCodeEliminator.declared(function.block.children)
+        names = set()
+        stack = list(function.block.children)
+        while stack:
+            node = stack.pop()
+            match node:
+                case NodeFunction():
+                    return None
+                case NodeAssigning():
+                    name = node.left_side.id.value
+                    if name not in locals:
+                        return None
+                    if (isinstance(node.right_side, NodeSequence) and name in params
+                            and isinstance(params[name].type, NodeComplexType)):
+                        return None
+                case NodeVar():
+                    if node.id.value not in locals:
+                        return None
+                case NodeFunctionCall():
+                    name = node.id.value
+                    if name in defined:
+                        names.add(name)
+                    elif name not in LoopOptimizer.BUILTINS or name == 'print':
+                        return None
+            if isinstance(node, Node):
+                stack.extend(children(node))
+        return names
+
+    # встраивание
+
+    def tail_returns(self, statements):
+        # все return в statements стоят в конце (или в конце веток if в
+        # конце), и каждый путь заканчивается return со значением
+        if not statements:
+            return False
+        *rest, last = statements
+        if any(isinstance(node, NodeReturnStatement) for node in self.statements(rest)):
+            return False
+        match last:
+            case NodeReturnStatement():
+                return last.expression is not None
+            case NodeIfConstruction():
+                return self.tail_returns(last.block.children) and self.tail_returns(last.else_block.children)
+        return False
+
+    @staticmethod
+    def statements(nodes):
+        stack = list(nodes)
+        while stack:
+            node = stack.pop()
+            yield node
+            for block in block_children(node):
+                stack.extend(block.children)
+
+    def scope(self, block, functions):
+        # встраивание в теле программы или функции; объявления параметров
+        # встроенных функций выносятся в его начало, чтобы не сбрасывать
+        # их на каждой итерации цикла
+        declarations = []
+        self.block(block, functions, declarations)
+        block.children = declarations + block.children
+
+    def block(self, block, functions, declarations):
+        result = []
+        for node in block.children:
+            if isinstance(node, NodeFunction):
+                self.scope(node.block, functions)
+            else:
+                for inner in block_children(node):
+                    self.block(inner, functions, declarations)
+            call = None
+            if isinstance(node, NodeAssigning):
+                call = node.right_side
+            elif isinstance(node, NodeReturnStatement):
+                call = node.expression
+            if (isinstance(call, NodeFunctionCall) and call.id.value in self.inlinable
+                    and len(call.actual_params.params) == len(functions[call.id.value].formal_params.params)):
+                target = node.left_side.id.value if isinstance(node, NodeAssigning) else None
+                result.extend(self.expand(functions[call.id.value], call, target, first_token(node), declarations))
+                self.sites += 1
+            else:
+                result.append(node)
+        block.children = result
+
+    def rename(self, names):
+        # новые имена для names с общим номером места встраивания
+        while True:
+            self.temps += 1
+            renamed = {name: f'{self.PREFIX}{self.temps}_{name}' for name in names}
+            if self.names.isdisjoint(renamed.values()):
+                self.names.update(renamed.values())
+                return renamed
+
+    def expand(self, function, call, target, token, declarations):
+        # инструкции, заменяющие вызов call функции function; target -
+        # переменная для результата или None для return. Локальные
+        # переменные объявлены в копии тела, объявления параметров
+        # добавляются в declarations
+        params = function.formal_params.params
+        names = [param.id.value for param in params]
+        names += [node.id.value for node in self.statements(function.block.children)
+                  if isinstance(node, NodeDeclaration)]
+        locals = self.rename(dict.fromkeys(names))
+        declarations.extend(NodeDeclaration(copy_tree(param.type, {}, token),
+                                            Token(Token.ID, locals[param.id.value], token.lineno, token.pos))
+                            for param in params)
+        result = []
+        for param, arg in zip(params, call.actual_params.params):
+            result.append(NodeAssigning(NodeVar(Token(Token.ID, locals[param.id.value], token.lineno, token.pos)), arg))
+        body = [copy_tree(node, locals) for node in function.block.children]
+        result.extend(self.replace_returns(body, target))
+        return result
+
+    def replace_returns(self, statements, target):
+        if target is None:
+            return statements
+        last = statements[-1]
+        if isinstance(last, NodeReturnStatement):
+            token = first_token(last)
+            statements[-1] = NodeAssigning(NodeVar(Token(Token.ID, target, token.lineno, token.pos)), last.expression)
+        else:
+            last.block.children = self.replace_returns(last.block.children, target)
+            last.else_block.children = self.replace_returns(last.else_block.children, target)
+        return statements
+
+def copy_tree(node, rename, token=None):
+    # копия поддерева node; имена переменных из rename заменяются, а если
+    # задан token - позиции всех токенов копии берутся из него
+    if isinstance(node, Token):
+        value = node.value
+        if node.name == Token.ID and value in rename:
+            value = rename[value]
+        lineno, pos = (token.lineno, token.pos) if token is not None else (node.lineno, node.pos)
+        return Token(node.name, value, lineno, pos)
+    if not isinstance(node, Node):
+        return node
+    copy = type(node).empty()
+    if node.sequence:
+        setattr(copy, node.fields[0], [copy_tree(child, rename, token) for child in getattr(node, node.fields[0])])
+    else:
+        for name in node.fields:
+            child = getattr(node, name)
+            if isinstance(node, (NodeFunctionCall, NodeAtomType, NodeComplexType)) and isinstance(child, Token):
+                # имена функций и типов не переименовываются
+                child = copy_tree(child, {}, token)
+            else:
+                child = copy_tree(child, rename, token)
+            setattr(copy, name, child)
+    return copy
+
+def scalar_type(node):
+    # имя скалярного типа или None для массивов и других типов
+    name = type_name(node)
+    return name if isinstance(node, NodeAtomType) and name in SCALARS else None
+
+def expression_key(node):
+    # структурный ключ выражения: одинаковые выражения дают равные ключи
+    if isinstance(node, NodeLiteral):
+        return (type(node), node.value.value)
+    if isinstance(node, NodeVar):
+        return (NodeVar, node.id.value)
+    if isinstance(node, Node):
+        return (type(node), *map(expression_key, children(node)))
+    return node
+
+def optimize(program, report=None, inline_nodes=Inliner.MAX_NODES, memo_size=Inliner.MEMO_SIZE):
+    # все проходы по порядку; report - список, куда добавляются отчёты
+    # проходов; inline_nodes и memo_size - настройки Inliner. Большинство
+    # проходов предполагает правильно типизированную программу, поэтому для
+    # программы с семантическими ошибками выполняются только свёртка
+    # констант и удаление мёртвого кода без преобразований, зависящих от
+    # типов: ошибка типов в такой программе случится во время выполнения,
+    # как и без -O
+    try:
+        analyze(program)
+    except CompileErrors as failure:
+        folder = ConstantFolder(typed=False)
+        folder.fold(program)
+        eliminator = DeadCodeEliminator(typed=False)
+        eliminator.eliminate(program)
+        if report is not None:
+            report.append(f'семантических ошибок {len(failure.errors)}: выполняются только проходы, '
+                          f'не зависящие от типов')
+            report.append(folder.report())
+            report.append(eliminator.report())
+        return program
+    inliner = Inliner(inline_nodes, memo_size)
+    inliner.inline(program)
+    folder = ConstantFolder(typed=True)
+    folder.fold(program)
+    eliminator = DeadCodeEliminator(typed=True)
+    eliminator.eliminate(program)
+    loops = LoopOptimizer()
+    loops.optimize(program)
+    bounds = BoundsCheckEliminator()
+    bounds.eliminate(program)
+    # проходы добавляют, переносят и удаляют переменные, поэтому номера
+    # (глубина, номер) размечаются заново; если разметка не удалась,
+    # program.frame остаётся None и исполнители ищут переменные по именам
+    try:
+        analyze(program)
+    except CompileErrors:
+        pass
+    if report is not None:
+        report.append(inliner.report())
+        report.append(folder.report())
+        report.append(eliminator.report())
+        report.append(loops.report())
+        report.append(bounds.report())
+    return program
+
+def add_arguments(parser):
+    # настройки optimize для командной строки: общие для оптимизатора и
+    # исполнителей
+    parser.add_argument('--inline-nodes', type=int, default=Inliner.MAX_NODES,
+                        help='наибольший размер тела встраиваемой функции, узлов')
+    parser.add_argument('--memo-size', type=int, default=Inliner.MEMO_SIZE,
+                        help='размер кэша мемоизации чистых функций (0 - без мемоизации)')
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Оптимизация дерева разбора программы SL')
+    parser.add_argument('path')
+    parser.add_argument('--ast', action='store_true', help='вывести оптимизированное дерево')
+    add_arguments(parser)
+    args = parser.parse_args(argv)
+    try:
+        with open(args.path, 'rb') as f:
+            program = Parser(TableLexer(f), recover=True).parse()
+    except CompileErrors as errors:
+        for error in errors.errors:
+            print(error)
+        return 1
+    except CompileError as error:
+        print(error)
+        return 1
+    except OSError as error:
+        print(f'Не удалось прочитать файл: {error.strerror}')
+        return 1
+    report = []
+    optimize(program, report, args.inline_nodes, args.memo_size)
+    if args.ast:
+        program.write(sys.stdout)
+    for line in report:
+        print(line, file=sys.stderr)
+    return 0
+
+if __name__ == '__main__':
+    sys.exit(main())
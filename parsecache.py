@@ -0,0 +1,183 @@
+import argparse
+import hashlib
+import os
+import sys
+import tempfile
+import time
+
+import astio
+from lexer import TableLexer
+from slparser import Parser
+from version import VERSION
+
+class ParseCache:
+    # Дисковый кэш деревьев разбора. Ключ - хэш исходного текста, версии
+    # компилятора и версии двоичного формата дерева, значение - дерево в
+    # формате astio. Время изменения файла записи обновляется при каждом
+    # попадании, и при превышении max_bytes удаляются записи, к которым
+    # дольше всего не обращались (LRU).
+
+    SUFFIX = '.slast'
+    TITLE = 'кэш разбора'
+
+    def __init__(self, directory, max_bytes=256 * 2**20):
+        self.directory = directory
+        self.max_bytes = max_bytes
+        os.makedirs(directory, exist_ok=True)
+        self.__size = None
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.errors = 0
+        self.hit_time = 0.0
+        self.miss_time = 0.0
+
+    def tag(self):
+        # версия формата записей; входит в ключ
+        return f'{astio.VERSION}'
+
+    def encode(self, value):
+        return astio.dumps_binary(value)
+
+    def decode(self, data, symbols=None):
+        return astio.loads_binary(data, symbols)
+
+    def key(self, source: bytes):
+        digest = hashlib.sha256()
+        digest.update(f'{VERSION}\0{self.tag()}\0'.encode())
+        digest.update(source)
+        return digest.hexdigest()
+
+    def path(self, key):
+        return os.path.join(self.directory, key + self.SUFFIX)
+
+    def get(self, source: bytes, symbols=None):
+        path = self.path(self.key(source))
+        try:
+            with open(path, 'rb') as f:
+                data = f.read()
+        except FileNotFoundError:
+            return None
+        try:
+            program = self.decode(data, symbols)
+        except Exception:
+            # повреждённая или недописанная запись - считаем промахом
+            self.errors += 1
+            self.__remove(path)
+            return None
+        # время изменения служит меткой последнего обращения; запись могла
+        # быть вытеснена параллельной сборкой уже после чтения
+        try:
+            os.utime(path)
+        except FileNotFoundError:
+            pass
+        return program
+
+    def put(self, source: bytes, program):
+        data = self.encode(program)
+        path = self.path(self.key(source))
+        # запись во временный файл и атомарная замена: параллельные сборки
+        # никогда не увидят недописанную запись
+        fd, temp = tempfile.mkstemp(dir=self.directory, suffix='.tmp')
+        try:
+            with os.fdopen(fd, 'wb') as f:
+                f.write(data)
+            old_size = os.path.getsize(path) if os.path.exists(path) else 0
+            # размер считается до замены: иначе первый обход каталога в
+            # size() учёл бы новую запись дважды
+            size = self.size() - old_size
+            os.replace(temp, path)
+        except BaseException:
+            self.__remove(temp)
+            raise
+        self.__size = size + len(data)
+        if self.__size > self.max_bytes:
+            self.evict()
+
+    def parse(self, source: bytes, lexer=TableLexer, parser=Parser):
+        # дерево разбора source: из кэша, а при промахе - разбором
+        start = time.perf_counter()
+        program = self.get(source)
+        if program is not None:
+            self.hits += 1
+            self.hit_time += time.perf_counter() - start
+            return program
+        program = parser(lexer(source)).parse()
+        self.put(source, program)
+        self.misses += 1
+        self.miss_time += time.perf_counter() - start
+        return program
+
+    def parse_file(self, path, lexer=TableLexer, parser=Parser):
+        with open(path, 'rb') as f:
+            return self.parse(f.read(), lexer, parser)
+
+    def __entries(self):
+        entries = []
+        for entry in os.scandir(self.directory):
+            if entry.name.endswith(self.SUFFIX):
+                try:
+                    stat = entry.stat()
+                except FileNotFoundError:
+                    continue
+                entries.append((stat.st_mtime, stat.st_size, entry.path))
+        return entries
+
+    def size(self):
+        if self.__size is None:
+            self.__size = sum(size for _, size, _ in self.__entries())
+        return self.__size
+
+    def evict(self):
+        entries = sorted(self.__entries())
+        size = sum(size for _, size, _ in entries)
+        for _, entry_size, path in entries:
+            if size <= self.max_bytes:
+                break
+            if self.__remove(path):
+                size -= entry_size
+                self.evictions += 1
+        self.__size = size
+
+    def clear(self):
+        for _, _, path in self.__entries():
+            self.__remove(path)
+        self.__size = 0
+
+    @staticmethod
+    def __remove(path):
+        try:
+            os.remove(path)
+            return True
+        except FileNotFoundError:
+            return False
+
+    def report(self):
+        lookups = self.hits + self.misses
+        lines = [f'{self.TITLE} {self.directory}: попаданий {self.hits}, промахов {self.misses}'
+                 f', вытеснено {self.evictions}, повреждённых записей {self.errors}'
+                 f', размер {self.size() / 2**20:.1f} из {self.max_bytes / 2**20:.0f} МБ']
+        if self.hits:
+            lines.append(f'  попадание: {self.hit_time * 1000 / self.hits:.2f} мс в среднем')
+        if self.misses:
+            lines.append(f'  промах (разбор и запись): {self.miss_time * 1000 / self.misses:.2f} мс в среднем')
+        if lookups:
+            lines.append(f'  всего: {(self.hit_time + self.miss_time) * 1000:.1f} мс')
+        return '\n'.join(lines)
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Разбор файлов SL через дисковый кэш деревьев разбора')
+    parser.add_argument('files', nargs='+')
+    parser.add_argument('--cache-dir', default='.slcache')
+    parser.add_argument('--max-size', type=float, default=256, help='предельный размер кэша, МБ')
+    parser.add_argument('--clear', action='store_true', help='очистить кэш перед разбором')
+    args = parser.parse_args(argv)
+    cache = ParseCache(args.cache_dir, int(args.max_size * 2**20))
+    if args.clear:
+        cache.clear()
+    for path in args.files:
+        cache.parse_file(path)
+    print(cache.report(), file=sys.stderr)
+
+if __name__ == '__main__':
+    main()
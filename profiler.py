@@ -0,0 +1,248 @@
+import gc
+import json
+import time
+import tracemalloc
+from collections import Counter
+
+from lexer import Token
+from optimizer import count_nodes
+from slparser import Parser
+
+# Профилирование разбора (--stats и --trace в compiler.py). Profiler
+# подключается к экземплярам лексера и парсера: get_next_token и
+# грамматические методы Parser заменяются обёртками в атрибутах экземпляра.
+# Классы не меняются, поэтому без профилирования разбор ничем не
+# замедляется.
+#
+# Обёртки строят дерево вызовов: узел - путь из вызовов от корня, в нём
+# число вызовов и общее время. Из дерева получаются фазы (лексер - всё,
+# что внутри get_next_token, парсер - остальное), число вызовов, общее и
+# собственное время каждого метода и наибольшая глубина рекурсии. Трасса
+# в формате Chrome trace event выкладывает узлы дерева на шкалу времени
+# друг за другом, как flame graph (chrome://tracing, Perfetto, speedscope).
+#
+# Память меряется вторым разбором того же файла под tracemalloc, в
+# котором обёрнут только get_next_token: tracemalloc замедляет разбор в
+# несколько раз и исказил бы время методов. Время с профилированием всё
+# равно включает стоимость обёрток, поэтому сравнивать стоит доли
+# методов, а не абсолютное время с обычным разбором.
+
+class CallNode:
+    # узел дерева вызовов: путь от корня до вызова name
+    __slots__ = ('name', 'calls', 'time', 'children')
+
+    def __init__(self, name):
+        self.name = name
+        self.calls = 0
+        self.time = 0.0
+        self.children = {}
+
+    def child(self, name):
+        node = self.children.get(name)
+        if node is None:
+            node = self.children[name] = CallNode(name)
+        return node
+
+class MethodStats:
+    # вызовы одного метода по всему дереву: total - время без повторного
+    # учёта рекурсивных вызовов, own - собственное время без вложенных
+    __slots__ = ('calls', 'total', 'own')
+
+    def __init__(self):
+        self.calls = 0
+        self.total = 0.0
+        self.own = 0.0
+
+def gc_collections():
+    return sum(generation['collections'] for generation in gc.get_stats())
+
+class Profiler:
+    # грамматические методы Parser
+    GRAMMAR = ('terminated_statement', 'statement', 'block', 'else_block', 'declaration', 'type',
+               'formal_params', 'actual_params', 'sequence', 'condition', 'or_operand', 'and_operand',
+               'logical_operand', 'expression', 'term', 'factor', 'operand')
+    LEXER = 'get_next_token'
+    # сколько методов выводит table()
+    TOP = 20
+
+    def __init__(self):
+        self.root = CallNode('разбор')
+        self.stack = [self.root]
+        self.tokens = Counter()
+        self.files = 0
+        self.size = 0
+        self.nodes = 0
+        self.collections = 0
+        # прирост памяти за разбор и внутри лексера и пик, в байтах
+        self.memory = 0
+        self.lexer_memory = 0
+        self.peak = 0
+
+    def wrap(self, name, method):
+        stack = self.stack
+        clock = time.perf_counter
+
+        def wrapper(*args):
+            node = stack[-1].child(name)
+            stack.append(node)
+            start = clock()
+            try:
+                return method(*args)
+            finally:
+                node.time += clock() - start
+                node.calls += 1
+                stack.pop()
+        return wrapper
+
+    def attach_lexer(self, lexer):
+        get_next_token = self.wrap(self.LEXER, lexer.get_next_token)
+        tokens = self.tokens
+
+        def counted():
+            token = get_next_token()
+            tokens[token.name] += 1
+            return token
+        lexer.get_next_token = counted
+        return lexer
+
+    def attach_parser(self, parser):
+        for name in self.GRAMMAR:
+            setattr(parser, name, self.wrap(name, getattr(parser, name)))
+        return parser
+
+    def parse(self, name, source, lexer_class, parser_class=Parser):
+        # разбор source с профилированием; name - узел файла в дереве вызовов
+        node = self.root.child(name)
+        self.stack.append(node)
+        collections = gc_collections()
+        start = time.perf_counter()
+        try:
+            program = self.attach_parser(parser_class(self.attach_lexer(lexer_class(source)))).parse()
+        finally:
+            elapsed = time.perf_counter() - start
+            for entry in (node, self.root):
+                entry.time += elapsed
+                entry.calls += 1
+            self.collections += gc_collections() - collections
+            self.stack.pop()
+            self.files += 1
+            self.size += len(source)
+        self.nodes += count_nodes(program)
+        self.measure_memory(source, lexer_class, parser_class)
+        return program
+
+    def measure_memory(self, source, lexer_class, parser_class=Parser):
+        # повторный разбор под tracemalloc: прирост памяти всего разбора и
+        # внутри get_next_token, пик
+        lexer = lexer_class(source)
+        get_next_token = lexer.get_next_token
+        traced = tracemalloc.get_traced_memory
+        lexer_memory = 0
+
+        def measured():
+            nonlocal lexer_memory
+            start = traced()[0]
+            token = get_next_token()
+            lexer_memory += traced()[0] - start
+            return token
+        lexer.get_next_token = measured
+        tracing = tracemalloc.is_tracing()
+        if not tracing:
+            tracemalloc.start()
+        tracemalloc.reset_peak()
+        start = traced()[0]
+        try:
+            program = parser_class(lexer).parse()
+            memory, peak = traced()
+            del program
+        finally:
+            if not tracing:
+                tracemalloc.stop()
+        self.memory += memory - start
+        self.lexer_memory += lexer_memory
+        self.peak = max(self.peak, peak - start)
+
+    # сводка
+
+    def methods(self):
+        # имя -> MethodStats для всех вызовов внутри файлов и наибольшая
+        # глубина вложенности грамматических методов
+        stats = {}
+        active = Counter()
+        depth = 0
+        # (узел, глубина) - вход в узел, (узел, None) - выход из него
+        stack = [(file, 0) for file in self.root.children.values()]
+        while stack:
+            node, level = stack.pop()
+            if level is None:
+                active[node.name] -= 1
+                continue
+            if level > 0:
+                if node.name != self.LEXER:
+                    depth = max(depth, level)
+                entry = stats.get(node.name)
+                if entry is None:
+                    entry = stats[node.name] = MethodStats()
+                entry.calls += node.calls
+                entry.own += node.time - sum(child.time for child in node.children.values())
+                if not active[node.name]:
+                    entry.total += node.time
+                active[node.name] += 1
+                stack.append((node, None))
+            for child in node.children.values():
+                stack.append((child, level + 1))
+        return stats, depth
+
+    def phases(self, stats):
+        # (название, время, прирост памяти, объём, единица)
+        lexer = stats.get(self.LEXER, MethodStats())
+        tokens = sum(self.tokens.values())
+        return [
+            ('лексер', lexer.total, self.lexer_memory, tokens, 'токенов'),
+            ('парсер', self.root.time - lexer.total, self.memory - self.lexer_memory, self.nodes, 'узлов'),
+            ('всего', self.root.time, self.memory, self.size, 'байт'),
+        ]
+
+    def table(self):
+        stats, depth = self.methods()
+        lines = [f'файлов: {self.files}, {self.size / 1024:.1f} КБ, сборок мусора: {self.collections}, '
+                 f'пик памяти: {self.peak / 2**20:.1f} МБ, наибольшая глубина рекурсии разбора: {depth}',
+                 '',
+                 f'{"фаза":<10}{"время, мс":>12}{"прирост, КБ":>14}{"объём":>12}  скорость']
+        for title, elapsed, memory, amount, unit in self.phases(stats):
+            rate = f'{amount / elapsed:,.0f} {unit}/с' if elapsed > 0 else '-'
+            lines.append(f'{title:<10}{elapsed * 1000:>12.2f}{memory / 1024:>+14,.1f}{amount:>12,}  {rate}')
+        lines.append('прирост памяти парсера бывает отрицательным: он освобождает токены, выделенные лексером')
+
+        total = self.root.time or 1.0
+        lines += ['', f'{"метод":<22}{"вызовов":>12}{"всего, мс":>12}{"собств., мс":>13}{"собств., %":>12}']
+        ranked = sorted(stats.items(), key=lambda item: item[1].own, reverse=True)
+        for name, entry in ranked[:self.TOP]:
+            lines.append(f'{name:<22}{entry.calls:>12,}{entry.total * 1000:>12.2f}{entry.own * 1000:>13.2f}'
+                         f'{entry.own / total:>12.1%}')
+
+        count = sum(self.tokens.values()) or 1
+        lines += ['', f'{"токен":<22}{"число":>12}{"доля":>12}']
+        for kind, number in self.tokens.most_common():
+            lines.append(f'{Token.token_names[kind]:<22}{number:>12,}{number / count:>12.1%}')
+        return '\n'.join(lines)
+
+    def trace_events(self):
+        # дерево вызовов в формате Chrome trace event: дочерние узлы идут
+        # друг за другом от начала родителя, время - в микросекундах
+        events = [{'name': 'process_name', 'ph': 'M', 'pid': 1, 'tid': 1, 'args': {'name': 'SL'}}]
+        stack = [(self.root, 0.0)]
+        while stack:
+            node, start = stack.pop()
+            events.append({'name': node.name, 'ph': 'X', 'pid': 1, 'tid': 1,
+                           'ts': round(start * 1e6, 3), 'dur': round(node.time * 1e6, 3),
+                           'args': {'calls': node.calls}})
+            offset = start
+            for child in node.children.values():
+                stack.append((child, offset))
+                offset += child.time
+        return {'traceEvents': events, 'displayTimeUnit': 'ms'}
+
+    def write_trace(self, path):
+        with open(path, 'w') as f:
+            json.dump(self.trace_events(), f, ensure_ascii=False)
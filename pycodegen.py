@@ -0,0 +1,530 @@
+import argparse
+import marshal
+import math
+import sys
+import time
+
+from errors import CompileError, CompileErrors, ExecutionError
+from lexer import TableLexer
+from optimizer import Inliner, add_arguments, optimize
+from parsecache import ParseCache
+from runtime import (DEFAULTS, RUNTIME_ERRORS, ConstantSequence, assign_constant, assign_sequence,
+                     builtins, default_value, describe, first_token, index, is_array, literal_values,
+                     memo_report, memoize, new_array, statements, type_name, unchecked_index)
+from slparser import (NodeAnd, NodeAssigning, NodeDeclaration, NodeDivision, NodeEQ,
+                      NodeFloatLiteral, NodeFunction, NodeFunctionCall, NodeG, NodeGE,
+                      NodeIDivision, NodeIfConstruction, NodeIndexAccess, NodeIntLiteral,
+                      NodeL, NodeLE, NodeMinus, NodeMod, NodeMultiply, NodeNEQ, NodeNot,
+                      NodeOr, NodePlus, NodeReturnStatement, NodeSequence, NodeStringLiteral,
+                      NodeUnaryMinus, NodeVar, NodeWhileConstruction, Parser)
+
+# Перевод программы SL в текст на Python, который компилируется встроенной
+# compile() и выполняется интерпретатором CPython: функции SL становятся
+# функциями Python, while - циклом while, массивы - массивами runtime.py.
+#
+# Имена SL получают префиксы, чтобы не совпадать со служебными именами и
+# ключевыми словами Python: переменные - v_, ячейки функций - fn_.
+# Функция SL компилируется в функцию f<номер>_<имя>, а объявление функции
+# присваивает её глобальному имени fn_<имя>, так что повторное объявление
+# подменяет функцию для всех вызовов, как в interpreter.py. Инструкции
+# верхнего уровня выполняются в функции _main, где все глобальные имена
+# объявлены через global. Скобки ставятся только там, где без них Python
+# разобрал бы выражение иначе, чем оно записано в дереве: вокруг операнда
+# с более слабым оператором, вокруг правого операнда с тем же приоритетом и
+# вокруг любого сравнения внутри сравнения (в Python a < b < c - цепочка
+# сравнений, а в SL - (a < b) < c). Так длинные цепочки операций не
+# упираются в предел вложенности скобок CPython.
+#
+# Каждый уровень вложенности блоков - уровень отступа, а CPython допускает
+# не больше MAX_DEPTH уровней; более глубокая программа не переводится и
+# даёт ошибку компиляции в позиции инструкции, блок которой слишком глубок.
+#
+# Для каждой строки сгенерированного текста запоминается позиция
+# инструкции SL, из которой она получена: по ней ошибки выполнения
+# сообщаются в координатах исходного файла.
+
+# версия генератора; входит в ключ кэша скомпилированного кода
+CODEGEN_VERSION = 4
+
+# имя файла сгенерированного кода в трассировках исключений
+FILENAME = '<sl>'
+
+# наибольший уровень отступа, который принимает компилятор CPython
+MAX_DEPTH = 99
+
+OPERATORS = {
+    NodePlus      : '+',
+    NodeMinus     : '-',
+    NodeMultiply  : '*',
+    NodeDivision  : '/',
+    NodeIDivision : '//',
+    NodeMod       : '%',
+    NodeL         : '<',
+    NodeG         : '>',
+    NodeLE        : '<=',
+    NodeGE        : '>=',
+    NodeEQ        : '==',
+    NodeNEQ       : '!=',
+    NodeAnd       : 'and',
+    NodeOr        : 'or',
+}
+
+# приоритеты операторов Python: чем больше, тем сильнее связывает
+PRECEDENCE = {
+    NodeOr        : 1,
+    NodeAnd       : 2,
+    NodeNot       : 3,
+    NodeL         : 4,
+    NodeG         : 4,
+    NodeLE        : 4,
+    NodeGE        : 4,
+    NodeEQ        : 4,
+    NodeNEQ       : 4,
+    NodePlus      : 5,
+    NodeMinus     : 5,
+    NodeMultiply  : 6,
+    NodeDivision  : 6,
+    NodeIDivision : 6,
+    NodeMod       : 6,
+    NodeUnaryMinus: 7,
+}
+COMPARISON = 4
+UNARY = 7
+# литералы, переменные, вызовы и индексы
+ATOM = 8
+
+def variable_name(name):
+    return f'v_{name}'
+
+def function_name(name):
+    return f'fn_{name}'
+
+def value_code(value):
+    if isinstance(value, float) and not math.isfinite(value):
+        return f"float('{value}')"
+    return repr(value)
+
+def default_code(type_node):
+    # код значения по умолчанию для объявления type_node
+    value = default_value(type_node)
+    if is_array(value):
+        return f'_new_array({value_code(DEFAULTS[type_name(type_node)])}, {len(value)})'
+    return value_code(value)
+
+class CompiledProgram:
+    # код Python для программы SL: объект кода, позиции инструкций SL для
+    # строк сгенерированного текста и сам текст (для отладки)
+    __slots__ = ('code', 'lines', 'source')
+
+    def __init__(self, code, lines, source=None):
+        self.code = code
+        self.lines = lines
+        self.source = source
+
+    def position(self, line):
+        if 1 <= line <= len(self.lines):
+            return self.lines[line - 1]
+        return 0, 0
+
+class PythonGenerator:
+    def __init__(self):
+        self.out = []
+        self.lines = []
+        self.position = (0, 0)
+        self.declared = set()
+        self.user_functions = set()
+        self.builtins = builtins(None)
+        self.function_names = {}
+        self.global_names = set()
+        self.scope = None
+        # присваивания констант-последовательностей на уровне модуля
+        self.constants = []
+
+    def generate(self, program):
+        # текст модуля Python и позиции инструкций SL по строкам
+        for statement in statements(program.children):
+            if isinstance(statement, NodeDeclaration):
+                self.declared.add(statement.id.value)
+        functions = []
+        stack = list(program.children)
+        while stack:
+            node = stack.pop()
+            if isinstance(node, NodeFunction):
+                functions.append(node)
+                stack.extend(node.block.children)
+            elif isinstance(node, NodeIfConstruction):
+                stack.extend(node.block.children)
+                stack.extend(node.else_block.children)
+            elif isinstance(node, NodeWhileConstruction):
+                stack.extend(node.block.children)
+        for n, node in enumerate(reversed(functions)):
+            self.user_functions.add(node.id.value)
+            self.function_names[id(node)] = f'f{n}_{node.id.value}'
+        for node in reversed(functions):
+            self.function(node)
+
+        # объявленные глобальные переменные и функции верхнего уровня
+        # доступны с начала программы
+        self.scope = None
+        prologue = []
+        done = set()
+        for statement in statements(program.children):
+            if isinstance(statement, NodeDeclaration) and statement.id.value not in done:
+                done.add(statement.id.value)
+                value = default_code(statement.type)
+                prologue.append((statement, f'{self.variable(statement.id.value)} = {value}'))
+        for statement in program.children:
+            if isinstance(statement, NodeFunction):
+                cell = function_name(statement.id.value)
+                self.global_names.add(cell)
+                prologue.append((statement, f'{cell} = {self.function_names[id(statement)]}'))
+        body = self.capture(program.children, 1)
+        self.emit(0, 'def _main():')
+        if self.global_names:
+            self.emit(1, f'global {", ".join(sorted(self.global_names))}')
+        for statement, line in prologue:
+            self.position = self.mark(statement)
+            self.emit(1, line)
+        self.extend(body)
+        self.position = (0, 0)
+        for line in self.constants:
+            self.emit(0, line)
+        return '\n'.join(self.out) + '\n', self.lines
+
+    # вывод
+
+    @staticmethod
+    def mark(node):
+        token = first_token(node)
+        return (token.lineno, token.pos) if token is not None else (0, 0)
+
+    def emit(self, depth, text):
+        self.out.append('    ' * depth + text)
+        self.lines.append(self.position)
+
+    def capture(self, nodes, depth):
+        # текст блока отдельно от основного вывода: перед телом функции
+        # нужно объявить global для всех глобальных имён, найденных в нём
+        out, lines = self.out, self.lines
+        self.out, self.lines = [], []
+        self.block(nodes, depth)
+        captured = self.out, self.lines
+        self.out, self.lines = out, lines
+        return captured
+
+    def extend(self, captured):
+        self.out.extend(captured[0])
+        self.lines.extend(captured[1])
+
+    # имена
+
+    def variable(self, name):
+        if self.scope is not None and name in self.scope:
+            return variable_name(name)
+        self.global_names.add(variable_name(name))
+        return variable_name(name)
+
+    def read_unchecked(self, name):
+        # значение переменной для присваивания последовательности:
+        # необъявленная глобальная переменная может быть ещё не присвоена
+        if (self.scope is not None and name in self.scope) or name in self.declared:
+            return self.variable(name)
+        return f"_globals.get('{variable_name(name)}')"
+
+    # функции и инструкции
+
+    def function(self, node):
+        params = node.formal_params.params
+        scope = {}
+        for declaration in [*params, *statements(node.block.children)]:
+            if isinstance(declaration, NodeDeclaration) and declaration.id.value not in scope:
+                scope[declaration.id.value] = declaration
+        saved = self.global_names, self.scope
+        self.global_names, self.scope = set(), scope
+        self.position = self.mark(node)
+        body = self.capture(node.block.children, 1)
+        names = ', '.join(variable_name(param.id.value) for param in params)
+        self.position = self.mark(node)
+        self.emit(0, f'def {self.function_names[id(node)]}({names}):')
+        if self.global_names:
+            self.emit(1, f'global {", ".join(sorted(self.global_names))}')
+        for name, declaration in list(scope.items())[len(params):]:
+            self.emit(1, f'{variable_name(name)} = {default_code(declaration.type)}')
+        self.extend(body)
+        self.position = self.mark(node)
+        self.emit(1, f'return {default_code(node.ret_type)}')
+        if node.memo:
+            name = self.function_names[id(node)]
+            self.emit(0, f'{name} = _memoize({node.id.value!r}, {name}, {node.memo})')
+        self.global_names, self.scope = saved
+
+    def block(self, nodes, depth):
+        if depth > MAX_DEPTH:
+            # position - инструкция, которой принадлежит блок
+            raise CompileError(f'Слишком глубокая вложенность блоков: код Python допускает '
+                               f'не больше {MAX_DEPTH} уровней отступа', *self.position)
+        empty = True
+        for node in nodes:
+            if node is not None:
+                self.position = self.mark(node)
+                self.statement(node, depth)
+                empty = False
+        if empty:
+            self.emit(depth, 'pass')
+
+    def statement(self, node, depth):
+        match node:
+            case NodeDeclaration():
+                self.emit(depth, f'{self.variable(node.id.value)} = {default_code(node.type)}')
+            case NodeAssigning():
+                name = node.left_side.id.value
+                right = node.right_side
+                if isinstance(right, NodeSequence):
+                    values = literal_values(right)
+                    if values is not None:
+                        # последовательность из литералов собирается один
+                        # раз при загрузке модуля
+                        constant = f'_sequence{len(self.constants)}'
+                        self.constants.append(f'{constant} = _ConstantSequence(({"".join(value_code(v) + ", " for v in values)}))')
+                        value = f'_assign_constant({self.read_unchecked(name)}, {constant})'
+                    else:
+                        members = ', '.join(self.expression(member) for member in right.members)
+                        value = f'_assign_sequence({self.read_unchecked(name)}, [{members}])'
+                else:
+                    value = self.expression(right)
+                self.emit(depth, f'{self.variable(name)} = {value}')
+            case NodeFunctionCall():
+                self.emit(depth, self.expression(node))
+            case NodeFunction():
+                cell = function_name(node.id.value)
+                self.global_names.add(cell)
+                self.emit(depth, f'{cell} = {self.function_names[id(node)]}')
+            case NodeIfConstruction():
+                self.emit(depth, f'if {self.expression(node.condition)}:')
+                self.block(node.block.children, depth + 1)
+                if node.else_block.children:
+                    self.position = self.mark(node)
+                    self.emit(depth, 'else:')
+                    self.block(node.else_block.children, depth + 1)
+            case NodeWhileConstruction():
+                self.emit(depth, f'while {self.expression(node.condition)}:')
+                self.block(node.block.children, depth + 1)
+            case NodeReturnStatement():
+                self.emit(depth, f'return {self.expression(node.expression)}')
+            case _:
+                raise CompileError(f'Неподдерживаемая инструкция {type(node).__name__}', 0, 0)
+
+    def expression(self, node):
+        return self.operand(node, 0)[0]
+
+    def operand(self, node, power):
+        # код node в скобках, если его оператор связывает слабее power
+        code, precedence = self.code(node)
+        if precedence < power:
+            return f'({code})', ATOM
+        return code, precedence
+
+    def code(self, node):
+        # код выражения без внешних скобок и приоритет его оператора
+        cls = type(node)
+        if cls in OPERATORS:
+            precedence = PRECEDENCE[cls]
+            # левый операнд с тем же приоритетом скобок не требует, кроме
+            # сравнения: сравнения в Python образуют цепочку
+            left = precedence + 1 if precedence == COMPARISON else precedence
+            return (f'{self.operand(node.left, left)[0]} {OPERATORS[cls]} '
+                    f'{self.operand(node.right, precedence + 1)[0]}'), precedence
+        match node:
+            case NodeIntLiteral() | NodeFloatLiteral():
+                code = self.atom(node)
+                # отрицательная константа после свёртки - унарный минус
+                return code, UNARY if code.startswith('-') else ATOM
+            case NodeNot():
+                return f'not {self.operand(node.operand, PRECEDENCE[NodeNot])[0]}', PRECEDENCE[NodeNot]
+            case NodeUnaryMinus():
+                return f'-{self.operand(node.operand, UNARY)[0]}', UNARY
+        return self.atom(node), ATOM
+
+    def atom(self, node):
+        cls = type(node)
+        match node:
+            case NodeIntLiteral():
+                return value_code(int(node.value.value))
+            case NodeFloatLiteral():
+                return value_code(float(node.value.value))
+            case NodeStringLiteral():
+                return value_code(node.value.value)
+            case NodeVar():
+                return self.variable(node.id.value)
+            case NodeIndexAccess():
+                array = self.expression(node.var)
+                i = node.index
+                if unchecked_index(node):
+                    return f'{array}[{self.expression(i)}]'
+                if isinstance(i, NodeVar):
+                    # отрицательный индекс Python не должен читать с конца
+                    name = self.expression(i)
+                    return f'({array}[{name}] if {name} >= 0 else _index({array}, {name}))'
+                return f'_index({array}, {self.expression(i)})'
+            case NodeFunctionCall():
+                name = node.id.value
+                args = ', '.join(self.expression(arg) for arg in node.actual_params.params)
+                if name not in self.user_functions and name in self.builtins:
+                    return f'_{name}({args})'
+                self.global_names.add(function_name(name))
+                return f'{function_name(name)}({args})'
+        raise CompileError(f'Неподдерживаемое выражение {cls.__name__}', 0, 0)
+
+def generate(program):
+    return PythonGenerator().generate(program)
+
+def compile_program(program):
+    source, lines = generate(program)
+    compiled = CompiledProgram(None, lines, source)
+    try:
+        compiled.code = compile(source, FILENAME, 'exec')
+    except SyntaxError as error:
+        # предел CPython, например вложенности скобок: позиция - инструкция
+        # SL, из которой получена строка с ошибкой
+        raise CompileError(f'Не удалось скомпилировать код Python: {error.msg}',
+                           *compiled.position(error.lineno or 0)) from None
+    except (RecursionError, MemoryError) as error:
+        # слишком глубокая вложенность выражений для компилятора CPython
+        raise CompileError(f'Не удалось скомпилировать код Python: {error}', 0, 0) from None
+    return compiled
+
+class CodeCache(ParseCache):
+    # Дисковый кэш скомпилированного кода: ключ - хэш исходного текста SL,
+    # версий компилятора и генератора и версии CPython (формат marshal
+    # объектов кода от неё зависит), значение - объект кода и позиции строк.
+
+    SUFFIX = '.slpyc'
+    TITLE = 'кэш кода Python'
+
+    def __init__(self, directory, max_bytes=256 * 2**20, optimize=False,
+                 inline_nodes=Inliner.MAX_NODES, memo_size=Inliner.MEMO_SIZE):
+        super().__init__(directory, max_bytes)
+        self.optimize = optimize
+        self.inline_nodes = inline_nodes
+        self.memo_size = memo_size
+
+    def tag(self):
+        # код зависит и от настроек встраивания
+        optimized = f'-O{self.inline_nodes}.{self.memo_size}' if self.optimize else ''
+        return f'pycodegen-{CODEGEN_VERSION}{optimized}-{sys.implementation.cache_tag}'
+
+    def encode(self, compiled):
+        return marshal.dumps((compiled.code, compiled.lines))
+
+    def decode(self, data, symbols=None):
+        code, lines = marshal.loads(data)
+        return CompiledProgram(code, lines)
+
+    def compile(self, source: bytes, lexer=TableLexer):
+        # скомпилированный код для source: из кэша, а при промахе -
+        # разбором и генерацией
+        start = time.perf_counter()
+        compiled = self.get(source)
+        if compiled is not None:
+            self.hits += 1
+            self.hit_time += time.perf_counter() - start
+            return compiled
+        program = Parser(lexer(source)).parse()
+        if self.optimize:
+            optimize(program, inline_nodes=self.inline_nodes, memo_size=self.memo_size)
+        compiled = compile_program(program)
+        self.put(source, compiled)
+        self.misses += 1
+        self.miss_time += time.perf_counter() - start
+        return compiled
+
+class PythonRunner:
+    RECURSION_LIMIT = 20000
+
+    def __init__(self, compiled, out=None):
+        self.compiled = compiled
+        self.out = sys.stdout if out is None else out
+        self.memos = []
+
+    def namespace(self):
+        namespace = {f'_{name}': function for name, function in builtins(self.out).items()}
+        namespace['_assign_sequence'] = assign_sequence
+        namespace['_assign_constant'] = assign_constant
+        namespace['_ConstantSequence'] = ConstantSequence
+        namespace['_new_array'] = new_array
+        namespace['_memoize'] = lambda name, function, size: memoize(name, function, size, self.memos)
+        namespace['_index'] = index
+        namespace['_globals'] = namespace
+        return namespace
+
+    def run(self):
+        if sys.getrecursionlimit() < self.RECURSION_LIMIT:
+            sys.setrecursionlimit(self.RECURSION_LIMIT)
+        namespace = self.namespace()
+        exec(self.compiled.code, namespace)
+        try:
+            namespace['_main']()
+        except RUNTIME_ERRORS as error:
+            raise self.execution_error(error) from None
+
+    def execution_error(self, error):
+        # позиция - инструкция SL самого глубокого кадра сгенерированного
+        # кода в трассировке
+        line = 0
+        traceback = error.__traceback__
+        while traceback is not None:
+            if traceback.tb_frame.f_code.co_filename == FILENAME:
+                line = traceback.tb_lineno
+            traceback = traceback.tb_next
+        if isinstance(error, NameError) and error.name:
+            if error.name.startswith('v_'):
+                error = NameError(f'Переменная {error.name[2:]} не определена')
+            elif error.name.startswith('fn_'):
+                error = NameError(f'Функция {error.name[3:]} не объявлена')
+        return ExecutionError(describe(error), *self.compiled.position(line))
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Выполнение программы SL через перевод в код Python')
+    parser.add_argument('path')
+    parser.add_argument('--emit', action='store_true', help='вывести сгенерированный код и не выполнять его')
+    parser.add_argument('--cache-dir', default=None, help='каталог кэша скомпилированного кода')
+    parser.add_argument('-O', '--optimize', action='store_true', help='оптимизировать дерево разбора перед выполнением')
+    add_arguments(parser)
+    args = parser.parse_args(argv)
+    try:
+        with open(args.path, 'rb') as f:
+            source = f.read()
+        if args.cache_dir is not None and not args.emit:
+            try:
+                compiled = CodeCache(args.cache_dir, optimize=args.optimize, inline_nodes=args.inline_nodes,
+                                     memo_size=args.memo_size).compile(source)
+            except CompileError:
+                # все ошибки файла, а не первую
+                Parser(TableLexer(source), recover=True).parse()
+                raise
+        else:
+            program = Parser(TableLexer(source), recover=True).parse()
+            if args.optimize:
+                optimize(program, inline_nodes=args.inline_nodes, memo_size=args.memo_size)
+            if args.emit:
+                sys.stdout.write(generate(program)[0])
+                return 0
+            compiled = compile_program(program)
+        runner = PythonRunner(compiled)
+        runner.run()
+        if runner.memos:
+            print(memo_report(runner.memos), file=sys.stderr)
+    except CompileErrors as errors:
+        for error in errors.errors:
+            print(error)
+        return 1
+    except CompileError as error:
+        print(error)
+        return 1
+    except OSError as error:
+        print(f'Не удалось прочитать файл: {error.strerror}')
+        return 1
+    return 0
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,80 @@
+# Регрессионная проверка исполнителей: каждая программа *.sl этого
+# каталога выполняется всеми исполнителями (замыкания interpreter.py,
+# стековая машина vm.py и перевод в код Python pycodegen.py) без
+# оптимизации и с optimize(), и все выводы должны совпасть между собой и с
+# файлом <имя>.out рядом с программой, если он есть. Ошибка компиляции или
+# выполнения входит в вывод своим текстом. При расхождении выводятся
+# различающиеся результаты, а код возврата - 1.
+#
+#   python -m regressions.check [программа.sl ...]
+
+import glob
+import io
+import os
+import sys
+
+import bytecode
+import pycodegen
+from errors import CompileError, CompileErrors
+from interpreter import Interpreter
+from lexer import TableLexer
+from optimizer import optimize
+from slparser import Parser
+from vm import VirtualMachine
+
+ENGINES = {
+    'замыкания'        : Interpreter,
+    'стековая машина'  : lambda program, out: VirtualMachine(bytecode.compile_program(program), out),
+    'код Python'       : lambda program, out: pycodegen.PythonRunner(pycodegen.compile_program(program), out),
+}
+
+DIRECTORY = os.path.dirname(os.path.abspath(__file__))
+
+
+def run(source, engine, optimized):
+    # вывод программы; дерево разбирается заново, потому что optimize
+    # меняет его на месте
+    out = io.StringIO()
+    try:
+        program = Parser(TableLexer(source)).parse()
+        if optimized:
+            optimize(program)
+        engine(program, out).run()
+    except CompileErrors as errors:
+        out.write(''.join(f'{error}\n' for error in errors.errors))
+    except CompileError as error:
+        out.write(f'{error}\n')
+    return out.getvalue()
+
+
+def check(path):
+    # число расхождений для программы path
+    with open(path, 'rb') as f:
+        source = f.read()
+    results = {}
+    for name, engine in ENGINES.items():
+        for optimized in (False, True):
+            results[name + (' -O' if optimized else '')] = run(source, engine, optimized)
+    expected_path = os.path.splitext(path)[0] + '.out'
+    if os.path.exists(expected_path):
+        with open(expected_path, encoding='utf-8') as f:
+            expected = f.read()
+    else:
+        expected = next(iter(results.values()))
+    mismatches = {name: output for name, output in results.items() if output != expected}
+    status = 'ok' if not mismatches else f'РАСХОЖДЕНИЙ {len(mismatches)}'
+    print(f'{os.path.basename(path)}: {status}')
+    for name, output in mismatches.items():
+        print(f'  ожидалось {expected!r}')
+        print(f'  {name}: {output!r}')
+    return len(mismatches)
+
+
+def main(argv=None):
+    paths = (sys.argv[1:] if argv is None else argv) or sorted(glob.glob(os.path.join(DIRECTORY, '*.sl')))
+    failures = sum(check(path) for path in paths)
+    return 1 if failures else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,224 @@
+import functools
+from array import array
+
+from errors import ExecutionError
+from lexer import Token
+from slparser import (NodeComplexType, NodeFloatLiteral, NodeIfConstruction, NodeIntLiteral,
+                      NodeStringLiteral, NodeUnaryMinus, NodeWhileConstruction)
+
+# Общая часть исполнителей SL: значения по умолчанию, встроенные функции
+# и перевод исключений Python в ошибки выполнения SL. Арифметика SL
+# совпадает с арифметикой Python: '/' - деление с плавающей точкой, '//' и
+# '%' округляют к минус бесконечности.
+
+# значения переменных атомарных типов до первого присваивания
+DEFAULTS = {
+    'int'    : 0,
+    'float'  : 0.0,
+    'string' : '',
+    'bool'   : False,
+}
+
+# массивы int и float хранятся упакованными в array: 8 байт на элемент
+# вместо ссылки на объект Python; массивы остальных типов - списки
+TYPECODES = {
+    int   : 'q',
+    float : 'd',
+}
+
+# значение глобальной переменной, которая нигде не объявлена и которой
+# ещё ничего не присвоено
+UNSET = object()
+
+def type_name(type_node):
+    return type_node.id.value
+
+def new_array(item, size):
+    # массив из size элементов item: упакованный для int и float
+    typecode = TYPECODES.get(type(item))
+    if typecode is None:
+        return [item] * size
+    return array(typecode, (item,)) * size
+
+def is_array(value):
+    return isinstance(value, (array, list))
+
+def default_value(type_node):
+    # значение объявленной переменной: для массива - новый массив
+    # из значений по умолчанию
+    name = type_name(type_node)
+    if name not in DEFAULTS:
+        raise ExecutionError(f'Неизвестный тип {name}', type_node.id.lineno, type_node.id.pos)
+    if isinstance(type_node, NodeComplexType):
+        return new_array(DEFAULTS[name], int(type_node.size.value))
+    return DEFAULTS[name]
+
+def default_factory(type_node):
+    # функция без аргументов, создающая значение по умолчанию: для
+    # массивов каждый раз новый массив - копия образца
+    value = default_value(type_node)
+    if is_array(value):
+        return value.__copy__ if isinstance(value, array) else value.copy
+    return lambda: value
+
+def builtins(out):
+    # встроенные функции; print пишет в out
+    def sl_print(*values):
+        print(*[value.tolist() if type(value) is array else value for value in values], file=out)
+    return {
+        'print' : sl_print,
+        'str'   : str,
+        'int'   : int,
+        'float' : float,
+        'len'   : len,
+    }
+
+def index(array, i):
+    # обращение по индексу без отрицательных индексов Python
+    if i < 0:
+        raise IndexError(i)
+    return array[i]
+
+def assign_sequence(current, values):
+    # присваивание последовательности: элементы копируются в начало
+    # массива, а переменная без массива получает новый список
+    if isinstance(current, array):
+        if len(values) > len(current):
+            raise IndexError(len(values))
+        current[:len(values)] = array(current.typecode, values)
+        return current
+    if isinstance(current, list):
+        if len(values) > len(current):
+            raise IndexError(len(values))
+        current[:len(values)] = values
+        return current
+    return values
+
+class ConstantSequence:
+    # последовательность из литералов: упакованные копии значений для
+    # каждого вида массива собираются один раз, и присваивание - одно
+    # копирование буфера
+    __slots__ = ('values', 'buffers')
+
+    def __init__(self, values):
+        self.values = tuple(values)
+        self.buffers = {}
+
+    def buffer(self, typecode):
+        buffer = self.buffers.get(typecode)
+        if buffer is None:
+            buffer = self.buffers[typecode] = array(typecode, self.values)
+        return buffer
+
+def assign_constant(current, constant):
+    # присваивание последовательности из литералов constant
+    if isinstance(current, array):
+        buffer = constant.buffer(current.typecode)
+        if len(buffer) > len(current):
+            raise IndexError(len(buffer))
+        current[:len(buffer)] = buffer
+        return current
+    return assign_sequence(current, list(constant.values))
+
+def literal_values(sequence):
+    # значения членов последовательности, если все они литералы (возможно,
+    # с унарным минусом), иначе None
+    values = []
+    for member in sequence.members:
+        negative = isinstance(member, NodeUnaryMinus)
+        if negative:
+            member = member.operand
+        match member:
+            case NodeIntLiteral():
+                value = int(member.value.value)
+            case NodeFloatLiteral():
+                value = float(member.value.value)
+            case NodeStringLiteral() if not negative:
+                value = member.value.value
+            case _:
+                return None
+        values.append(-value if negative else value)
+    return values
+
+def unchecked_index(node):
+    # можно ли обратиться по индексу без проверки на отрицательность:
+    # индекс - неотрицательный литерал или доказан неотрицательным
+    # (NodeIndexAccess.safe, см. optimizer.BoundsCheckEliminator)
+    index = node.index
+    return node.safe or isinstance(index, NodeIntLiteral) and int(index.value.value) >= 0
+
+def memoize(name, function, size, memos):
+    # function с LRU-кэшем на size результатов; ключ учитывает типы
+    # аргументов (f(1) и f(1.0) - разные вызовы). Кэш добавляется в memos
+    # для отчёта memo_report
+    cached = functools.lru_cache(maxsize=size, typed=True)(function)
+    memos.append((name, cached))
+    return cached
+
+def memo_report(memos):
+    lines = []
+    for name, cached in memos:
+        info = cached.cache_info()
+        calls = info.hits + info.misses
+        rate = info.hits / calls * 100 if calls else 0.0
+        lines.append(f'мемоизация {name}: вызовов {calls}, попаданий {info.hits} ({rate:.1f}%), '
+                     f'записей {info.currsize} из {info.maxsize}')
+    return '\n'.join(lines)
+
+# исключения Python, которые означают ошибку в программе SL
+RUNTIME_ERRORS = (TypeError, ValueError, ZeroDivisionError, IndexError,
+                  OverflowError, RecursionError, NameError)
+
+def describe(error):
+    match error:
+        case ZeroDivisionError():
+            return 'Деление на ноль'
+        case IndexError():
+            return 'Индекс за пределами массива'
+        case RecursionError():
+            return 'Слишком глубокая рекурсия'
+        case NameError():
+            return str(error)
+        case OverflowError():
+            return 'Переполнение'
+        case ValueError():
+            return f'Неверное значение: {error}'
+        case _:
+            return f'Неверные типы операндов: {error}'
+
+def first_token(node):
+    # первый токен поддерева - позиция инструкции в сообщениях об ошибках
+    stack = [node]
+    while stack:
+        node = stack.pop()
+        if isinstance(node, Token):
+            return node
+        if node is None:
+            continue
+        values = getattr(node, node.fields[0]) if node.sequence else [getattr(node, name) for name in node.fields]
+        stack.extend(reversed(values))
+    return None
+
+def execution_error(node, error):
+    token = first_token(node)
+    lineno, pos = (token.lineno, token.pos) if token is not None else (0, 0)
+    return ExecutionError(describe(error), lineno, pos)
+
+def statements(block):
+    # инструкции блока и вложенных в него блоков if и while, кроме тел
+    # вложенных функций
+    stack = list(reversed(block))
+    while stack:
+        statement = stack.pop()
+        yield statement
+        match statement:
+            case NodeIfConstruction():
+                stack.extend(reversed(statement.else_block.children))
+                stack.extend(reversed(statement.block.children))
+            case NodeWhileConstruction():
+                stack.extend(reversed(statement.block.children))
+
+def undefined_function(name):
+    def call(*args):
+        raise NameError(f'Функция {name} не объявлена')
+    return call
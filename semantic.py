@@ -0,0 +1,505 @@
+import argparse
+import sys
+
+from errors import CompileError, CompileErrors, SemanticError
+from lexer import TableLexer
+from runtime import DEFAULTS, first_token, statements
+from slparser import (Node, NodeAnd, NodeAssigning, NodeComplexType, NodeDeclaration, NodeDivision,
+                      NodeEQ, NodeFloatLiteral, NodeFunction, NodeFunctionCall, NodeG, NodeGE,
+                      NodeIDivision, NodeIfConstruction, NodeImport, NodeIndexAccess, NodeIntLiteral, NodeL,
+                      NodeLE, NodeMinus, NodeMod, NodeMultiply, NodeNEQ, NodeNot, NodeOr, NodePlus,
+                      NodeReturnStatement, NodeSequence, NodeStringLiteral, NodeUnaryMinus, NodeVar,
+                      NodeWhileConstruction, Parser)
+
+# Семантический анализ: области видимости, проверка типов и разрешение
+# имён переменных в номера.
+#
+# Области видимости переменных - те же, что у исполнителей
+# (interpreter.py, vm.py, pycodegen.py): программа и каждая функция. Блоки
+# if, else и while своих областей не создают: переменная, объявленная в
+# блоке, принадлежит функции (или программе), в которой он находится, и
+# видна от своего объявления до конца функции. Повторное объявление имени
+# в той же функции - ошибка, даже во вложенном блоке: у функции одна
+# переменная с этим именем и один тип. Функция видит свои параметры и
+# переменные и глобальные переменные программы, но не переменные
+# объемлющей функции. Имя, объявленное в функции, в ней локальное с начала
+# функции, поэтому его использование до объявления - ошибка, даже если
+# есть глобальная переменная с тем же именем.
+#
+# Функции видны во всём блоке, где объявлены (их можно вызывать до
+# объявления), при повторном объявлении действует последнее.
+#
+# Каждая функция - это кадр: её параметры и затем её переменные в порядке
+# объявления получают номера 0, 1, 2, ... Глубина кадра - 0 у программы, 1
+# у функций верхнего уровня и так далее. Анализ записывает в NodeVar.ref и
+# NodeDeclaration.ref пару (глубина, номер), в NodeFunction.frame - размер
+# кадра функции, а в NodeProgram.frame - число глобальных переменных, так
+# что исполнитель может хранить переменные в массивах кадров, а не искать
+# их по имени (см. interpreter.py). Проходы optimizer.py меняют дерево,
+# поэтому optimize() после них размечает его заново.
+#
+# Переменные области - словарь имя -> символ, функции - словарь имя ->
+# стек символов, с которого при выходе из блока снимаются его функции:
+# поиск - одно-два обращения к словарю, весь проход линеен по размеру
+# программы.
+#
+# Инструкции import в начале программы объявляют в её области видимости
+# функции и глобальные переменные модулей, как если бы они были объявлены
+# перед первой инструкцией: собственная функция с тем же именем перекрывает
+# импортированную, а переменная с тем же именем - ошибка. Объявления модулей
+# берутся из их интерфейсов (slbuild.py), которые передаются в analyze.
+
+class Type:
+    # тип SL: атомарный (size is None) или массив из size элементов
+    __slots__ = ('name', 'size')
+
+    def __init__(self, name, size=None):
+        self.name = name
+        self.size = size
+
+    @property
+    def is_array(self):
+        return self.size is not None
+
+    @property
+    def element(self):
+        return Type(self.name)
+
+    def __eq__(self, other):
+        return isinstance(other, Type) and (self.name, self.size) == (other.name, other.size)
+
+    def __hash__(self):
+        return hash((self.name, self.size))
+
+    def __str__(self):
+        return self.name if self.size is None else f'{self.name}[{self.size}]'
+
+INT = Type('int')
+FLOAT = Type('float')
+STRING = Type('string')
+BOOL = Type('bool')
+NUMERIC = (INT, FLOAT)
+
+COMPARISONS = (NodeL, NodeG, NodeLE, NodeGE, NodeEQ, NodeNEQ)
+ARITHMETIC = (NodePlus, NodeMinus, NodeMultiply, NodeDivision, NodeIDivision, NodeMod)
+
+class Variable:
+    __slots__ = ('name', 'type', 'depth', 'slot', 'node')
+
+    def __init__(self, name, type, depth, slot, node):
+        self.name = name
+        self.type = type
+        self.depth = depth
+        self.slot = slot
+        self.node = node
+
+class Function:
+    # params - типы параметров; None вместо списка - любое число аргументов
+    # любых типов (print). result None - функция не возвращает значения.
+    __slots__ = ('name', 'params', 'result', 'node')
+
+    def __init__(self, name, params, result, node=None):
+        self.name = name
+        self.params = params
+        self.result = result
+        self.node = node
+
+ANY = object()
+
+# встроенные функции; ANY - аргумент любого атомарного типа
+BUILTINS = {
+    'print' : Function('print', None, None),
+    'str'   : Function('str', [ANY], STRING),
+    'int'   : Function('int', [ANY], INT),
+    'float' : Function('float', [ANY], FLOAT),
+    'len'   : Function('len', None, INT),
+}
+
+class Scope:
+    # область видимости переменных - программа или функция: объявленные
+    # переменные и имена переменных, которые объявлены в ней ниже (для
+    # сообщения об использовании до объявления) и глубина её кадра
+    __slots__ = ('variables', 'pending', 'depth')
+
+    def __init__(self, depth, pending=()):
+        self.variables = {}
+        self.pending = set(pending)
+        self.depth = depth
+
+class Analysis:
+    # результат анализа: число глобальных переменных, функций и ссылок на
+    # переменные
+    __slots__ = ('globals', 'references', 'functions')
+
+    def __init__(self, globals, references, functions):
+        self.globals = globals
+        self.references = references
+        self.functions = functions
+
+class SemanticAnalyzer:
+    def __init__(self, modules=None):
+        # путь из инструкции import -> интерфейс модуля: NodeProgram из
+        # NodeDeclaration и NodeFunction без тел
+        self.modules = modules or {}
+        self.functions = {name: [function] for name, function in BUILTINS.items()}
+        # области видимости переменных: программа и проверяемые функции
+        self.scopes = []
+        # имена функций каждого открытого блока, для снятия со стеков
+        self.blocks = []
+        # функции, тела которых сейчас проверяются
+        self.current = []
+        self.errors = []
+        self.references = 0
+        self.function_count = 0
+
+    def analyze(self, program):
+        # проверяет программу и размечает дерево; при ошибках бросает
+        # CompileErrors со всеми найденными ошибками
+        program.frame = None
+        scope = self.enter_scope(program.children)
+        self.import_modules(program.children, scope)
+        self.block(program.children)
+        if self.errors:
+            self.errors.sort(key=lambda error: (error.lineno, error.pos))
+            raise CompileErrors(self.errors, program)
+        program.frame = len(scope.variables)
+        return Analysis(len(scope.variables), self.references, self.function_count)
+
+    def error(self, message, node):
+        token = first_token(node)
+        lineno, pos = (token.lineno, token.pos) if token is not None else (0, 0)
+        self.errors.append(SemanticError(message, lineno, pos))
+
+    # области видимости
+
+    def enter_scope(self, body):
+        # область видимости программы или функции с телом body
+        pending = [node.id.value for node in statements(body) if isinstance(node, NodeDeclaration)]
+        scope = Scope(len(self.scopes), pending)
+        self.scopes.append(scope)
+        return scope
+
+    def enter(self, statements):
+        # функции блока видны с его начала
+        names = set()
+        self.blocks.append(names)
+        for node in statements:
+            if isinstance(node, NodeFunction):
+                self.define_function(node, names)
+
+    def leave(self):
+        for name in self.blocks.pop():
+            self.functions[name].pop()
+
+    def declare(self, node, type):
+        name = node.id.value
+        scope = self.scopes[-1]
+        scope.pending.discard(name)
+        variable = scope.variables.get(name)
+        if variable is not None:
+            self.error(f'Переменная {name} уже объявлена в этой области видимости', node.id)
+        else:
+            variable = scope.variables[name] = Variable(name, type, scope.depth, len(scope.variables), node)
+        node.ref = (variable.depth, variable.slot)
+        return variable
+
+    def define_function(self, node, names, report=True):
+        name = node.id.value
+        params = [self.type(param.type, report) for param in node.formal_params.params]
+        function = Function(name, params, self.type(node.ret_type, report), node)
+        stack = self.functions.setdefault(name, [])
+        if name in names:
+            # повторное объявление в том же блоке: действует последнее
+            stack[-1] = function
+        else:
+            stack.append(function)
+            names.add(name)
+
+    def import_modules(self, statements, scope):
+        # объявления модулей из инструкций import в начале программы; об
+        # ошибках в самих интерфейсах сообщает анализ их модулей. Функции
+        # модулей объявляются в отдельном блоке вокруг программы, так что
+        # её собственные функции их перекрывают
+        names = set()
+        self.blocks.append(names)
+        header = True
+        for node in statements:
+            if not isinstance(node, NodeImport):
+                header = False
+                continue
+            if not header:
+                self.error('Инструкция import допустима только в начале программы', node)
+                continue
+            path = node.path.value
+            interface = self.modules.get(path)
+            if interface is None:
+                self.error(f'Модуль {path} не загружен', node)
+                continue
+            for export in interface.children:
+                if isinstance(export, NodeFunction):
+                    self.define_function(export, names, report=False)
+                elif export.id.value in scope.variables:
+                    self.error(f'Переменная {export.id.value} модуля {path} уже объявлена другим модулем', node)
+                else:
+                    self.declare(export, self.type(export.type, report=False))
+
+    def lookup(self, node):
+        # переменная функции или глобальная; имя, объявленное в функции
+        # ниже, уже локальное и скрывает глобальное
+        name = node.id.value
+        scope = self.scopes[-1]
+        variable = scope.variables.get(name)
+        if variable is None and name not in scope.pending:
+            scope = self.scopes[0]
+            variable = scope.variables.get(name)
+        if variable is not None:
+            self.references += 1
+            node.ref = (variable.depth, variable.slot)
+            return variable
+        if name in scope.pending:
+            self.error(f'Переменная {name} используется до объявления', node.id)
+        else:
+            self.error(f'Переменная {name} не объявлена', node.id)
+        return None
+
+    # типы
+
+    def type(self, node, report=True):
+        name = node.id.value
+        if name not in DEFAULTS:
+            if report:
+                self.error(f'Неизвестный тип {name}', node.id)
+            return None
+        if isinstance(node, NodeComplexType):
+            size = int(node.size.value)
+            if size <= 0:
+                if report:
+                    self.error(f'Размер массива {name}[{size}] должен быть положительным', node.size)
+                return None
+            return Type(name, size)
+        return Type(name)
+
+    @staticmethod
+    def assignable(target, value):
+        return target == value or (target == FLOAT and value == INT)
+
+    # инструкции
+
+    def block(self, statements):
+        self.enter(statements)
+        for node in statements:
+            if node is not None:
+                self.statement(node)
+        self.leave()
+
+    def statement(self, node):
+        match node:
+            case NodeDeclaration():
+                self.declare(node, self.type(node.type))
+            case NodeAssigning():
+                self.assigning(node)
+            case NodeFunctionCall():
+                self.call(node, statement=True)
+            case NodeFunction():
+                self.function(node)
+            case NodeIfConstruction():
+                self.condition(node.condition)
+                self.block(node.block.children)
+                self.block(node.else_block.children)
+            case NodeWhileConstruction():
+                self.condition(node.condition)
+                self.block(node.block.children)
+            case NodeImport():
+                if len(self.blocks) > 2:
+                    self.error('Инструкция import допустима только в начале программы', node)
+            case NodeReturnStatement():
+                value = self.expression(node.expression)
+                if self.current and value is not None:
+                    result = self.current[-1].result
+                    if result is not None and not self.assignable(result, value):
+                        self.error(f'Функция {self.current[-1].name} должна возвращать {result}, '
+                                   f'а не {value}', node.expression)
+
+    def assigning(self, node):
+        variable = self.lookup(node.left_side)
+        target = variable.type if variable is not None else None
+        right = node.right_side
+        if isinstance(right, NodeSequence):
+            values = [self.expression(member) for member in right.members]
+            if target is None:
+                return
+            if not target.is_array:
+                self.error(f'Последовательность нельзя присвоить переменной типа {target}', node.left_side)
+                return
+            if len(values) > target.size:
+                self.error(f'В массив {target} не помещается {len(values)} элементов', right)
+            for member, value in zip(right.members, values):
+                if value is not None and not self.assignable(target.element, value):
+                    self.error(f'Элемент типа {value} нельзя записать в массив {target}', member)
+            return
+        value = self.expression(right)
+        if target is not None and value is not None and not self.assignable(target, value):
+            self.error(f'Значение типа {value} нельзя присвоить переменной {variable.name} типа {target}', right)
+
+    def function(self, node):
+        function = self.functions[node.id.value][-1]
+        if function.node is not node:
+            # перекрыто более поздним объявлением с тем же именем
+            function = Function(node.id.value, [self.type(param.type) for param in node.formal_params.params],
+                                self.type(node.ret_type), node)
+        self.function_count += 1
+        self.current.append(function)
+        scope = self.enter_scope(node.block.children)
+        for param, type in zip(node.formal_params.params, function.params):
+            self.declare(param, type)
+        self.block(node.block.children)
+        node.frame = len(scope.variables)
+        self.scopes.pop()
+        self.current.pop()
+
+    # выражения
+
+    def condition(self, node):
+        value = self.expression(node)
+        if value is not None and value.is_array:
+            self.error(f'Условие не может быть массивом {value}', node)
+
+    def expression(self, node):
+        # тип выражения или None, если он неизвестен из-за ошибки
+        match node:
+            case NodeIntLiteral():
+                return INT
+            case NodeFloatLiteral():
+                return FLOAT
+            case NodeStringLiteral():
+                return STRING
+            case NodeVar():
+                variable = self.lookup(node)
+                return variable.type if variable is not None else None
+            case NodeIndexAccess():
+                return self.index(node)
+            case NodeFunctionCall():
+                return self.call(node)
+            case NodeUnaryMinus():
+                operand = self.expression(node.operand)
+                if operand is not None and operand not in NUMERIC:
+                    self.error(f'Унарный минус неприменим к типу {operand}', node)
+                    return None
+                return operand
+            case NodeNot():
+                self.condition(node.operand)
+                return BOOL
+            case NodeAnd() | NodeOr():
+                self.condition(node.left)
+                self.condition(node.right)
+                return BOOL
+            case _ if isinstance(node, COMPARISONS):
+                return self.comparison(node)
+            case _ if isinstance(node, ARITHMETIC):
+                return self.arithmetic(node)
+        return None
+
+    def arithmetic(self, node):
+        left = self.expression(node.left)
+        right = self.expression(node.right)
+        if left is None or right is None:
+            return None
+        if left in NUMERIC and right in NUMERIC:
+            if isinstance(node, NodeDivision):
+                return FLOAT
+            return INT if left == right == INT else FLOAT
+        if isinstance(node, NodePlus) and left == right == STRING:
+            return STRING
+        self.error(f'Операция {type(node).__name__[4:]} неприменима к типам {left} и {right}', node)
+        return None
+
+    def comparison(self, node):
+        left = self.expression(node.left)
+        right = self.expression(node.right)
+        if left is None or right is None:
+            return BOOL
+        if left in NUMERIC and right in NUMERIC:
+            return BOOL
+        if left == right and not left.is_array and (left != BOOL or isinstance(node, (NodeEQ, NodeNEQ))):
+            return BOOL
+        self.error(f'Нельзя сравнить значения типов {left} и {right}', node)
+        return BOOL
+
+    def index(self, node):
+        array = self.expression(node.var)
+        index = self.expression(node.index)
+        if index is not None and index != INT:
+            self.error(f'Индекс массива должен быть int, а не {index}', node.index)
+        if array is None:
+            return None
+        if not array.is_array:
+            self.error(f'Переменная типа {array} не является массивом', node.var)
+            return None
+        if isinstance(node.index, NodeIntLiteral) and not 0 <= int(node.index.value.value) < array.size:
+            self.error(f'Индекс {node.index.value.value} за пределами массива {array}', node.index)
+        return array.element
+
+    def call(self, node, statement=False):
+        name = node.id.value
+        args = node.actual_params.params
+        values = [self.expression(arg) for arg in args]
+        stack = self.functions.get(name)
+        if not stack:
+            self.error(f'Функция {name} не объявлена', node.id)
+            return None
+        function = stack[-1]
+        if function.params is None:
+            if name == 'len' and (len(values) != 1 or (values[0] is not None and not values[0].is_array)):
+                self.error('Функция len принимает один массив', node)
+        elif len(values) != len(function.params):
+            self.error(f'Функция {name} принимает аргументов: {len(function.params)}, передано: {len(values)}', node)
+        else:
+            for arg, value, param in zip(args, values, function.params):
+                if value is None or param is None:
+                    continue
+                if param is ANY:
+                    if value.is_array:
+                        self.error(f'Функция {name} не принимает массивы', arg)
+                elif not self.assignable(param, value):
+                    self.error(f'Аргумент типа {value} не подходит для параметра типа {param} функции {name}', arg)
+        if function.result is None and not statement:
+            self.error(f'Функция {name} не возвращает значения', node)
+        return function.result
+
+def analyze(program, modules=None):
+    return SemanticAnalyzer(modules).analyze(program)
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Семантический анализ программы SL')
+    parser.add_argument('path')
+    parser.add_argument('--refs', action='store_true', help='вывести номера переменных для всех ссылок')
+    args = parser.parse_args(argv)
+    try:
+        with open(args.path, 'rb') as f:
+            program = Parser(TableLexer(f), recover=True).parse()
+        analysis = analyze(program)
+    except CompileErrors as errors:
+        for error in errors.errors:
+            print(error)
+        return 1
+    except CompileError as error:
+        print(error)
+        return 1
+    except OSError as error:
+        print(f'Не удалось прочитать файл: {error.strerror}')
+        return 1
+    if args.refs:
+        stack = [program]
+        while stack:
+            node = stack.pop()
+            if isinstance(node, (NodeVar, NodeDeclaration)):
+                print(f'({node.id.lineno}, {node.id.pos}) {node.id.value} -> {node.ref}')
+            if isinstance(node, Node):
+                children = getattr(node, node.fields[0]) if node.sequence else [getattr(node, f) for f in node.fields]
+                stack.extend(reversed(children))
+    print(f'ошибок нет: глобальных переменных {analysis.globals}, функций {analysis.functions}, '
+          f'ссылок на переменные {analysis.references}', file=sys.stderr)
+    return 0
+
+if __name__ == '__main__':
+    sys.exit(main())
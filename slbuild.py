@@ -0,0 +1,407 @@
+import argparse
+import hashlib
+import json
+import os
+import shutil
+import sys
+import tempfile
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+import astio
+from compiler import find_sources, internal_error
+from errors import CompileError, CompileErrors
+from lexer import ENGINES
+from semantic import analyze
+from slparser import (PARSERS, NodeBlock, NodeComplexType, NodeDeclaration, NodeFunction, NodeImport, NodeProgram,
+                      Parser)
+from version import VERSION
+
+# Раздельная компиляция модулей SL. Модуль - файл .sl; инструкции
+# import "путь" в его начале подключают функции и глобальные переменные
+# других модулей (путь - относительно каталога файла). Сборка идёт в три
+# шага:
+#
+# 1. Обход графа модулей от заданных файлов. Если размер и время изменения
+#    файла совпадают с записанными в манифесте сборки, его импорты берутся
+#    из манифеста и файл не читается; иначе он сравнивается по хэшу
+#    содержимого, а у изменившегося файла разбираются только начальные
+#    инструкции import (Parser.imports).
+# 2. Разбор изменившихся модулей. Для каждого в каталог сборки
+#    записываются дерево разбора (.slast) и интерфейс (.sli) в двоичном
+#    формате astio. Интерфейс - NodeProgram из глобальных NodeDeclaration и
+#    NodeFunction с пустыми телами; он зависит только от текста самого
+#    модуля, поэтому модули разбираются параллельно и независимо друг от
+#    друга, а циклические импорты допустимы. Модуль, ни один импорт
+#    которого не разбирается заново, здесь же проходит семантический
+#    анализ.
+# 3. Семантический анализ остальных модулей, которым он нужен: изменившихся
+#    модулей с заново разобранными импортами и неизменившихся, у которых
+#    изменился интерфейс импортированного модуля. Дерево читается из
+#    .slast, без повторного разбора. Интерфейсы сравниваются по хэшу
+#    сигнатур без позиций, поэтому правка тела функции не затрагивает
+#    импортирующие модули.
+#
+# Так работа сборки пропорциональна изменениям: неизменившийся модуль не
+# читается, а кроме изменившихся проверяются только прямые импортёры
+# модулей с изменившимся интерфейсом. Ошибки модулей хранятся в манифесте
+# и выводятся и для модулей, взятых из прошлой сборки.
+#
+#   python slbuild.py main.sl [файлы и каталоги] [--build-dir .slbuild] [-j N] [--graph] [--clean]
+
+FORMAT = 'sl-build'
+FORMAT_VERSION = 1
+
+MANIFEST = 'manifest.json'
+TREE_SUFFIX = '.slast'
+INTERFACE_SUFFIX = '.sli'
+
+def resolve(path, name):
+    # путь модуля из инструкции import "name" в файле path
+    return os.path.normpath(os.path.join(os.path.dirname(path), name))
+
+def type_text(node):
+    if isinstance(node, NodeComplexType):
+        return f'{node.id.value}[{node.size.value}]'
+    return node.id.value
+
+def interface(program):
+    # объявления верхнего уровня, видимые импортирующим модулям
+    exports = []
+    for node in program.children:
+        if isinstance(node, NodeDeclaration):
+            exports.append(node)
+        elif isinstance(node, NodeFunction):
+            exports.append(NodeFunction(node.ret_type, node.id, node.formal_params, NodeBlock([])))
+    return NodeProgram(exports)
+
+def interface_digest(exports):
+    # хэш сигнатур интерфейса: типы и имена без позиций токенов
+    lines = []
+    for node in exports.children:
+        if isinstance(node, NodeFunction):
+            params = ', '.join(type_text(param.type) for param in node.formal_params.params)
+            lines.append(f'function {type_text(node.ret_type)} {node.id.value}({params})')
+        else:
+            lines.append(f'{type_text(node.type)} {node.id.value}')
+    return hashlib.sha256('\n'.join(lines).encode()).hexdigest()
+
+def write_atomic(path, data):
+    # запись во временный файл и атомарная замена, как в ParseCache.put
+    fd, temp = tempfile.mkstemp(dir=os.path.dirname(path), suffix='.tmp')
+    try:
+        with os.fdopen(fd, 'wb') as f:
+            f.write(data)
+        os.replace(temp, path)
+    except BaseException:
+        os.remove(temp)
+        raise
+
+def load(path):
+    with open(path, 'rb') as f:
+        return astio.loads_binary(f.read())
+
+def header(program):
+    # инструкции import в начале программы
+    imports = []
+    for node in program.children:
+        if not isinstance(node, NodeImport):
+            break
+        imports.append(node)
+    return imports
+
+def check(program, interfaces):
+    # ошибки семантического анализа program; interfaces - путь из import ->
+    # файл интерфейса модуля
+    try:
+        analyze(program, {name: load(path) for name, path in interfaces.items()})
+    except CompileErrors as failure:
+        return [str(error) for error in failure.errors]
+    except Exception as error:
+        return [internal_error(error)]
+    return []
+
+def compile_module(path, tree_path, interface_path, engine, parser, interfaces):
+    # шаг 2 в рабочем процессе: разбор, запись дерева и интерфейса и, если
+    # interfaces не None, семантический анализ. Возвращает хэш текста (None,
+    # если файл не прочитан), импорты, хэш интерфейса, ошибки разбора,
+    # ошибки анализа (None - анализ не выполнялся) и время
+    start = time.perf_counter()
+    try:
+        with open(path, 'rb') as f:
+            source = f.read()
+    except OSError as error:
+        return None, [], None, [f'Не удалось прочитать файл: {error.strerror}'], None, time.perf_counter() - start
+    syntax = []
+    try:
+        program = PARSERS[parser](ENGINES[engine](source), recover=True).parse()
+    except CompileErrors as failure:
+        syntax = [str(error) for error in failure.errors]
+        program = failure.program or NodeProgram([])
+    except UnicodeDecodeError as error:
+        syntax = [f'Файл не в кодировке UTF-8: {error.reason}']
+        program = NodeProgram([])
+    except Exception as error:
+        # исключение одного модуля - его ошибка, а не сбой всей сборки
+        syntax = [internal_error(error)]
+        program = NodeProgram([])
+    imports = [(node.path.value, resolve(path, node.path.value)) for node in header(program)]
+    exports = interface(program)
+    write_atomic(tree_path, astio.dumps_binary(program))
+    write_atomic(interface_path, astio.dumps_binary(exports))
+    # дерево с ошибками разбора не анализируется: ошибки анализа в нём
+    # были бы следствием пропущенных инструкций
+    semantic = check(program, interfaces) if interfaces is not None and not syntax else None
+    return (hashlib.sha256(source).hexdigest(), imports, interface_digest(exports), syntax, semantic,
+            time.perf_counter() - start)
+
+def check_module(tree_path, interfaces):
+    # шаг 3 в рабочем процессе: анализ дерева из прошлого разбора
+    start = time.perf_counter()
+    return check(load(tree_path), interfaces), time.perf_counter() - start
+
+class Module:
+    # модуль в графе сборки; поля, кроме path, changed и action, хранятся
+    # в манифесте
+    __slots__ = ('path', 'size', 'mtime', 'source', 'imports', 'interface', 'deps', 'syntax', 'errors',
+                 'changed', 'action')
+
+    def __init__(self, path):
+        self.path = path
+        self.size = None
+        self.mtime = None
+        # хэш текста (None, если файл не прочитан) и хэш интерфейса
+        self.source = None
+        self.interface = None
+        # (путь из import, путь модуля)
+        self.imports = []
+        # путь модуля -> хэш его интерфейса при последнем анализе
+        self.deps = {}
+        # ошибки чтения и разбора; модуль с ними не анализируется
+        self.syntax = []
+        # ошибки семантического анализа
+        self.errors = []
+        # текст изменился с прошлой сборки, и модуль разбирается заново
+        self.changed = False
+        # (что сделано с модулем в этой сборке, время) для вывода
+        self.action = None
+
+    def restore(self, entry):
+        self.source = entry['source']
+        self.imports = [tuple(item) for item in entry['imports']]
+        self.interface = entry['interface']
+        self.deps = entry['deps']
+        self.syntax = entry['syntax']
+        self.errors = entry['errors']
+
+    def entry(self):
+        return {
+            'size'      : self.size,
+            'mtime'     : self.mtime,
+            'source'    : self.source,
+            'imports'   : self.imports,
+            'interface' : self.interface,
+            'deps'      : self.deps,
+            'syntax'    : self.syntax,
+            'errors'    : self.errors,
+        }
+
+class Build:
+    def __init__(self, directory, jobs=None, engine='table', parser='recursive'):
+        self.directory = directory
+        os.makedirs(directory, exist_ok=True)
+        self.jobs = jobs or os.cpu_count() or 1
+        self.engine = engine
+        self.parser = parser
+        # абсолютный путь -> запись манифеста прошлой сборки
+        self.manifest = self.load_manifest()
+        self.modules = {}
+        # пул рабочих процессов; создаётся, когда работы больше чем на один модуль
+        self.executor = None
+        self.parsed = 0
+        self.checked = 0
+
+    # манифест и файлы сборки
+
+    def load_manifest(self):
+        try:
+            with open(os.path.join(self.directory, MANIFEST)) as f:
+                data = json.load(f)
+        except (OSError, ValueError):
+            return {}
+        if (data.get('format'), data.get('version'), data.get('compiler')) != (FORMAT, FORMAT_VERSION, VERSION):
+            # другой компилятор: деревья и интерфейсы собираются заново
+            return {}
+        return data['modules']
+
+    def save_manifest(self):
+        # записи модулей, не вошедших в эту сборку, сохраняются
+        modules = dict(self.manifest)
+        for module in self.modules.values():
+            key = os.path.abspath(module.path)
+            if module.source is None:
+                modules.pop(key, None)
+            else:
+                modules[key] = module.entry()
+        data = {'format': FORMAT, 'version': FORMAT_VERSION, 'compiler': VERSION, 'modules': modules}
+        write_atomic(os.path.join(self.directory, MANIFEST), json.dumps(data, ensure_ascii=False).encode())
+
+    def artifact(self, path, suffix):
+        key = hashlib.sha256(os.path.abspath(path).encode()).hexdigest()[:32]
+        return os.path.join(self.directory, key + suffix)
+
+    def artifacts_exist(self, path):
+        return all(os.path.exists(self.artifact(path, suffix)) for suffix in (TREE_SUFFIX, INTERFACE_SUFFIX))
+
+    # шаг 1: граф модулей
+
+    def scan(self, path):
+        module = Module(path)
+        old = self.manifest.get(os.path.abspath(path))
+        try:
+            stat = os.stat(path)
+            module.size, module.mtime = stat.st_size, stat.st_mtime_ns
+            valid = old is not None and self.artifacts_exist(path)
+            if valid and (old['size'], old['mtime']) == (module.size, module.mtime):
+                module.restore(old)
+                return module
+            with open(path, 'rb') as f:
+                source = f.read()
+        except OSError as error:
+            module.syntax = [f'Не удалось прочитать файл: {error.strerror}']
+            module.action = ('не прочитан', 0.0)
+            return module
+        digest = hashlib.sha256(source).hexdigest()
+        if valid and old['source'] == digest:
+            # файл перезаписан без изменений
+            module.restore(old)
+            return module
+        module.changed = True
+        try:
+            imports = Parser(ENGINES[self.engine](source)).imports()
+        except (CompileError, UnicodeDecodeError):
+            # ошибку покажет разбор модуля
+            imports = []
+        module.imports = [(node.path.value, resolve(path, node.path.value)) for node in imports]
+        return module
+
+    def graph(self, roots):
+        pending = [os.path.normpath(path) for path in reversed(roots)]
+        while pending:
+            path = pending.pop()
+            if path in self.modules:
+                continue
+            module = self.modules[path] = self.scan(path)
+            pending.extend(dependency for _, dependency in reversed(module.imports))
+
+    def interfaces(self, module):
+        # путь из import -> файл интерфейса для модулей, у которых он есть
+        return {name: self.artifact(path, INTERFACE_SUFFIX) for name, path in module.imports
+                if self.modules[path].interface is not None}
+
+    def digests(self, module):
+        return {path: self.modules[path].interface for _, path in module.imports}
+
+    # шаги 2 и 3
+
+    def run(self, function, tasks):
+        # результаты function для задач tasks по порядку
+        if self.jobs == 1 or len(tasks) <= 1:
+            return [function(*task) for task in tasks]
+        if self.executor is None:
+            self.executor = ProcessPoolExecutor(max_workers=self.jobs)
+        return list(self.executor.map(function, *zip(*tasks)))
+
+    def build(self, roots):
+        try:
+            self.graph(roots)
+            self.compile()
+        finally:
+            if self.executor is not None:
+                self.executor.shutdown()
+                self.executor = None
+        self.save_manifest()
+        return self.modules
+
+    def compile(self):
+        changed = [module for module in self.modules.values() if module.changed]
+        # анализ модуля откладывается до шага 3, если его импорты разбираются заново
+        deferred = {module.path for module in changed
+                    if any(self.modules[path].changed for _, path in module.imports)}
+        tasks = [(module.path, self.artifact(module.path, TREE_SUFFIX), self.artifact(module.path, INTERFACE_SUFFIX),
+                  self.engine, self.parser, None if module.path in deferred else self.interfaces(module))
+                 for module in changed]
+        for module, result in zip(changed, self.run(compile_module, tasks)):
+            module.source, imports, module.interface, module.syntax, errors, elapsed = result
+            module.action = ('разобран', elapsed)
+            if module.source is None:
+                module.action = ('не прочитан', elapsed)
+                continue
+            self.parsed += 1
+            if imports != module.imports:
+                # файл изменился после шага 1: результат не записывается в
+                # манифест, и следующая сборка разберёт модуль заново
+                module.source = None
+                continue
+            if errors is not None:
+                module.errors = errors
+                module.deps = self.digests(module)
+                module.action = ('разобран и проверен', elapsed)
+                self.checked += 1
+            elif module.syntax:
+                module.errors = []
+                module.deps = self.digests(module)
+                deferred.discard(module.path)
+
+        stale = [module for module in self.modules.values()
+                 if module.source is not None and not module.syntax
+                 and (module.path in deferred or module.deps != self.digests(module))]
+        tasks = [(self.artifact(module.path, TREE_SUFFIX), self.interfaces(module)) for module in stale]
+        for module, (errors, elapsed) in zip(stale, self.run(check_module, tasks)):
+            module.errors = errors
+            module.deps = self.digests(module)
+            self.checked += 1
+            if module.action is None:
+                module.action = ('проверен', elapsed)
+            else:
+                module.action = ('разобран и проверен', module.action[1] + elapsed)
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Раздельная сборка модулей SL')
+    parser.add_argument('paths', nargs='+', help='модули и каталоги с модулями .sl')
+    parser.add_argument('--build-dir', default='.slbuild', help='каталог манифеста, деревьев и интерфейсов')
+    parser.add_argument('-j', '--jobs', type=int, default=None,
+                        help='число рабочих процессов (по умолчанию - число ядер)')
+    parser.add_argument('--engine', choices=sorted(ENGINES), default='table', help='движок лексера')
+    parser.add_argument('--parser', choices=sorted(PARSERS), default='recursive', help='разбор выражений')
+    parser.add_argument('--graph', action='store_true', help='вывести граф импортов')
+    parser.add_argument('--clean', action='store_true', help='удалить результаты прошлых сборок')
+    parser.add_argument('-q', '--quiet', action='store_true', help='не выводить действия с модулями')
+    args = parser.parse_args(argv)
+
+    if args.clean:
+        shutil.rmtree(args.build_dir, ignore_errors=True)
+    start = time.perf_counter()
+    build = Build(args.build_dir, args.jobs, args.engine, args.parser)
+    modules = build.build(find_sources(args.paths))
+    elapsed = time.perf_counter() - start
+
+    failed = 0
+    for path in sorted(modules):
+        module = modules[path]
+        if args.graph:
+            print(f'{path} -> {", ".join(dependency for _, dependency in module.imports) or "-"}')
+        errors = module.syntax + module.errors
+        for error in errors:
+            print(f'{path}: {error}')
+        failed += bool(errors)
+        if module.action is not None and not args.quiet:
+            action, seconds = module.action
+            print(f'{path}: {action}, {seconds * 1000:.2f} мс', file=sys.stderr)
+    unchanged = sum(module.action is None for module in modules.values())
+    print(f'модулей: {len(modules)}, разобрано: {build.parsed}, проверено: {build.checked}, '
+          f'без изменений: {unchanged}, с ошибками: {failed}, {elapsed:.2f} с', file=sys.stderr)
+    return 1 if failed else 0
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -1,150 +1,286 @@
-import sys
+import io
+from errors import CompileErrors, ParserError
 from lexer import Lexer, Token
 
 class Node:
-    def __get_class_name(self):
-        c = str(self.__class__)
-        pos_1 = c.find('.')+1
-        pos_2 = c.find("'", pos_1)
-        return f"{c[pos_1:pos_2]}"
-
-    def __repr__(self, level=0):
-        attrs = self.__dict__ # словарь атрибут : значение
-        # если атрибут один и тип его значения - это список,
-        # то это узел некоторой последовательности (подпрограмма, либо список)
-        if len(attrs) == 1 and isinstance(list(attrs.values())[0], list):
-            is_sequence = True
-        else:
-            is_sequence = False
-        res = f"{self.__get_class_name()}\n"
-        if is_sequence:
-            elements = list(attrs.values())[0]
-            for el in elements:
-                res += '|   ' * level
-                res += "|+-"
-                res += el.__repr__(level+1)
-        else:
-            for attr_name in attrs:
-                res += '|   ' * level
-                res += "|+-"
-                if isinstance(attrs[attr_name], Token):
-                    res += f"{attr_name}: {attrs[attr_name]}\n"
-                else:
-                    res += f"{attr_name}: {attrs[attr_name].__repr__(level+1)}"
-        return res
+    __slots__ = ()
+
+    # все классы узлов в порядке объявления; номер класса в этом списке -
+    # его код kind в компактных представлениях дерева
+    kinds = []
+
+    # слоты с результатами анализа (см. semantic.py и optimizer.py): они
+    # не входят в fields, не сериализуются и до анализа равны None
+    annotations = ()
+
+    def __init_subclass__(cls):
+        # поля узла в порядке объявления, от базового класса к производному
+        cls.fields = tuple(name for klass in reversed(cls.__mro__)
+                           for name in klass.__dict__.get('__slots__', ())
+                           if name not in cls.annotations)
+        cls.kind = len(Node.kinds)
+        Node.kinds.append(cls)
+
+    # True у узлов, единственное поле которых - список дочерних узлов
+    # (подпрограмма, последовательность, список параметров)
+    sequence = False
+
+    @classmethod
+    def empty(cls):
+        # узел без значений полей, для сборки дерева по полям
+        node = cls.__new__(cls)
+        for name in cls.annotations:
+            setattr(node, name, None)
+        return node
+
+    def write(self, out):
+        # печатает дерево в out в том же виде, что и __repr__, но обходом
+        # со стеком: без рекурсии и без склеивания всего текста в одну строку
+        stack = [('', self, 0)]
+        while stack:
+            prefix, value, level = stack.pop()
+            out.write(prefix)
+            if not isinstance(value, Node):
+                # токен (или пустое поле)
+                out.write(f"{value}\n")
+                continue
+            out.write(f"{type(value).__name__}\n")
+            indent = '|   ' * level + "|+-"
+            if value.sequence:
+                children = [(indent, el) for el in getattr(value, value.fields[0])]
+            else:
+                children = [(f"{indent}{name}: ", getattr(value, name)) for name in value.fields]
+            for child in reversed(children):
+                stack.append((*child, level + 1))
+
+    def __repr__(self):
+        out = io.StringIO()
+        self.write(out)
+        return out.getvalue()
 
 class NodeProgram(Node):
+    __slots__ = ('children', 'frame')
+    # frame - число глобальных переменных программы; None, если номера
+    # переменных (ref) не размечены или устарели
+    annotations = ('frame',)
+    sequence = True
+
     def __init__(self, children):
         self.children = children
+        self.frame = None
 
-class NodeBlock(NodeProgram): pass
-class NodeElseBlock(NodeBlock): pass
+class NodeBlock(NodeProgram): __slots__ = ()
+class NodeElseBlock(NodeBlock): __slots__ = ()
 
 class NodeDeclaration(Node):
+    __slots__ = ('type', 'id', 'ref')
+    # ref - (глубина, номер) объявленной переменной
+    annotations = ('ref',)
+
     def __init__(self, _type, id):
         self.type = _type
         self.id = id
+        self.ref = None
+
+    @property
+    def sym(self):
+        # номер имени в таблице символов лексера
+        return self.id.sym
 
 class NodeAssigning(Node):
+    __slots__ = ('left_side', 'right_side')
+
     def __init__(self, left_side, right_side):
         self.left_side = left_side
         self.right_side = right_side
 
 class NodeFunction(Node):
+    __slots__ = ('ret_type', 'id', 'formal_params', 'block', 'frame', 'memo')
+    # frame - число локальных переменных в кадре функции; memo - размер
+    # кэша мемоизации чистой функции (см. optimizer.Inliner)
+    annotations = ('frame', 'memo')
+
     def __init__(self, ret_type, id, formal_params, block):
         self.ret_type = ret_type
         self.id = id
         self.formal_params = formal_params
         self.block = block
+        self.frame = None
+        self.memo = None
+
+    @property
+    def sym(self):
+        return self.id.sym
 
 class NodeSequence(Node):
+    __slots__ = ('members',)
+    sequence = True
+
     def __init__(self, members):
         self.members = members
     
 class NodeParams(Node):
+    __slots__ = ('params',)
+    sequence = True
+
     def __init__(self, params):
         self.params = params
     
-class NodeFormalParams(NodeParams): pass
-class NodeActualParams(NodeParams): pass
+class NodeFormalParams(NodeParams): __slots__ = ()
+class NodeActualParams(NodeParams): __slots__ = ()
 
 class NodeIfConstruction(Node):
+    __slots__ = ('condition', 'block', 'else_block')
+
     def __init__(self, condition, block, else_block):
         self.condition = condition
         self.block = block
         self.else_block = else_block
     
 class NodeWhileConstruction(Node):
+    __slots__ = ('condition', 'block')
+
     def __init__(self, condition, block):
         self.condition = condition
         self.block = block
 
 class NodeReturnStatement(Node):
+    __slots__ = ('expression',)
+
     def __init__(self, expression):
         self.expression = expression
+
+class NodeImport(Node):
+    # import "путь": path - токен STRING-LITERAL с путём к модулю
+    # относительно каталога импортирующего файла
+    __slots__ = ('path',)
+
+    def __init__(self, path):
+        self.path = path
     
 class NodeLiteral(Node):
+    __slots__ = ('value',)
+
     def __init__(self, value):
         self.value = value
     
-class NodeStringLiteral(NodeLiteral): pass
-class NodeIntLiteral(NodeLiteral): pass
-class NodeFloatLiteral(NodeLiteral): pass
+class NodeStringLiteral(NodeLiteral): __slots__ = ()
+class NodeIntLiteral(NodeLiteral): __slots__ = ()
+class NodeFloatLiteral(NodeLiteral): __slots__ = ()
 
 class NodeVar(Node):
+    __slots__ = ('id', 'ref')
+    # ref - (глубина, номер) переменной, на которую ссылается имя
+    annotations = ('ref',)
+
     def __init__(self, id):
         self.id = id
+        self.ref = None
+
+    @property
+    def sym(self):
+        return self.id.sym
     
 class NodeAtomType(Node):
+    __slots__ = ('id',)
+
     def __init__(self, id):
         self.id = id
 
 class NodeComplexType(Node):
+    __slots__ = ('id', 'size')
+
     def __init__(self, id, size):
         self.id = id
         self.size = size
 
 class NodeFunctionCall(Node):
+    __slots__ = ('id', 'actual_params')
+
     def __init__(self, id, actual_params):
         self.id = id
         self.actual_params = actual_params
 
+    @property
+    def sym(self):
+        return self.id.sym
+
 class NodeIndexAccess(Node):
+    __slots__ = ('var', 'index', 'safe')
+    # safe - индекс доказанно неотрицателен, проверка при выполнении не нужна
+    annotations = ('safe',)
+
     def __init__(self, var, index):
         self.var = var
         self.index = index
+        self.safe = None
 
 class NodeUnaryOperator(Node):
+    __slots__ = ('operand',)
+
     def __init__(self, operand):
         self.operand = operand
     
-class NodeUnaryMinus(NodeUnaryOperator): pass
-class NodeNot(NodeUnaryOperator): pass
+class NodeUnaryMinus(NodeUnaryOperator): __slots__ = ()
+class NodeNot(NodeUnaryOperator): __slots__ = ()
 
 class NodeBinaryOperator(Node):
+    __slots__ = ('left', 'right')
+
     def __init__(self, left, right):
         self.left = left
         self.right = right
 
-class NodeL(NodeBinaryOperator): pass
-class NodeG(NodeBinaryOperator): pass
-class NodeLE(NodeBinaryOperator): pass
-class NodeGE(NodeBinaryOperator): pass
-class NodeEQ(NodeBinaryOperator): pass
-class NodeNEQ(NodeBinaryOperator): pass
-class NodeOr(NodeBinaryOperator): pass
-class NodeAnd(NodeBinaryOperator): pass
-
-class NodePlus(NodeBinaryOperator): pass
-class NodeMinus(NodeBinaryOperator): pass
-class NodeDivision(NodeBinaryOperator): pass
-class NodeMultiply(NodeBinaryOperator): pass
-class NodeIDivision(NodeBinaryOperator): pass
-class NodeMod(NodeBinaryOperator): pass
+class NodeL(NodeBinaryOperator): __slots__ = ()
+class NodeG(NodeBinaryOperator): __slots__ = ()
+class NodeLE(NodeBinaryOperator): __slots__ = ()
+class NodeGE(NodeBinaryOperator): __slots__ = ()
+class NodeEQ(NodeBinaryOperator): __slots__ = ()
+class NodeNEQ(NodeBinaryOperator): __slots__ = ()
+class NodeOr(NodeBinaryOperator): __slots__ = ()
+class NodeAnd(NodeBinaryOperator): __slots__ = ()
+
+class NodePlus(NodeBinaryOperator): __slots__ = ()
+class NodeMinus(NodeBinaryOperator): __slots__ = ()
+class NodeDivision(NodeBinaryOperator): __slots__ = ()
+class NodeMultiply(NodeBinaryOperator): __slots__ = ()
+class NodeIDivision(NodeBinaryOperator): __slots__ = ()
+class NodeMod(NodeBinaryOperator): __slots__ = ()
 
 class Parser:
-    def __init__(self, lexer: Lexer):
+    # результат terminated_statement для пропущенной из-за ошибки инструкции
+    SKIPPED = object()
+
+    # бинарные операции по уровням приоритета, от слабых к сильным:
+    # токен -> узел
+    OR_OPERATORS = {Token.OR: NodeOr}
+    AND_OPERATORS = {Token.AND: NodeAnd}
+    COMPARISON_OPERATORS = {
+        Token.L     : NodeL,
+        Token.G     : NodeG,
+        Token.LE    : NodeLE,
+        Token.GE    : NodeGE,
+        Token.EQ    : NodeEQ,
+        Token.NEQ   : NodeNEQ,
+    }
+    ADDITIVE_OPERATORS = {Token.PLUS: NodePlus, Token.MINUS: NodeMinus}
+    MULTIPLICATIVE_OPERATORS = {
+        Token.ASTERISK  : NodeMultiply,
+        Token.SLASH     : NodeDivision,
+        Token.DSLASH    : NodeIDivision,
+        Token.PERCENT   : NodeMod,
+    }
+
+    def __init__(self, lexer: Lexer, recover=False):
         self.lexer = lexer
+        # таблица символов лексера: имена в узлах можно сравнивать по Token.sym
+        self.symbols = lexer.symbols
+        # без recover первая же ошибка прерывает разбор исключением; с recover
+        # ошибки лексера и парсера собираются в общий список errors, а разбор
+        # продолжается со следующей инструкции
+        self.errors = None
+        if recover:
+            self.errors = lexer.errors = []
         self.token = self.lexer.get_next_token()
 
     def next_token(self):
@@ -155,31 +291,67 @@ class Parser:
             self.error(f"Ожидается токен {Token.token_names[expected_token_name]}!")
 
     def error(self, msg):
-        print(f'Ошибка синтаксического анализа ({self.lexer.lineno}, {self.lexer.pos}): {msg}')
-        sys.exit(1)
+        raise ParserError(msg, self.lexer.lineno, self.lexer.pos)
+
+    def synchronize(self):
+        # восстановление в паническом режиме: токены пропускаются до SEMI
+        # (включительно) или до RCBR текущего уровня вложенности
+        depth = 0
+        while True:
+            match self.token.name:
+                case Token.EOF:
+                    return
+                case Token.LCBR:
+                    depth += 1
+                case Token.RCBR:
+                    if depth == 0:
+                        return
+                    depth -= 1
+                case Token.SEMI if depth == 0:
+                    self.next_token()
+                    return
+            self.next_token()
+
+    def terminated_statement(self):
+        # инструкция вместе с завершающей SEMI
+        try:
+            statement = self.statement()
+            self.require(Token.SEMI)
+        except ParserError as error:
+            if self.errors is None:
+                raise
+            self.errors.append(error)
+            self.synchronize()
+            return self.SKIPPED
+        self.next_token()
+        return statement
 
     def block(self) -> Node:
         statements = []
         while self.token.name not in {Token.RCBR, Token.EOF}:
-            statements.append(self.statement())
-            self.require(Token.SEMI)
-            self.next_token()
+            statement = self.terminated_statement()
+            if statement is not self.SKIPPED:
+                statements.append(statement)
         return NodeBlock(statements)
 
     def else_block(self) -> Node:
         statements = []
         while self.token.name not in {Token.RCBR, Token.EOF}:
-            statements.append(self.statement())
-            self.require(Token.SEMI)
-            self.next_token()
+            statement = self.terminated_statement()
+            if statement is not self.SKIPPED:
+                statements.append(statement)
         return NodeElseBlock(statements)
 
     def actual_params(self) -> Node:
         params = []
         while self.token.name not in {Token.RBR, Token.EOF}:
+            start = self.token
             params.append(self.expression())
             if self.token.name == Token.COMMA:
                 self.next_token()
+            elif self.token is start:
+                # на месте аргумента нет выражения: без ошибки цикл не кончится
+                self.require(Token.RBR)
         return NodeActualParams(params)
 
     def formal_params(self) -> Node:
@@ -237,30 +409,18 @@ class Parser:
     def term(self) -> Node:
         left = self.factor()
         op = self.token.name
-        while op in {Token.ASTERISK, Token.SLASH, Token.DSLASH, Token.PERCENT}:
+        while op in self.MULTIPLICATIVE_OPERATORS:
             self.next_token()
-            match op:
-                case Token.ASTERISK:
-                    left = NodeMultiply(left, self.factor())
-                case Token.SLASH:
-                    left = NodeDivision(left, self.factor())
-                case Token.DSLASH:
-                    left = NodeIDivision(left, self.factor())
-                case Token.PERCENT:
-                    left = NodeMod(left, self.factor())
+            left = self.MULTIPLICATIVE_OPERATORS[op](left, self.factor())
             op = self.token.name
         return left
 
     def expression(self) -> Node:
         left = self.term()
         op = self.token.name
-        while op in {Token.PLUS, Token.MINUS}:
+        while op in self.ADDITIVE_OPERATORS:
             self.next_token()
-            match op:
-                case Token.PLUS:
-                    left = NodePlus(left, self.term())
-                case Token.MINUS:
-                    left = NodeMinus(left, self.term())
+            left = self.ADDITIVE_OPERATORS[op](left, self.term())
             op = self.token.name
         return left
 
@@ -281,39 +441,27 @@ class Parser:
     def and_operand(self) -> Node:
         left = self.logical_operand()
         op = self.token.name
-        while op in {Token.L, Token.G, Token.LE, Token.GE, Token.EQ, Token.NEQ}:
+        while op in self.COMPARISON_OPERATORS:
             self.next_token()
-            match op:
-                case Token.L:
-                    left = NodeL(left, self.expression())
-                case Token.G:
-                    left = NodeG(left, self.expression())
-                case Token.LE:
-                    left = NodeLE(left, self.expression())
-                case Token.GE:
-                    left = NodeGE(left, self.expression())
-                case Token.EQ:
-                    left = NodeEQ(left, self.expression())
-                case Token.NEQ:
-                    left = NodeNEQ(left, self.expression())
+            left = self.COMPARISON_OPERATORS[op](left, self.expression())
             op = self.token.name
         return left
 
     def or_operand(self) -> Node:
         left = self.and_operand()
         op = self.token.name
-        while op == Token.AND:
+        while op in self.AND_OPERATORS:
             self.next_token()
-            left = NodeAnd(left, self.and_operand())
+            left = self.AND_OPERATORS[op](left, self.and_operand())
             op = self.token.name
         return left
 
     def condition(self) -> Node:
         left = self.or_operand()
         op = self.token.name
-        while op == Token.OR:
+        while op in self.OR_OPERATORS:
             self.next_token()
-            left = NodeOr(left, self.or_operand())
+            left = self.OR_OPERATORS[op](left, self.or_operand())
             op = self.token.name
         return left
 
@@ -333,9 +481,12 @@ class Parser:
     def sequence(self) -> Node:
         members = []
         while self.token.name not in {Token.RSBR, Token.EOF}:
+            start = self.token
             members.append(self.expression())
             if self.token.name == Token.COMMA:
                 self.next_token()
+            elif self.token is start:
+                self.require(Token.RSBR)
         return NodeSequence(members)
 
     def declaration(self) -> Node:
@@ -459,14 +610,260 @@ class Parser:
                 expression = self.expression()
                 return NodeReturnStatement(expression)
 
+            case Token.IMPORT:
+                self.next_token()
+                self.require(Token.STRING_LITERAL)
+                path = self.token
+                self.next_token()
+                return NodeImport(path)
+
+    def statements(self):
+        # инструкции программы по одной, по мере разбора
+        while self.token.name != Token.EOF:
+            statement = self.terminated_statement()
+            if statement is self.SKIPPED:
+                if self.token.name == Token.RCBR:
+                    # лишняя закрывающая скобка верхнего уровня
+                    self.next_token()
+            else:
+                yield statement
+
+    def imports(self):
+        # инструкции import в начале программы; остальной текст не
+        # читается: по ним сборка (slbuild.py) строит граф модулей, не
+        # разбирая неизменившиеся файлы целиком
+        imports = []
+        while self.token.name == Token.IMPORT:
+            imports.append(self.terminated_statement())
+        return imports
+
     def parse(self) -> Node:
-        if self.token.name == Token.EOF:
-            self.error("Пустой файл!")
-        else:
-            statements = []
-            while self.token.name != Token.EOF:
-                statements.append(self.statement())
-                self.require(Token.SEMI)
-                self.next_token()
-            return NodeProgram(statements)
-                
\ No newline at end of file
+        program = None
+        try:
+            if self.token.name == Token.EOF:
+                self.error("Пустой файл!")
+            program = NodeProgram(list(self.statements()))
+        except ParserError as error:
+            if self.errors is None:
+                raise
+            self.errors.append(error)
+        if self.errors:
+            self.errors.sort(key=lambda error: (error.lineno, error.pos))
+            raise CompileErrors(self.errors, program)
+        return program
+                
+class PrattParser(Parser):
+    # выражения и условия разбираются одним циклом по таблице сил связывания
+    # вместо цепочки condition -> or_operand -> ... -> operand. Вложенные
+    # скобки, not, аргументы вызовов и индексы уходят в явный стек, поэтому
+    # глубина вложенности не ограничена стеком Python. Деревья те же, что у
+    # Parser: у каждого уровня таблицы своя сила, все операции
+    # левоассоциативны, а ограничения грамматики (в выражении и справа от
+    # сравнения - только арифметика, после not и скобок условия - только
+    # логические операции и сравнения) задаются таблицей допустимых
+    # операций текущего уровня.
+    LEVELS = (Parser.OR_OPERATORS, Parser.AND_OPERATORS, Parser.COMPARISON_OPERATORS,
+              Parser.ADDITIVE_OPERATORS, Parser.MULTIPLICATIVE_OPERATORS)
+    COMPARISON_POWER = LEVELS.index(Parser.COMPARISON_OPERATORS) + 1
+    ARITHMETIC_POWER = LEVELS.index(Parser.ADDITIVE_OPERATORS) + 1
+    # таблицы уровней: токен -> (сила связывания, узел)
+    TABLES = [{token: (power, node) for token, node in operators.items()}
+              for power, operators in enumerate(LEVELS, 1)]
+    # все операции (условие), арифметические (выражение) и логические со
+    # сравнениями (после логического операнда условия)
+    BINDING = {token: entry for table in TABLES for token, entry in table.items()}
+    ARITHMETIC = {token: entry for table in TABLES[ARITHMETIC_POWER - 1:] for token, entry in table.items()}
+    LOGICAL = {token: entry for table in TABLES[:ARITHMETIC_POWER - 1] for token, entry in table.items()}
+    LITERALS = {
+        Token.STRING_LITERAL    : NodeStringLiteral,
+        Token.INT_LITERAL       : NodeIntLiteral,
+        Token.FLOAT_LITERAL     : NodeFloatLiteral,
+    }
+    # кадры явного стека: (вид, операции, сила, ...) - после завершения
+    # вложенного уровня восстанавливаются его таблица операций и сила
+    BINARY, NOT, GROUP, NEGATED_GROUP, ARGUMENT, INDEX = range(6)
+
+    def expression(self) -> Node:
+        return self.operation(self.ARITHMETIC)
+
+    def condition(self) -> Node:
+        return self.operation(self.BINDING)
+
+    def operation(self, operations) -> Node:
+        # operations - операции, которые может забрать текущий уровень:
+        # BINDING в условии, ARITHMETIC в выражении, LOGICAL после not или
+        # скобок условия; power - сила операции, в правом операнде которой
+        # идёт разбор: уровень забирает только операции сильнее неё.
+        # Текущий токен хранится в локальной переменной и записывается в
+        # self.token перед require и на выходе, в том числе по исключению
+        # лексера
+        condition = self.BINDING
+        arithmetic = self.ARITHMETIC
+        literals = self.LITERALS
+        binary = self.BINARY
+        get_next_token = self.lexer.get_next_token
+        token = self.token
+        stack = []
+        power = 0
+        # токен ID, уже взятый из лексера: за ним может идти вызов или индекс
+        first = None
+        negate = False
+        try:
+            while True:
+                # начало операнда: префиксы открывают вложенный уровень
+                if first is None:
+                    name = token.name
+                    negate = False
+                    if name == Token.MINUS:
+                        negate = True
+                        token = get_next_token()
+                        name = token.name
+                    literal = literals.get(name)
+                    if name == Token.ID:
+                        first = token
+                        token = get_next_token()
+                    elif literal is not None:
+                        left = literal(token)
+                        token = get_next_token()
+                    elif name == Token.LBR:
+                        token = get_next_token()
+                        if negate:
+                            stack.append((self.NEGATED_GROUP, operations, power))
+                            operations = arithmetic
+                        else:
+                            # в условии скобки окружают условие, в выражении - выражение
+                            stack.append((self.GROUP, operations, power))
+                        power = 0
+                        continue
+                    elif name == Token.NOT and operations is condition and not negate:
+                        # not забирает операнд сравнения
+                        token = get_next_token()
+                        stack.append((self.NOT, operations, power))
+                        power = self.COMPARISON_POWER
+                        continue
+                    else:
+                        # как у operand: не начинающий операнд токен не пропускается
+                        left = None
+                if first is not None:
+                    name = token.name
+                    if name == Token.LBR:
+                        token = get_next_token()
+                        if token.name not in {Token.RBR, Token.EOF}:
+                            # последний элемент кадра - токен начала аргумента
+                            stack.append((self.ARGUMENT, operations, power, negate, first, [], token))
+                            operations = arithmetic
+                            power = 0
+                            first = None
+                            continue
+                        self.token = token
+                        self.require(Token.RBR)
+                        token = get_next_token()
+                        left = NodeFunctionCall(first, NodeActualParams([]))
+                    elif name == Token.LSBR:
+                        token = get_next_token()
+                        stack.append((self.INDEX, operations, power, negate, first))
+                        operations = arithmetic
+                        power = 0
+                        first = None
+                        continue
+                    else:
+                        left = NodeVar(first)
+                    first = None
+                if negate:
+                    left = NodeUnaryMinus(left)
+
+                # инфиксные операции; уровень без подходящей операции
+                # завершается и отдаёт результат кадру со стека
+                while True:
+                    entry = operations.get(token.name)
+                    if entry is not None and entry[0] > power:
+                        op_power, node = entry
+                        # справа от and и or - условие, от остальных - выражение
+                        right = condition if op_power < self.COMPARISON_POWER else arithmetic
+                        # после свёртки логической операции или сравнения
+                        # допустимы только они
+                        after = operations if op_power >= self.ARITHMETIC_POWER else self.LOGICAL
+                        token = get_next_token()
+                        name = token.name
+                        if name == Token.ID or name in literals:
+                            # простой правый операнд сворачивается сразу, если
+                            # за ним нет более сильной операции
+                            operand = token
+                            token = get_next_token()
+                            if name == Token.ID:
+                                if token.name == Token.LBR or token.name == Token.LSBR:
+                                    stack.append((binary, after, power, left, node))
+                                    operations = right
+                                    power = op_power
+                                    first = operand
+                                    negate = False
+                                    break
+                                operand = NodeVar(operand)
+                            else:
+                                operand = literals[name](operand)
+                            following = right.get(token.name)
+                            if following is None or following[0] <= op_power:
+                                left = node(left, operand)
+                                operations = after
+                                continue
+                            stack.append((binary, after, power, left, node))
+                            operations = right
+                            power = op_power
+                            left = operand
+                            continue
+                        stack.append((binary, after, power, left, node))
+                        operations = right
+                        power = op_power
+                        break
+                    if not stack:
+                        return left
+                    frame = stack.pop()
+                    kind = frame[0]
+                    if kind is binary:
+                        _, operations, power, lhs, node = frame
+                        left = node(lhs, left)
+                        continue
+                    operations = frame[1]
+                    power = frame[2]
+                    if kind == self.NOT:
+                        left = NodeNot(left)
+                        operations = self.LOGICAL
+                    elif kind == self.GROUP or kind == self.NEGATED_GROUP:
+                        self.token = token
+                        self.require(Token.RBR)
+                        token = get_next_token()
+                        if kind == self.NEGATED_GROUP:
+                            left = NodeUnaryMinus(left)
+                        elif operations is condition:
+                            operations = self.LOGICAL
+                    elif kind == self.ARGUMENT:
+                        params = frame[5]
+                        params.append(left)
+                        if token.name == Token.COMMA:
+                            token = get_next_token()
+                        elif token is frame[6]:
+                            self.token = token
+                            self.require(Token.RBR)
+                        if token.name not in {Token.RBR, Token.EOF}:
+                            stack.append(frame[:6] + (token,))
+                            operations = arithmetic
+                            power = 0
+                            break
+                        self.token = token
+                        self.require(Token.RBR)
+                        token = get_next_token()
+                        left = NodeFunctionCall(frame[4], NodeActualParams(params))
+                        if frame[3]:
+                            left = NodeUnaryMinus(left)
+                    else:
+                        self.token = token
+                        self.require(Token.RSBR)
+                        token = get_next_token()
+                        left = NodeIndexAccess(NodeVar(frame[4]), left)
+                        if frame[3]:
+                            left = NodeUnaryMinus(left)
+        finally:
+            self.token = token
+
+# движки разбора по имени (compiler.py --parser)
+PARSERS = {'recursive': Parser, 'pratt': PrattParser}
@@ -0,0 +1,3 @@
+# версия компилятора; входит в ключи кэшей, поэтому её нужно менять при
+# любом изменении лексера, парсера или формата дерева разбора
+VERSION = '0.2.0'
@@ -0,0 +1,241 @@
+import argparse
+import sys
+
+import bytecode
+from bytecode import (ARGC_BITS, ASSIGN_CONSTANT, ASSIGN_SEQUENCE, BINARY, BINARY_CONST,
+                      BINARY_OPERATORS, CALL, CALL_BUILTIN, DEFINE, INDEX, INDEX_UNCHECKED, JUMP,
+                      JUMP_IF_FALSE_OR_POP, JUMP_IF_TRUE_OR_POP,
+                      LOAD_CONST, LOAD_GLOBAL, LOAD_GLOBAL_CHECKED, LOAD_LOCAL, MAKE_ARRAY, MAX_ARGS,
+                      NEGATE, NOT, OPERATOR_BITS, OPERATOR_MASK, POP, POP_JUMP_IF_FALSE,
+                      POP_JUMP_IF_TRUE, RETURN, RETURN_NONE, STORE_GLOBAL, STORE_LOCAL, make_value)
+from errors import CompileError, CompileErrors, ExecutionError
+from lexer import TableLexer
+from optimizer import add_arguments, optimize
+from runtime import (RUNTIME_ERRORS, UNSET, ConstantSequence, assign_constant, assign_sequence, builtins,
+                     describe, memo_report, memoize, new_array)
+from slparser import Parser
+
+# Стековая машина для байт-кода из bytecode.py. Цикл выполнения читает
+# код операции и аргумент из списка целых и разбирает операции цепочкой
+# сравнений, самые частые - первыми. Вызов функции SL - рекурсивный вызов
+# execute с новым кадром локальных переменных.
+#
+#   python vm.py программа.sl              выполнить программу
+#   python vm.py программа.sl -o файл.slc  сохранить байт-код
+#   python vm.py файл.slc                  выполнить сохранённый байт-код
+#   python vm.py программа.sl --dis        вывести байт-код
+
+class Function:
+    # функция, подготовленная к выполнению: код в виде списка (чтение
+    # элемента списка быстрее, чем массива), значения локальных переменных
+    # после параметров и номера тех из них, что являются массивами;
+    # константы-последовательности ASSIGN_CONSTANT заменены на
+    # ConstantSequence; memo - функция с кэшем для мемоизируемых функций
+    __slots__ = ('code', 'ops', 'consts', 'params', 'rest', 'arrays', 'result', 'memo')
+
+    def __init__(self, code):
+        self.code = code
+        self.ops = code.ops.tolist()
+        self.consts = list(code.consts)
+        for pc in range(0, len(self.ops), 2):
+            if self.ops[pc] == ASSIGN_CONSTANT:
+                arg = self.ops[pc + 1]
+                if not isinstance(self.consts[arg], ConstantSequence):
+                    self.consts[arg] = ConstantSequence(self.consts[arg])
+        self.params = code.params
+        specs = [spec for _, spec in code.locals[code.params:]]
+        self.rest = [make_value(spec) for spec in specs]
+        self.arrays = [(slot, spec) for slot, spec in enumerate(specs, code.params) if spec[0] == 'array']
+        self.result = code.result
+        self.memo = None
+
+class VirtualMachine:
+    RECURSION_LIMIT = 20000
+
+    def __init__(self, module, out=None):
+        self.module = module
+        out = sys.stdout if out is None else out
+        self.builtins = list(builtins(out).values())
+        self.globals = [UNSET if spec is None else make_value(spec) for _, spec in module.globals]
+        self.functions = [Function(code) for code in module.functions]
+        self.memos = []
+        for function in self.functions:
+            if function.code.memo:
+                function.memo = memoize(function.code.name, lambda *args, function=function: self.invoke(function, list(args)),
+                                        function.code.memo, self.memos)
+        self.cells = [self.functions[index] if index >= 0 else None for _, index in module.cells]
+        self.main = Function(module.main)
+
+    def run(self):
+        if sys.getrecursionlimit() < self.RECURSION_LIMIT:
+            sys.setrecursionlimit(self.RECURSION_LIMIT)
+        self.execute(self.main, None)
+
+    def invoke(self, function, args):
+        # вызов function с аргументами args (список) в новом кадре
+        args += function.rest
+        for slot, spec in function.arrays:
+            args[slot] = make_value(spec)
+        value = self.execute(function, args)
+        return make_value(function.result) if value is None else value
+
+    def execute(self, function, frame):
+        ops = function.ops
+        consts = function.consts
+        g = self.globals
+        cells = self.cells
+        binary = [operation for _, _, operation in BINARY_OPERATORS]
+        stack = []
+        push = stack.append
+        pop = stack.pop
+        pc = 0
+        try:
+            while True:
+                op = ops[pc]
+                arg = ops[pc + 1]
+                pc += 2
+                if op == LOAD_LOCAL:
+                    push(frame[arg])
+                elif op == LOAD_CONST:
+                    push(consts[arg])
+                elif op == BINARY_CONST:
+                    stack[-1] = binary[arg & OPERATOR_MASK](stack[-1], consts[arg >> OPERATOR_BITS])
+                elif op == BINARY:
+                    right = pop()
+                    stack[-1] = binary[arg](stack[-1], right)
+                elif op == STORE_LOCAL:
+                    frame[arg] = pop()
+                elif op == LOAD_GLOBAL:
+                    push(g[arg])
+                elif op == STORE_GLOBAL:
+                    g[arg] = pop()
+                elif op == POP_JUMP_IF_FALSE:
+                    if not pop():
+                        pc = arg
+                elif op == POP_JUMP_IF_TRUE:
+                    if pop():
+                        pc = arg
+                elif op == JUMP:
+                    pc = arg
+                elif op == INDEX_UNCHECKED:
+                    index = pop()
+                    stack[-1] = stack[-1][index]
+                elif op == INDEX:
+                    index = pop()
+                    if index < 0:
+                        raise IndexError(index)
+                    stack[-1] = stack[-1][index]
+                elif op == CALL:
+                    count = arg & MAX_ARGS
+                    callee = cells[arg >> ARGC_BITS]
+                    if callee is None:
+                        raise NameError(f'Функция {self.module.cells[arg >> ARGC_BITS][0]} не объявлена')
+                    if count != callee.params:
+                        raise TypeError(f'функция {callee.code.name} ожидает аргументов: {callee.params}, '
+                                        f'передано: {count}')
+                    if callee.memo is not None:
+                        args = stack[-count:] if count else ()
+                        del stack[len(stack) - count:]
+                        push(callee.memo(*args))
+                        continue
+                    if count:
+                        args = stack[-count:]
+                        del stack[-count:]
+                        args += callee.rest
+                    else:
+                        args = callee.rest.copy()
+                    for slot, spec in callee.arrays:
+                        args[slot] = make_value(spec)
+                    value = self.execute(callee, args)
+                    push(make_value(callee.result) if value is None else value)
+                elif op == RETURN:
+                    return pop()
+                elif op == JUMP_IF_FALSE_OR_POP:
+                    if stack[-1]:
+                        pop()
+                    else:
+                        pc = arg
+                elif op == JUMP_IF_TRUE_OR_POP:
+                    if stack[-1]:
+                        pc = arg
+                    else:
+                        pop()
+                elif op == NOT:
+                    stack[-1] = not stack[-1]
+                elif op == NEGATE:
+                    stack[-1] = -stack[-1]
+                elif op == POP:
+                    pop()
+                elif op == CALL_BUILTIN:
+                    count = arg & MAX_ARGS
+                    if count:
+                        args = stack[-count:]
+                        del stack[-count:]
+                    else:
+                        args = ()
+                    push(self.builtins[arg >> ARGC_BITS](*args))
+                elif op == LOAD_GLOBAL_CHECKED:
+                    value = g[arg]
+                    if value is UNSET:
+                        raise NameError(f'Переменная {self.module.globals[arg][0]} не определена')
+                    push(value)
+                elif op == RETURN_NONE:
+                    return None
+                elif op == MAKE_ARRAY:
+                    item, size = consts[arg]
+                    push(new_array(item, size))
+                elif op == ASSIGN_SEQUENCE:
+                    values = stack[-arg:] if arg else []
+                    del stack[len(stack) - arg:]
+                    stack[-1] = assign_sequence(stack[-1], values)
+                elif op == ASSIGN_CONSTANT:
+                    stack[-1] = assign_constant(stack[-1], consts[arg])
+                elif op == DEFINE:
+                    callee = self.functions[arg]
+                    cells[callee.code.cell] = callee
+                else:
+                    raise CompileError(f'Неизвестный код операции {op}', *function.code.position(pc - 2))
+        except RUNTIME_ERRORS as error:
+            raise ExecutionError(describe(error), *function.code.position(pc - 2)) from None
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Выполнение программы SL на стековой машине')
+    parser.add_argument('path', help='исходный файл .sl или байт-код .slc')
+    parser.add_argument('-o', '--output', help='сохранить байт-код в файл и не выполнять программу')
+    parser.add_argument('--dis', action='store_true', help='вывести байт-код и не выполнять программу')
+    parser.add_argument('-O', '--optimize', action='store_true', help='оптимизировать дерево разбора перед выполнением')
+    add_arguments(parser)
+    args = parser.parse_args(argv)
+    try:
+        with open(args.path, 'rb') as f:
+            data = f.read()
+        if data.startswith(bytecode.MAGIC):
+            module = bytecode.loads(data)
+        else:
+            program = Parser(TableLexer(data), recover=True).parse()
+            if args.optimize:
+                optimize(program, inline_nodes=args.inline_nodes, memo_size=args.memo_size)
+            module = bytecode.compile_program(program)
+        if args.output:
+            bytecode.save(module, args.output)
+        if args.dis:
+            bytecode.disassemble(module)
+        if not args.output and not args.dis:
+            machine = VirtualMachine(module)
+            machine.run()
+            if machine.memos:
+                print(memo_report(machine.memos), file=sys.stderr)
+    except CompileErrors as errors:
+        for error in errors.errors:
+            print(error)
+        return 1
+    except CompileError as error:
+        print(error)
+        return 1
+    except (OSError, ValueError) as error:
+        print(f'Не удалось прочитать файл: {error}')
+        return 1
+    return 0
+
+if __name__ == '__main__':
+    sys.exit(main())